@@ -0,0 +1,250 @@
+import os
+import threading
+from contextlib import asynccontextmanager, nullcontext
+from typing import Optional
+
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from utils.batching import get_batcher, get_batcher_metrics
+from utils.metrics import CONTENT_TYPE, render_metrics, trace_request
+from utils.model_inference import get_class, get_model_names
+from utils.model_registry import get_model_registry, get_shared_model
+from utils.partial_results import get_partial_store
+from utils.ocr import OPTIONAL_FIELDS, OCR_img, OCR_with_detection, parse_optional_fields
+from utils.pipeline import OCR_METHODS, decode_image_bytes, process_cccd
+from utils.reader_pool import warm_up_reader_pool
+from utils.result_cache import detector_cache_name, get_result_cache, hash_image_bytes, make_cache_key
+from utils.worker_pool import get_worker_pool
+
+# Mô hình YOLO được load sẵn khi khởi động worker (phân cách bằng dấu phẩy, rỗng = không load)
+WARM_MODELS = [name for name in os.environ.get('API_WARM_MODELS', 'yolov8').split(',') if name]
+DEFAULT_MODEL = os.environ.get('API_DEFAULT_MODEL', 'yolov8')
+
+# Gom request của nhiều client thành một batch YOLO (xem utils/batching.py)
+BATCHING_ENABLED = os.environ.get('DETECTOR_BATCHING', '1') == '1'
+
+_ready = threading.Event()
+_warmup_error = None
+
+def warm_up():
+    """
+    Load OCR reader và các mô hình YOLO một lần cho worker hiện tại
+    """
+    global _warmup_error
+    try:
+        if get_worker_pool() is None:
+            warm_up_reader_pool()
+            for model_name in WARM_MODELS:
+                get_detector(model_name)
+        _ready.set()
+    except Exception as e:
+        _warmup_error = e
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm-up chạy nền để /healthz trả lời ngay, /readyz chỉ đạt sau khi warm-up xong
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+    yield
+
+app = FastAPI(title="CCCD Scanner API", lifespan=lifespan)
+
+# Endpoint theo dõi, không tính vào số request đang xử lý / trace
+UNTRACED_PATHS = {"/healthz", "/readyz", "/metrics"}
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    if request.url.path in UNTRACED_PATHS:
+        return await call_next(request)
+    with trace_request(request.url.path, method=request.method) as trace:
+        response = await call_next(request)
+        if response.status_code >= 400:
+            trace['status'] = str(response.status_code)
+    return response
+
+def read_upload(upload):
+    return read_upload_with_hash(upload)[0]
+
+def read_upload_with_hash(upload):
+    """
+    Giải mã ảnh upload, trả về (ảnh, hash của bytes gốc) để dùng làm cache key
+    """
+    if upload is None:
+        return None, None
+    data = upload.file.read()
+    try:
+        return decode_image_bytes(data), hash_image_bytes(data)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=f"{upload.filename}: {ve}")
+
+def get_detector(model_name):
+    if BATCHING_ENABLED:
+        return get_batcher(model_name=model_name, device='cpu')
+    return get_shared_model(model_name=model_name, device='cpu')
+
+def check_model_name(model_name):
+    from utils.cascade import CASCADE_MODEL_NAME
+
+    model_names = get_model_names() + [CASCADE_MODEL_NAME]
+    if model_name not in model_names:
+        raise HTTPException(status_code=400, detail=f"model_name phải là một trong: {', '.join(model_names)}")
+
+def check_ocr_method(ocr_method):
+    if ocr_method not in OCR_METHODS:
+        raise HTTPException(status_code=400, detail=f"ocr_method phải là một trong: {', '.join(OCR_METHODS)}")
+
+def load_detection_model(ocr_method, model_name):
+    check_ocr_method(ocr_method)
+    if ocr_method != "Object Detection + OCR":
+        return None
+    check_model_name(model_name)
+    return get_detector(model_name)
+
+def run_cccd(front, back, cccd_type, ocr_method, model_name, session_id=None):
+    front_img, front_hash = read_upload_with_hash(front)
+    back_img, back_hash = read_upload_with_hash(back)
+    image_hashes = {'front': front_hash, 'back': back_hash}
+    # Cùng session_id: các trường đã đọc được ở lần gửi trước được giữ lại, chỉ OCR các trường còn thiếu.
+    # Các request cùng session được xử lý lần lượt để lần sau thấy kết quả đã gộp của lần trước
+    partial = get_partial_store().get(session_id) if session_id else None
+    with partial.scan_lock if partial is not None else nullcontext():
+        return _run_cccd(front_img, back_img, image_hashes, cccd_type, ocr_method, model_name, partial)
+
+def _run_cccd(front_img, back_img, image_hashes, cccd_type, ocr_method, model_name, partial):
+    pool = get_worker_pool()
+    if pool is not None:
+        check_ocr_method(ocr_method)
+        if ocr_method == "Object Detection + OCR":
+            check_model_name(model_name)
+        try:
+            return pool.process_cccd(front_img, back_img, cccd_type, ocr_method=ocr_method,
+                                     model_name=model_name, image_hashes=image_hashes, partial=partial).result()
+        except ValueError as ve:
+            raise HTTPException(status_code=422, detail=str(ve))
+
+    detection_model = load_detection_model(ocr_method, model_name)
+    try:
+        return process_cccd(
+            front_img,
+            back_img,
+            cccd_type,
+            ocr_method=ocr_method,
+            detection_model=detection_model,
+            class_names=get_class(),
+            cache=get_result_cache(),
+            image_hashes=image_hashes,
+            model_name=model_name,
+            partial=partial
+        )
+    except ValueError as ve:
+        raise HTTPException(status_code=422, detail=str(ve))
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    if _warmup_error is not None:
+        return JSONResponse(status_code=503, content={"status": "error", "detail": str(_warmup_error)})
+    if not _ready.is_set():
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready", "models": get_model_registry().loaded_models()}
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+@app.get("/stats/batching")
+def batching_stats():
+    return {"enabled": BATCHING_ENABLED, "batchers": get_batcher_metrics()}
+
+@app.get("/stats/cascade")
+def cascade_stats():
+    from utils.cascade import get_cascade_stats
+
+    return {"cascades": get_cascade_stats()}
+
+@app.get("/stats/cache")
+def cache_stats():
+    cache = get_result_cache()
+    return {"enabled": cache is not None, **(cache.stats() if cache is not None else {})}
+
+@app.post("/cccd/new")
+def scan_new_cccd(
+    back: UploadFile = File(...),
+    front: Optional[UploadFile] = File(None),
+    ocr_method: str = Form("OCR trực tiếp"),
+    model_name: str = Form(DEFAULT_MODEL),
+    session_id: Optional[str] = Form(None),
+):
+    """
+    CCCD Mới: Quét QR ở mặt sau, OCR mặt trước nếu QR thất bại
+    """
+    return run_cccd(front, back, "CCCD Mới", ocr_method, model_name, session_id)
+
+@app.post("/cccd/old")
+def scan_old_cccd(
+    front: UploadFile = File(...),
+    ocr_method: str = Form("OCR trực tiếp"),
+    model_name: str = Form(DEFAULT_MODEL),
+    session_id: Optional[str] = Form(None),
+):
+    """
+    CCCD Cũ: Quét QR ở mặt trước, OCR mặt trước nếu QR thất bại
+    """
+    return run_cccd(front, None, "CCCD Cũ", ocr_method, model_name, session_id)
+
+@app.post("/ocr")
+def ocr_direct(image: UploadFile = File(...)):
+    """
+    OCR trực tiếp toàn bộ ảnh
+    """
+    img = read_upload(image)
+    pool = get_worker_pool()
+    try:
+        if pool is not None:
+            return {"ocr_text": pool.ocr_img(img).result()}
+        return {"ocr_text": OCR_img(img)}
+    except ValueError as ve:
+        raise HTTPException(status_code=422, detail=str(ve))
+
+@app.post("/ocr/detection")
+def ocr_detection(image: UploadFile = File(...), model_name: str = Form(DEFAULT_MODEL),
+                  optional_fields: Optional[str] = Form(None)):
+    """
+    Object Detection + OCR, trả về thông tin theo tên trường tiếng Việt
+
+    optional_fields: 'all', 'none' hoặc danh sách trường tùy chọn cần OCR (mặc định CCCD_OCR_OPTIONAL_FIELDS)
+    """
+    check_model_name(model_name)
+    img, image_hash = read_upload_with_hash(image)
+    fields = OPTIONAL_FIELDS if optional_fields is None else parse_optional_fields(optional_fields)
+
+    cache = get_result_cache()
+    method = "Object Detection + OCR"
+    if fields is not True:
+        # Kết quả chỉ có một phần trường tùy chọn: không dùng chung cache với kết quả đầy đủ
+        method = f"{method}|{','.join(fields)}"
+    cache_key = make_cache_key(image_hash, model=detector_cache_name(model_name), method=method)
+    cached = cache.get(cache_key) if cache is not None else None
+    # Lỗi đã cache ở phiên bản trước không được dùng lại
+    if cached is None or "error" in cached:
+        pool = get_worker_pool()
+        try:
+            if pool is not None:
+                detected_info = pool.ocr_with_detection(img, model_name=model_name, optional_fields=fields).result()
+            else:
+                detected_info, _ = OCR_with_detection(img, get_detector(model_name), get_class(), optional_fields=fields)
+            cached = {"detected_info": detected_info}
+        except ValueError as ve:
+            raise HTTPException(status_code=422, detail=str(ve))
+        # Chỉ cache kết quả thành công: lỗi không bị trả lại mãi cho cùng một ảnh
+        if cache is not None:
+            cache.put(cache_key, cached)
+    return cached
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("api:app", host="0.0.0.0", port=int(os.environ.get('API_PORT', '8000')))
@@ -5,47 +5,16 @@ from PIL import Image
 import os
 import io
 import pandas as pd
-from utils.ocr import qr_code_detection, OCR_img, OCR_with_detection
-from utils.model_inference import get_model, get_class
-
-def parse_qr_result(qr_string):
-    """
-    Phân tích chuỗi QR code và trả về thông tin có cấu trúc
-    Format: cccd|cmnd|họ và tên|ngày tháng năm sinh|giới tính|Nơi thường trú|ngày tháng năm cấp|...
-    """
-    try:
-        # Tách chuỗi theo dấu |
-        parts = qr_string.split('|')
-        
-        if len(parts) >= 7:
-            parsed_info = {
-                'Số CCCD/CMND': parts[0] if parts[0] else 'Không có',
-                'Số CMND cũ': parts[1] if parts[1] else 'Không có',
-                'Họ và tên': parts[2] if parts[2] else 'Không có',
-                'Ngày sinh': parts[3] if parts[3] else 'Không có',
-                'Giới tính': parts[4] if parts[4] else 'Không có',
-                'Nơi thường trú': parts[5] if parts[5] else 'Không có',
-                'Ngày cấp': parts[6] if parts[6] else 'Không có',
-            }
-            
-            # Xử lý định dạng ngày sinh
-            if parsed_info['Ngày sinh'] != 'Không có' and len(parsed_info['Ngày sinh']) == 8:
-                date_str = parsed_info['Ngày sinh']
-                formatted_date = f"{date_str[0:2]}/{date_str[2:4]}/{date_str[4:8]}"
-                parsed_info['Ngày sinh'] = formatted_date
-            
-            # Xử lý định dạng ngày cấp
-            if parsed_info['Ngày cấp'] != 'Không có' and len(parsed_info['Ngày cấp']) == 8:
-                date_str = parsed_info['Ngày cấp']
-                formatted_date = f"{date_str[0:2]}/{date_str[2:4]}/{date_str[4:8]}"
-                parsed_info['Ngày cấp'] = formatted_date
-            
-            return parsed_info
-        else:
-            return {'Lỗi': 'Định dạng QR code không đúng', 'Dữ liệu gốc': qr_string}
-            
-    except Exception as e:
-        return {'Lỗi': f'Không thể phân tích: {str(e)}', 'Dữ liệu gốc': qr_string}
+from utils.pipeline import parse_qr_result, process_cccd
+from utils.model_inference import get_class, get_backends
+from utils.ingest import decode_image, from_pil, upload_buffer
+from utils.metrics import start_metrics_server, timed, trace_request
+from utils.model_registry import get_model_registry, get_shared_model
+from utils.partial_results import PartialResult
+from utils.reader_pool import get_reader_pool, warm_up_reader_pool
+from utils.result_cache import get_result_cache, hash_image_bytes
+from utils.stream import iter_video_frames, scan_qr_stream
+from utils.worker_pool import get_worker_pool, worker_pool_enabled
 
 def display_parsed_info(parsed_info):
     """
@@ -84,104 +53,6 @@ def display_parsed_info(parsed_info):
         df = pd.DataFrame(df_data)
         st.dataframe(df, use_container_width=True, hide_index=True)
 
-def process_images(front_image, back_image, cccd_type):
-    """
-    Xử lý ảnh tùy theo loại CCCD với 2 ảnh được upload cùng lúc
-    """
-    results = {}
-    
-    if cccd_type == "CCCD Mới":
-        # CCCD Mới: Quét QR ở mặt sau, OCR ở mặt trước
-        if back_image is not None:
-            st.info("🔍 Đang quét QR code ở mặt sau CCCD mới...")
-            
-            # Chuyển đổi ảnh mặt sau thành OpenCV image
-            back_file_bytes = np.asarray(bytearray(back_image.read()), dtype=np.uint8)
-            back_img = cv2.imdecode(back_file_bytes, 1)
-            
-            # Quét QR code với nhiều scale khác nhau
-            qr_result = None
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            for i, scale in enumerate([1, 2, 3]):
-                status_text.text(f"Đang thử scale {scale}...")
-                progress_bar.progress((i + 1) / 3)
-                qr_result = qr_code_detection(back_img, scale=scale)
-                if qr_result:
-                    break
-            
-            progress_bar.empty()
-            status_text.empty()
-            
-            if qr_result:
-                results['qr_code'] = qr_result
-                st.success("✅ Đã quét được QR code!")
-                st.text_area("Kết quả QR code:", qr_result, height=100)
-            else:
-                st.warning("⚠️ Không quét được QR code, chuyển sang OCR mặt trước...")
-                results['qr_code'] = None
-                
-                if front_image is not None:
-                    # Chuyển đổi ảnh mặt trước thành OpenCV image
-                    front_file_bytes = np.asarray(bytearray(front_image.read()), dtype=np.uint8)
-                    front_img = cv2.imdecode(front_file_bytes, 1)
-                    
-                    st.info("🔍 Đang thực hiện OCR...")
-                    ocr_result = OCR_img(front_img)
-                    results['ocr_text'] = ocr_result
-                    
-                    st.success("✅ Hoàn thành OCR!")
-                    st.text_area("Kết quả OCR:", '\n'.join(ocr_result), height=200)
-                else:
-                    st.error("❌ Cần ảnh mặt trước để thực hiện OCR!")
-        else:
-            st.error("❌ Cần ảnh mặt sau để quét QR code!")
-    
-    elif cccd_type == "CCCD Cũ":
-        # CCCD Cũ: Quét QR ở mặt trước, OCR ở mặt trước
-        if front_image is not None:
-            st.info("🔍 Đang quét QR code ở mặt trước CCCD cũ...")
-            
-            # Chuyển đổi ảnh mặt trước thành OpenCV image
-            front_file_bytes = np.asarray(bytearray(front_image.read()), dtype=np.uint8)
-            front_img = cv2.imdecode(front_file_bytes, 1)
-            
-            # Quét QR code với nhiều scale khác nhau
-            qr_result = None
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            for i, scale in enumerate([1, 2, 3]):
-                status_text.text(f"Đang thử scale {scale}...")
-                progress_bar.progress((i + 1) / 3)
-                qr_result = qr_code_detection(front_img, scale=scale)
-                if qr_result:
-                    break
-            
-            progress_bar.empty()
-            status_text.empty()
-            
-            if qr_result:
-                results['qr_code'] = qr_result
-                st.success("✅ Đã quét được QR code!")
-                st.text_area("Kết quả QR code:", qr_result, height=100)
-            else:
-                st.warning("⚠️ Không quét được QR code, chuyển sang OCR...")
-                results['qr_code'] = None
-                
-                # Thực hiện OCR trên cùng ảnh mặt trước
-                st.info("🔍 Đang thực hiện OCR...")
-                ocr_result = OCR_img(front_img)
-                results['ocr_text'] = ocr_result
-                
-                st.success("✅ Hoàn thành OCR!")
-                st.text_area("Kết quả OCR:", '\n'.join(ocr_result), height=200)
-        else:
-            st.error("❌ Cần ảnh mặt trước để quét QR code!")
-    
-    return results
-
 def capture_image_from_camera():
     """
     Chụp ảnh từ camera sử dụng st.camera_input
@@ -199,11 +70,8 @@ def convert_pil_to_opencv(pil_image):
     Chuyển đổi PIL Image thành OpenCV image
     """
     if pil_image is not None:
-        # Chuyển PIL image thành numpy array
-        numpy_image = np.array(pil_image)
-        # Chuyển từ RGB sang BGR (OpenCV format)
-        opencv_image = cv2.cvtColor(numpy_image, cv2.COLOR_RGB2BGR)
-        return opencv_image
+        # Xoay theo EXIF và chuyển từ RGB sang BGR (OpenCV format)
+        return from_pil(pil_image)
     return None
 
 def process_images_from_source(front_source, back_source, cccd_type, ocr_method="OCR trực tiếp", detection_model=None, class_names=None):
@@ -211,208 +79,166 @@ def process_images_from_source(front_source, back_source, cccd_type, ocr_method=
     Xử lý ảnh từ nhiều nguồn khác nhau (upload file hoặc camera)
     
     Parameters:
-        front_source: Nguồn ảnh mặt trước (file upload hoặc PIL Image)
-        back_source: Nguồn ảnh mặt sau (file upload hoặc PIL Image)
+        front_source: Nguồn ảnh mặt trước (file upload, PIL Image hoặc khung hình BGR từ video)
+        back_source: Nguồn ảnh mặt sau (file upload, PIL Image hoặc khung hình BGR từ video)
         cccd_type: Loại CCCD ("CCCD Mới" hoặc "CCCD Cũ")
         ocr_method: Phương thức OCR ("OCR trực tiếp" hoặc "Object Detection + OCR")
         detection_model: Model YOLO cho object detection (nếu dùng)
         class_names: List các class names (nếu dùng object detection)
     """
-    results = {}
     front_img = None
     back_img = None
+    # Hash bytes gốc của file upload / ảnh camera làm cache key (ảnh PIL được hash sau khi giải mã)
+    image_hashes = {}
+    
+    # Đọc trực tiếp từ buffer của file upload / ảnh camera (không copy), xoay theo EXIF khi giải mã
+    try:
+        for side, source in (('front', front_source), ('back', back_source)):
+            if source is None:
+                continue
+            if hasattr(source, 'read'):  # File upload hoặc ảnh chụp camera
+                data = upload_buffer(source)
+                image_hashes[side] = hash_image_bytes(data)
+                with timed('decode'):
+                    img = decode_image(data)
+            elif isinstance(source, np.ndarray):  # Khung hình đã chọn từ video
+                img = source
+            else:  # PIL Image
+                img = convert_pil_to_opencv(source)
+            if side == 'front':
+                front_img = img
+            else:
+                back_img = img
+    except ValueError as ve:
+        st.error(str(ve))
+        return {}
+    
+    # Luồng xử lý dùng chung với API / CLI (utils/pipeline.py), hiển thị tiến trình qua callback
+    try:
+        model_name = st.session_state.get('model_name') if ocr_method == "Object Detection + OCR" else None
+        backend = st.session_state.get('model_backend') if ocr_method == "Object Detection + OCR" else None
+        # Mỗi backend có pool worker riêng (worker load mô hình theo backend đã chọn)
+        pool = get_worker_pool(backend)
+        # Các trường đã đọc được ở lần chụp trước của phiên, lần chụp lại chỉ OCR các trường còn thiếu
+        partial = st.session_state.get('partial_result')
+        if pool is not None:
+            # Chế độ worker pool: xử lý ở process riêng, ảnh truyền qua shared memory
+            results = pool.process_cccd(front_img, back_img, cccd_type, ocr_method=ocr_method,
+                                        model_name=model_name, image_hashes=image_hashes, partial=partial).result()
+        else:
+            results = process_cccd(
+                front_img,
+                back_img,
+                cccd_type,
+                ocr_method=ocr_method,
+                detection_model=detection_model,
+                class_names=class_names,
+                on_status=lambda level, message: getattr(st, level)(message),
+                cache=get_result_cache(),
+                image_hashes=image_hashes,
+                model_name=model_name,
+                partial=partial,
+                backend=backend
+            )
+    except ValueError as ve:
+        st.error(str(ve))
+        return {}
+    except Exception as e:
+        st.error(f"❌ Lỗi khi thực hiện Object Detection: {e}")
+        st.warning("💡 Vui lòng thử lại hoặc chọn 'OCR trực tiếp'")
+        return {}
+    
+    display_results(results)
+    return results
+
+def process_video_from_source(video_source, front_source, cccd_type, ocr_method="OCR trực tiếp", detection_model=None, class_names=None):
+    """
+    Quét QR trên video mặt chứa QR, chỉ giải mã các khung hình nét nhất, dừng ngay khi đọc được QR hợp lệ.
+    Nếu không đọc được QR, xử lý tiếp như ảnh chụp với khung hình nét nhất của video.
+    
+    Parameters:
+        video_source: File video upload (mặt sau với CCCD Mới, mặt trước với CCCD Cũ)
+        front_source: Ảnh mặt trước (tùy chọn, CCCD Mới) dùng để OCR khi QR thất bại
+    """
+    try:
+        scan = scan_qr_stream(iter_video_frames(upload_buffer(video_source)))
+    except ValueError as ve:
+        st.error(str(ve))
+        return {}
+    
+    st.info(f"🎞️ Đã đọc {scan['frames_read']} khung hình, giải mã QR trên {scan['frames_decoded']} khung hình nét nhất")
     
-    # Xử lý ảnh mặt trước
-    if front_source is not None:
-        if hasattr(front_source, 'read'):  # File upload
-            front_file_bytes = np.asarray(bytearray(front_source.read()), dtype=np.uint8)
-            front_img = cv2.imdecode(front_file_bytes, 1)
-        else:  # PIL Image từ camera
-            front_img = convert_pil_to_opencv(front_source)
+    if scan['qr_code']:
+        st.success(f"✅ Đọc được QR code ở khung hình {scan['frame_index'] + 1}!")
+        results = {'cccd_type': cccd_type, 'qr_code': scan['qr_code'], 'qr_info': scan['qr_info']}
+        display_results(results)
+        return results
     
-    # Xử lý ảnh mặt sau
-    if back_source is not None:
-        if hasattr(back_source, 'read'):  # File upload
-            back_file_bytes = np.asarray(bytearray(back_source.read()), dtype=np.uint8)
-            back_img = cv2.imdecode(back_file_bytes, 1)
-        else:  # PIL Image từ camera
-            back_img = convert_pil_to_opencv(back_source)
+    if scan['best_frame'] is None:
+        st.error("❌ Video không có khung hình nào.")
+        return {}
     
-    # Logic xử lý tương tự như function cũ
+    st.warning("⚠️ Không đọc được QR code trên video, xử lý tiếp với khung hình nét nhất...")
+    st.image(cv2.cvtColor(scan['best_frame'], cv2.COLOR_BGR2RGB), caption="Khung hình nét nhất", use_container_width=True)
     if cccd_type == "CCCD Mới":
-        # CCCD Mới: Quét QR ở mặt sau, OCR ở mặt trước
-        if back_img is not None:
-            st.info("🔍 Đang quét QR code ở mặt sau CCCD mới...")
-            
-            # Quét QR code với nhiều scale khác nhau
-            qr_result = None
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            for i, scale in enumerate([1, 2, 3]):
-                status_text.text(f"Đang thử scale {scale}...")
-                progress_bar.progress((i + 1) / 3)
-                qr_result = qr_code_detection(back_img, scale=scale)
-                if qr_result:
-                    break
-            
-            progress_bar.empty()
-            status_text.empty()
-            
-            if qr_result:
-                results['qr_code'] = qr_result
-                st.success("✅ Đã quét được QR code!")
-                
-                # Phân tích và hiển thị thông tin QR
-                parsed_info = parse_qr_result(qr_result)
-                if 'Lỗi' in parsed_info:
-                    st.warning("⚠️ Có lỗi khi phân tích QR code:")
-                    st.error(parsed_info['Lỗi'])
-                    st.text_area("Dữ liệu QR gốc:", qr_result, height=100)
-                else:
-                    display_parsed_info(parsed_info)
-                    
-                    # Hiển thị dữ liệu gốc trong expander
-                    with st.expander("🔍 Xem dữ liệu QR gốc"):
-                        st.code(qr_result)
-            else:
-                st.warning("⚠️ Không quét được QR code, chuyển sang OCR mặt trước...")
-                results['qr_code'] = None
-                
-                if front_img is not None:
-                    # Kiểm tra phương thức OCR
-                    if ocr_method == "Object Detection + OCR" and detection_model is not None:
-                        st.info("🔍 Đang thực hiện Object Detection + OCR...")
-                        try:
-                            detected_info, img_with_boxes = OCR_with_detection(
-                                front_img, 
-                                detection_model, 
-                                class_names
-                            )
-                            results['detected_info'] = detected_info
-                            
-                            st.success("✅ Hoàn thành Object Detection + OCR!")
-                            
-                            # Hiển thị kết quả theo từng trường
-                            st.markdown("### 📋 Thông tin đã trích xuất:")
-                            
-                            # Tạo 2 cột để hiển thị thông tin
-                            col_left, col_right = st.columns(2)
-                            
-                            with col_left:
-                                for i, (field_name, text_value) in enumerate(detected_info.items()):
-                                    if i % 2 == 0:
-                                        st.markdown(f"**{field_name}:** {text_value}")
-                            
-                            with col_right:
-                                for i, (field_name, text_value) in enumerate(detected_info.items()):
-                                    if i % 2 == 1:
-                                        st.markdown(f"**{field_name}:** {text_value}")
-                            
-                            # Hiển thị bảng thông tin
-                            st.markdown("---")
-                            df_data = [{'Trường thông tin': k, 'Giá trị': v} for k, v in detected_info.items()]
-                            if df_data:
-                                df = pd.DataFrame(df_data)
-                                st.dataframe(df, use_container_width=True, hide_index=True)
-                        except ValueError as ve:
-                            # Lỗi validation - hiển thị hướng dẫn
-                            st.error(str(ve))
-                        except Exception as e:
-                            st.error(f"❌ Lỗi khi thực hiện Object Detection: {e}")
-                            st.warning("💡 Vui lòng thử lại hoặc chọn 'OCR trực tiếp'")
-                    else:
-                        st.info("🔍 Đang thực hiện OCR...")
-                        ocr_result = OCR_img(front_img)
-                        results['ocr_text'] = ocr_result
-                        
-                        st.success("✅ Hoàn thành OCR!")
-                        st.text_area("Kết quả OCR:", '\n'.join(ocr_result), height=200)
-                else:
-                    st.error("❌ Cần ảnh mặt trước để thực hiện OCR!")
+        return process_images_from_source(front_source, scan['best_frame'], cccd_type, ocr_method, detection_model, class_names)
+    return process_images_from_source(scan['best_frame'], None, cccd_type, ocr_method, detection_model, class_names)
+
+def display_results(results):
+    """
+    Hiển thị kết quả trả về từ process_cccd
+    """
+    qr_result = results.get('qr_code')
+    if qr_result:
+        # Phân tích và hiển thị thông tin QR
+        parsed_info = results['qr_info']
+        if 'Lỗi' in parsed_info:
+            st.warning("⚠️ Có lỗi khi phân tích QR code:")
+            st.error(parsed_info['Lỗi'])
+            st.text_area("Dữ liệu QR gốc:", qr_result, height=100)
         else:
-            st.error("❌ Cần ảnh mặt sau để quét QR code!")
-    
-    elif cccd_type == "CCCD Cũ":
-        # CCCD Cũ: Quét QR ở mặt trước, OCR ở mặt trước
-        if front_img is not None:
-            st.info("🔍 Đang quét QR code ở mặt trước CCCD cũ...")
-            
-            # Quét QR code với nhiều scale khác nhau
-            qr_result = None
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            for i, scale in enumerate([1, 2, 3]):
-                status_text.text(f"Đang thử scale {scale}...")
-                progress_bar.progress((i + 1) / 3)
-                qr_result = qr_code_detection(front_img, scale=scale)
-                if qr_result:
-                    break
-            
-            progress_bar.empty()
-            status_text.empty()
+            display_parsed_info(parsed_info)
             
-            if qr_result:
-                results['qr_code'] = qr_result
-                st.success("✅ Đã quét được QR code!")
-                
-                # Phân tích và hiển thị thông tin QR
-                parsed_info = parse_qr_result(qr_result)
-                if 'Lỗi' in parsed_info:
-                    st.warning("⚠️ Có lỗi khi phân tích QR code:")
-                    st.error(parsed_info['Lỗi'])
-                    st.text_area("Dữ liệu QR gốc:", qr_result, height=100)
-                else:
-                    display_parsed_info(parsed_info)
-                    
-                    # Hiển thị dữ liệu gốc trong expander
-                    with st.expander("🔍 Xem dữ liệu QR gốc"):
-                        st.code(qr_result)
-            else:
-                st.warning("⚠️ Không quét được QR code, chuyển sang OCR...")
-                results['qr_code'] = None
-                
-                # Thực hiện OCR trên cùng ảnh mặt trước
-                # Kiểm tra phương thức OCR
-                if ocr_method == "Object Detection + OCR" and detection_model is not None:
-                    st.info("🔍 Đang thực hiện Object Detection + OCR...")
-                    try:
-                        detected_info, img_with_boxes = OCR_with_detection(
-                            front_img, 
-                            detection_model, 
-                            class_names
-                        )
-                        results['detected_info'] = detected_info
-                        
-                        st.success("✅ Hoàn thành Object Detection + OCR!")
-                        
-                        # Hiển thị kết quả theo từng trường
-                        st.markdown("### 📋 Thông tin đã detect:")
-                        for field_name, text_value in detected_info.items():
-                            st.markdown(f"**{field_name}:** {text_value}")
-                        
-                        # Hiển thị bảng thông tin
-                        df_data = [{'Trường': k, 'Giá trị': v} for k, v in detected_info.items()]
-                        if df_data:
-                            df = pd.DataFrame(df_data)
-                            st.dataframe(df, use_container_width=True, hide_index=True)
-                    except ValueError as ve:
-                        st.error(str(ve))
-                    except Exception as e:
-                        st.error(f"❌ Lỗi khi thực hiện Object Detection: {e}")
-                        st.warning("💡 Vui lòng thử lại hoặc chọn 'OCR trực tiếp'")
-                else:
-                    st.info("�🔍 Đang thực hiện OCR...")
-                    ocr_result = OCR_img(front_img)
-                    results['ocr_text'] = ocr_result
-                    
-                    st.success("✅ Hoàn thành OCR!")
-                    st.text_area("Kết quả OCR:", '\n'.join(ocr_result), height=200)
-        else:
-            st.error("❌ Cần ảnh mặt trước để quét QR code!")
+            # Hiển thị dữ liệu gốc trong expander
+            with st.expander("🔍 Xem dữ liệu QR gốc"):
+                st.code(qr_result)
+        return
     
-    return results
+    if results.get('kept_fields'):
+        st.info(f"📌 Giữ lại từ lần chụp trước: {', '.join(results['kept_fields'])}")
+    
+    if 'error' in results:
+        # Lỗi validation - hiển thị hướng dẫn
+        st.error(results['error'])
+    
+    if 'detected_info' in results:
+        detected_info = results['detected_info']
+        
+        # Hiển thị kết quả theo từng trường
+        st.markdown("### 📋 Thông tin đã trích xuất:")
+        
+        # Tạo 2 cột để hiển thị thông tin
+        col_left, col_right = st.columns(2)
+        
+        with col_left:
+            for i, (field_name, text_value) in enumerate(detected_info.items()):
+                if i % 2 == 0:
+                    st.markdown(f"**{field_name}:** {text_value}")
+        
+        with col_right:
+            for i, (field_name, text_value) in enumerate(detected_info.items()):
+                if i % 2 == 1:
+                    st.markdown(f"**{field_name}:** {text_value}")
+        
+        # Hiển thị bảng thông tin
+        st.markdown("---")
+        df_data = [{'Trường thông tin': k, 'Giá trị': v} for k, v in detected_info.items()]
+        if df_data:
+            df = pd.DataFrame(df_data)
+            st.dataframe(df, use_container_width=True, hide_index=True)
+    
+    if 'ocr_text' in results:
+        st.text_area("Kết quả OCR:", '\n'.join(results['ocr_text']), height=200)
 
 def main():
     st.set_page_config(
@@ -424,6 +250,19 @@ def main():
     st.title("🆔 Ứng dụng quét CCCD")
     st.markdown("---")
     
+    # Khởi tạo sẵn OCR reader một lần cho toàn bộ process (dùng chung giữa các session)
+    # Streamlit không có HTTP endpoint riêng, /metrics được phục vụ trên port khác nếu bật
+    if os.environ.get('METRICS_PORT'):
+        start_metrics_server(int(os.environ['METRICS_PORT']))
+    
+    if not worker_pool_enabled() and not get_reader_pool().is_warm:
+        with st.spinner("Đang khởi tạo OCR reader..."):
+            warm_up_reader_pool()
+    
+    # Kết quả từng phần của thẻ đang quét, gộp qua các lần chụp lại trong session
+    if 'partial_result' not in st.session_state:
+        st.session_state.partial_result = PartialResult()
+    
     # Sidebar cho cấu hình
     with st.sidebar:
         st.header("⚙️ Cấu hình")
@@ -438,7 +277,7 @@ def main():
         # Chọn phương thức nhập ảnh
         input_method = st.radio(
             "Phương thức nhập ảnh:",
-            options=["📁 Upload file", "📸 Chụp camera"],
+            options=["📁 Upload file", "📸 Chụp camera", "🎥 Video"],
             help="Chọn cách thức để lấy ảnh CCCD"
         )
         
@@ -454,24 +293,53 @@ def main():
         # Nếu chọn Object Detection, cho phép chọn mô hình
         selected_model = None
         if ocr_method == "Object Detection + OCR":
-            model_options = ["yolov8", "yolov11"]
+            model_options = ["yolov8", "yolov11", "cascade"]
             selected_model = st.selectbox(
                 "🤖 Chọn mô hình Detection:",
                 options=model_options,
-                help="Chọn mô hình YOLO để detect các trường thông tin"
+                help="Chọn mô hình YOLO để detect các trường thông tin. "
+                     "cascade: chạy YOLOv11 trước, chỉ chạy thêm YOLOv8 khi thiếu trường bắt buộc hoặc độ tin cậy thấp"
             )
             
-            # Load model vào session state để tránh reload nhiều lần
-            if 'detection_model' not in st.session_state or st.session_state.get('model_name') != selected_model:
-                with st.spinner(f"Đang load mô hình {selected_model}..."):
-                    try:
-                        st.session_state.detection_model = get_model(model_name=selected_model, device='cpu')
-                        st.session_state.model_name = selected_model
-                        st.session_state.class_names = get_class()
-                        st.success(f"✅ Đã load mô hình {selected_model}!")
-                    except Exception as e:
-                        st.error(f"❌ Lỗi khi load mô hình: {e}")
-                        selected_model = None
+            backends = get_backends()
+            default_backend = os.environ.get('DETECTOR_BACKEND', 'pytorch')
+            selected_backend = st.selectbox(
+                "⚙️ Backend suy luận:",
+                options=backends,
+                index=backends.index(default_backend) if default_backend in backends else 0,
+                help="ONNX Runtime / OpenVINO (int8) chạy nhanh hơn trên CPU"
+            )
+            
+            # Model được load một lần cho cả process và dùng chung giữa các session
+            loaded = [(m['name'], m['backend']) for m in get_model_registry().loaded_models()]
+            try:
+                # Ở chế độ worker pool, mô hình chỉ được load trong các worker
+                if not worker_pool_enabled() and (selected_model, selected_backend) not in loaded:
+                    with st.spinner(f"Đang load mô hình {selected_model} ({selected_backend})..."):
+                        get_shared_model(model_name=selected_model, device='cpu', backend=selected_backend)
+                    st.success(f"✅ Đã load mô hình {selected_model}!")
+                st.session_state.model_name = selected_model
+                st.session_state.model_backend = selected_backend
+                st.session_state.class_names = get_class()
+            except Exception as e:
+                st.error(f"❌ Lỗi khi load mô hình: {e}")
+                selected_model = None
+            
+            with st.expander("🧠 Mô hình đang load"):
+                for info in get_model_registry().loaded_models():
+                    st.markdown(f"• `{info['name']}` ({info['device']}, {info['backend']}) - {info['size_mb']} MB, load {info['load_seconds']}s")
+                if selected_model == "cascade" and not worker_pool_enabled():
+                    from utils.cascade import get_cascade_stats
+                    for stats in get_cascade_stats():
+                        st.markdown(f"• Cascade {' → '.join(stats['models'])}: {stats['images']} ảnh, "
+                                    f"chuyển sang mô hình thứ hai {stats['escalation_rate']:.0%}")
+        
+        result_cache = get_result_cache()
+        if result_cache is not None:
+            with st.expander("🗃️ Cache kết quả"):
+                cache_stats = result_cache.stats()
+                st.markdown(f"• Hit rate: {cache_stats['hit_rate']:.0%} ({cache_stats['memory_hits'] + cache_stats['disk_hits']} hit / {cache_stats['misses']} miss)")
+                st.markdown(f"• Đang lưu trong bộ nhớ: {cache_stats['memory_entries']} kết quả")
         
         st.markdown("---")
         st.markdown("### � Hướng dẫn chụp ảnh CCCD:")
@@ -506,6 +374,12 @@ def main():
                 2. Ảnh mặt sau không cần thiết cho CCCD cũ
                 3. Nhấn "Bắt đầu xử lý"
                 """)
+        elif input_method == "🎥 Video":
+            st.markdown(f"""
+            1. Quay video **mặt {'sau' if cccd_type == "CCCD Mới" else 'trước'}**, giữ QR code trong khung hình vài giây
+            2. Chỉ các khung hình nét, không bị chói mới được giải mã; dừng ngay khi đọc được QR
+            3. Nhấn "Bắt đầu xử lý"
+            """)
         else:  # Camera
             if cccd_type == "CCCD Mới":
                 st.markdown("""
@@ -523,7 +397,7 @@ def main():
         st.markdown("---")
         st.markdown("### 🔧 Tính năng:")
         st.markdown("""
-        - � Quét QR code tự động (3 scale)
+        - 🔍 Quét QR code tự động (định vị vùng QR, giải mã song song nhiều biến thể)
         - 📝 OCR văn bản tiếng Việt
         - 🎯 Object Detection + OCR (YOLO)
         - ✅ Validation thông tin bắt buộc
@@ -540,8 +414,43 @@ def main():
         
         front_source = None
         back_source = None
+        video_source = None
         
-        if input_method == "📁 Upload file":
+        if input_method == "🎥 Video":
+            # Giao diện upload video mặt chứa QR
+            video_col1, video_col2 = st.columns(2)
+            qr_side = "mặt sau" if cccd_type == "CCCD Mới" else "mặt trước"
+            
+            with video_col1:
+                st.subheader(f"🎥 Video {qr_side}")
+                video_source = st.file_uploader(
+                    f"Upload video {qr_side} CCCD:",
+                    type=['mp4', 'mov', 'avi', 'webm'],
+                    help="Hỗ trợ định dạng: MP4, MOV, AVI, WEBM",
+                    key="qr_video"
+                )
+                if video_source is not None:
+                    st.video(video_source)
+            
+            if cccd_type == "CCCD Mới":
+                with video_col2:
+                    st.subheader("📄 Ảnh mặt trước")
+                    front_source = st.file_uploader(
+                        "Upload ảnh mặt trước CCCD (tùy chọn):",
+                        type=['jpg', 'jpeg', 'png'],
+                        help="Dùng để OCR khi không đọc được QR trên video",
+                        key="front_upload_video"
+                    )
+                    if front_source is not None:
+                        st.image(front_source, caption="Mặt trước", use_container_width=True)
+            
+            # Video thay cho ảnh mặt chứa QR
+            if cccd_type == "CCCD Mới":
+                back_source = video_source
+            else:
+                front_source = video_source
+        
+        elif input_method == "📁 Upload file":
             # Giao diện upload file
             upload_col1, upload_col2 = st.columns(2)
             
@@ -555,8 +464,7 @@ def main():
                 )
                 
                 if front_source is not None:
-                    image_front = Image.open(front_source)
-                    st.image(image_front, caption="Mặt trước", use_container_width=True)
+                    st.image(front_source, caption="Mặt trước", use_container_width=True)
             
             with upload_col2:
                 st.subheader("📄 Ảnh mặt sau")
@@ -568,8 +476,7 @@ def main():
                 )
                 
                 if back_source is not None:
-                    image_back = Image.open(back_source)
-                    st.image(image_back, caption="Mặt sau", use_container_width=True)
+                    st.image(back_source, caption="Mặt sau", use_container_width=True)
         
         else:  # Camera input
             # Giao diện chụp camera
@@ -580,7 +487,8 @@ def main():
                 with st.expander("📷 Camera mặt trước", expanded=True):
                     front_camera = st.camera_input("Chụp ảnh mặt trước CCCD", key="front_camera")
                     if front_camera is not None:
-                        front_source = Image.open(front_camera)
+                        # Giữ nguyên file JPEG từ camera, giải mã một lần khi xử lý
+                        front_source = front_camera
                         st.image(front_source, caption="Mặt trước (vừa chụp)", use_container_width=True)
             
             with camera_col2:
@@ -588,7 +496,7 @@ def main():
                 with st.expander("📷 Camera mặt sau", expanded=True):
                     back_camera = st.camera_input("Chụp ảnh mặt sau CCCD", key="back_camera")
                     if back_camera is not None:
-                        back_source = Image.open(back_camera)
+                        back_source = back_camera
                         st.image(back_source, caption="Mặt sau (vừa chụp)", use_container_width=True)
         
         # Nút xử lý
@@ -626,18 +534,29 @@ def main():
                     # Chuẩn bị tham số cho object detection
                     detection_model = None
                     class_names = None
-                    if ocr_method == "Object Detection + OCR":
-                        detection_model = st.session_state.get('detection_model')
+                    if ocr_method == "Object Detection + OCR" and selected_model is not None and not worker_pool_enabled():
+                        detection_model = get_shared_model(model_name=selected_model, device='cpu', backend=selected_backend)
                         class_names = st.session_state.get('class_names')
                     
-                    results = process_images_from_source(
-                        front_source, 
-                        back_source, 
-                        cccd_type, 
-                        ocr_method=ocr_method,
-                        detection_model=detection_model,
-                        class_names=class_names
-                    )
+                    with trace_request('streamlit', cccd_type=cccd_type, ocr_method=ocr_method):
+                        if video_source is not None:
+                            results = process_video_from_source(
+                                video_source,
+                                front_source if cccd_type == "CCCD Mới" else None,
+                                cccd_type,
+                                ocr_method=ocr_method,
+                                detection_model=detection_model,
+                                class_names=class_names
+                            )
+                        else:
+                            results = process_images_from_source(
+                                front_source, 
+                                back_source, 
+                                cccd_type, 
+                                ocr_method=ocr_method,
+                                detection_model=detection_model,
+                                class_names=class_names
+                            )
     
     with col2:
         st.header("ℹ️ Thông tin")
@@ -647,20 +566,20 @@ def main():
         if cccd_type == "CCCD Mới":
             st.markdown("""
             **Quy trình:**
-            1. Quét QR code ở mặt sau (scale 1→3)
+            1. Quét QR code ở mặt sau (định vị vùng QR, giải mã song song nhiều biến thể)
             2. Nếu thất bại → OCR mặt trước
             """)
         else:
             st.markdown("""
             **Quy trình:**
-            1. Quét QR code ở mặt trước (scale 1→3)
+            1. Quét QR code ở mặt trước (định vị vùng QR, giải mã song song nhiều biến thể)
             2. Nếu thất bại → OCR mặt trước
             """)
         
         st.markdown("---")
         st.markdown("### 🔧 Tính năng:")
         st.markdown("""
-        - ✅ Quét QR code tự động với 3 scale
+        - ✅ Quét QR code tự động, giải mã song song nhiều scale / biến thể ảnh
         - ✅ OCR văn bản tiếng Việt
         - ✅ Object Detection + OCR (YOLO)
         - 🎯 Mapping thông tin theo trường
@@ -688,6 +607,18 @@ def main():
             for en_key, vn_label in vn_labels.items():
                 if en_key in optional:
                     st.markdown(f"• {vn_label}")
+            
+            partial = st.session_state.partial_result
+            if partial.fields and partial.cccd_type == cccd_type:
+                st.markdown("---")
+                st.markdown("### 📌 Đã đọc được (chờ chụp lại):")
+                accepted = partial.accepted()
+                for en_key, (text_value, confidence) in partial.fields.items():
+                    mark = "✅" if en_key in accepted else "❔"
+                    st.markdown(f"• {mark} {vn_labels.get(en_key, en_key)}: {text_value} ({confidence:.0%})")
+                if st.button("🔄 Bắt đầu thẻ mới"):
+                    partial.reset(cccd_type)
+                    st.rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,375 @@
+"""
+Quét hàng loạt ảnh CCCD (thư mục, file zip hoặc manifest CSV) bằng cùng pipeline với ứng dụng Streamlit.
+
+Ví dụ:
+    python batch_scan.py --input anh_cccd/ --output ket_qua.jsonl
+    python batch_scan.py --input anh_cccd.zip --output ket_qua.csv --cccd-type "CCCD Cũ"
+    python batch_scan.py --input manifest.csv --output ket_qua.jsonl --ocr-method "Object Detection + OCR" --model yolov11
+
+Ghép cặp ảnh trong thư mục / zip theo tên file: <id>_front.jpg + <id>_back.jpg (hoặc _truoc / _sau).
+Ảnh không có cặp được coi là mặt chứa QR của loại CCCD đã chọn (mặt sau cho CCCD Mới, mặt trước cho CCCD Cũ).
+Manifest CSV cần cột id, front, back (đường dẫn tương đối so với file manifest), tùy chọn cccd_type.
+
+Id của thẻ là đường dẫn tương đối so với thư mục / zip đầu vào (vd. a/001), nên ảnh cùng tên ở hai thư mục con
+không ghi đè lên nhau.
+
+Chạy lại cùng lệnh với cùng --output sẽ bỏ qua các id đã xử lý thành công (resume sau khi bị dừng); các thẻ
+bị lỗi (kể cả do worker chết) được chạy lại và kết quả mới được ghi thêm, dòng sau cùng của mỗi id là kết quả cuối.
+Thêm --skip-errors để không chạy lại thẻ bị lỗi.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zipfile
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils.pipeline import CCCD_TYPES, OCR_METHODS, decode_image_bytes
+from utils.result_cache import hash_image_bytes
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+SIDE_PATTERN = re.compile(r'^(?P<id>.+?)[_\-.](?P<side>front|back|truoc|sau)$', re.IGNORECASE)
+FRONT_SIDES = ('front', 'truoc')
+CSV_COLUMNS = ['id', 'front', 'back', 'cccd_type', 'status', 'source', 'error', 'qr_code', 'fields', 'seconds']
+
+
+def group_by_card(names, cccd_type, root=''):
+    """
+    Ghép tên file thành cặp (front, back) theo hậu tố _front / _back (_truoc / _sau)
+
+    Parameters:
+        names: Đường dẫn file (hoặc tên member trong zip)
+        cccd_type: Loại CCCD, quyết định mặt của ảnh không có hậu tố
+        root: Thư mục gốc; id gồm cả thư mục con tương đối so với root
+
+    Returns:
+        OrderedDict: id -> {'front': name | None, 'back': name | None}
+    """
+    cards = OrderedDict()
+    for name in sorted(names):
+        folder, filename = os.path.split(name)
+        stem = os.path.splitext(filename)[0]
+        match = SIDE_PATTERN.match(stem)
+        if match:
+            card_id = match.group('id')
+            side = 'front' if match.group('side').lower() in FRONT_SIDES else 'back'
+        else:
+            card_id = stem
+            side = 'back' if cccd_type == "CCCD Mới" else 'front'
+        folder = os.path.relpath(folder, root) if root and folder else folder
+        if folder not in ('', os.curdir):
+            card_id = f"{folder.replace(os.sep, '/').strip('/')}/{card_id}"
+        cards.setdefault(card_id, {'front': None, 'back': None})[side] = name
+    return cards
+
+
+def iter_jobs(input_path, cccd_type):
+    """
+    Sinh các job {'id', 'front', 'back', 'cccd_type'}; front / back là đường dẫn hoặc (zip, member)
+    """
+    if os.path.isdir(input_path):
+        names = [
+            os.path.join(root, f)
+            for root, _, files in os.walk(input_path)
+            for f in files if f.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+        for card_id, sides in group_by_card(names, cccd_type, root=input_path).items():
+            yield {'id': card_id, 'cccd_type': cccd_type, **sides}
+
+    elif zipfile.is_zipfile(input_path):
+        with zipfile.ZipFile(input_path) as archive:
+            names = [n for n in archive.namelist() if n.lower().endswith(IMAGE_EXTENSIONS)]
+        for card_id, sides in group_by_card(names, cccd_type).items():
+            yield {
+                'id': card_id,
+                'cccd_type': cccd_type,
+                'front': (input_path, sides['front']) if sides['front'] else None,
+                'back': (input_path, sides['back']) if sides['back'] else None,
+            }
+
+    elif input_path.lower().endswith('.csv'):
+        base_dir = os.path.dirname(os.path.abspath(input_path))
+        with open(input_path, newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                yield {
+                    'id': row['id'],
+                    'cccd_type': row.get('cccd_type') or cccd_type,
+                    'front': os.path.join(base_dir, row['front']) if row.get('front') else None,
+                    'back': os.path.join(base_dir, row['back']) if row.get('back') else None,
+                }
+
+    else:
+        raise ValueError(f"Không hỗ trợ input: {input_path} (cần thư mục, file .zip hoặc manifest .csv)")
+
+
+_zip_handles = threading.local()
+
+
+def read_bytes(ref):
+    if ref is None:
+        return None
+    if isinstance(ref, tuple):
+        # Mỗi thread prefetch mở zip riêng (ZipFile không an toàn khi đọc song song)
+        zip_path, member = ref
+        archives = _zip_handles.__dict__.setdefault('archives', {})
+        if zip_path not in archives:
+            archives[zip_path] = zipfile.ZipFile(zip_path)
+        return archives[zip_path].read(member)
+    with open(ref, 'rb') as f:
+        return f.read()
+
+
+def load_job_images(job):
+    front = read_bytes(job['front'])
+    back = read_bytes(job['back'])
+    image_hashes = {
+        'front': hash_image_bytes(front) if front is not None else None,
+        'back': hash_image_bytes(back) if back is not None else None,
+    }
+    return (
+        decode_image_bytes(front) if front is not None else None,
+        decode_image_bytes(back) if back is not None else None,
+        image_hashes,
+    )
+
+
+def describe(ref):
+    if ref is None:
+        return ''
+    if isinstance(ref, tuple):
+        return f"{ref[0]}:{ref[1]}"
+    return ref
+
+
+def make_record(job, results=None, error=None, seconds=0.0):
+    record = {
+        'id': job['id'],
+        'front': describe(job['front']),
+        'back': describe(job['back']),
+        'cccd_type': job['cccd_type'],
+        'status': 'ok',
+        'source': None,
+        'error': error,
+        'qr_code': None,
+        'fields': None,
+        'seconds': round(seconds, 3),
+    }
+    if results is not None:
+        record['qr_code'] = results.get('qr_code')
+        if results.get('qr_code'):
+            record['source'], record['fields'] = 'qr', results.get('qr_info')
+        elif 'detected_info' in results:
+            record['source'], record['fields'] = 'detection', results['detected_info']
+        elif 'ocr_text' in results:
+            record['source'], record['fields'] = 'ocr', results['ocr_text']
+        record['error'] = results.get('error')
+    if record['error']:
+        record['status'] = 'error'
+    return record
+
+
+class ResultWriter:
+    """
+    Ghi kết quả ngay khi mỗi job xong (JSONL hoặc CSV), hỗ trợ resume
+    """
+
+    def __init__(self, path, skip_errors=False):
+        self.path = path
+        self.format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+        self.skip_errors = skip_errors
+        self.done_ids = self._load_done_ids()
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', newline='', encoding='utf-8')
+        if self.format == 'csv':
+            self._csv = csv.DictWriter(self._file, fieldnames=CSV_COLUMNS)
+            if is_new:
+                self._csv.writeheader()
+
+    def _load_done_ids(self):
+        if not os.path.exists(self.path):
+            return set()
+
+        # Bỏ dòng cuối bị ghi dở khi tiến trình bị dừng đột ngột
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+        # Trạng thái cuối cùng của mỗi id (thẻ chạy lại được ghi thêm dòng mới)
+        status = {}
+        with open(self.path, newline='', encoding='utf-8') as f:
+            if self.format == 'csv':
+                rows = csv.DictReader(f)
+            else:
+                rows = []
+                for line in f:
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        continue
+            for row in rows:
+                if 'id' in row:
+                    status[row['id']] = row.get('status')
+        # Thẻ bị lỗi (kể cả do worker chết giữa chừng) được chạy lại, trừ khi dùng --skip-errors
+        return {card_id for card_id, state in status.items() if state == 'ok' or self.skip_errors}
+
+    def write(self, record):
+        if self.format == 'csv':
+            row = dict(record)
+            row['fields'] = json.dumps(record['fields'], ensure_ascii=False) if record['fields'] is not None else ''
+            self._csv.writerow(row)
+        else:
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class Progress:
+    def __init__(self, total, interval=2.0):
+        self.total = total
+        self.done = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+        self.interval = interval
+        self._last = 0.0
+
+    def update(self, record, force=False):
+        if record is not None:
+            self.done += 1
+            self.errors += record['status'] == 'error'
+        now = time.perf_counter()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else float('inf')
+        eta_text = time.strftime('%H:%M:%S', time.gmtime(eta)) if eta != float('inf') else '--:--:--'
+        print(
+            f"\r{self.done}/{self.total} thẻ | {rate:.2f} thẻ/s | lỗi {self.errors} | ETA {eta_text}",
+            end='', file=sys.stderr, flush=True
+        )
+
+
+class InProcessRunner:
+    """
+    Chạy pipeline bằng thread trong process hiện tại (--workers 0)
+    """
+
+    def __init__(self, threads, model_name, ocr_method):
+        from utils.model_inference import get_class
+        from utils.model_registry import get_shared_model
+
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+        self._model = get_shared_model(model_name=model_name) if ocr_method == "Object Detection + OCR" else None
+        self._class_names = get_class()
+
+    def process_cccd(self, front_img, back_img, cccd_type, ocr_method, model_name=None, image_hashes=None):
+        from utils.pipeline import process_cccd
+        from utils.result_cache import get_result_cache
+
+        return self._executor.submit(process_cccd, front_img, back_img, cccd_type, ocr_method=ocr_method,
+                                     detection_model=self._model, class_names=self._class_names,
+                                     cache=get_result_cache(), image_hashes=image_hashes, model_name=model_name)
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+
+def run(args):
+    writer = ResultWriter(args.output, skip_errors=args.skip_errors)
+    jobs = [job for job in iter_jobs(args.input, args.cccd_type) if job['id'] not in writer.done_ids]
+    if writer.done_ids:
+        print(f"Resume: bỏ qua {len(writer.done_ids)} thẻ đã có kết quả", file=sys.stderr)
+
+    if args.workers > 0:
+        from utils.worker_pool import WorkerPool
+        runner = WorkerPool(args.workers, model_names=[args.model] if args.ocr_method == "Object Detection + OCR" else ())
+    else:
+        runner = InProcessRunner(args.threads, args.model, args.ocr_method)
+
+    max_inflight = max(1, args.workers or args.threads) * 2
+    progress = Progress(len(jobs), interval=args.progress_interval)
+    pending = deque()
+    inflight = {}
+    job_iter = iter(jobs)
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.prefetch, thread_name_prefix='prefetch') as decoder:
+            while True:
+                # Giải mã trước ảnh của các job kế tiếp
+                while len(pending) < args.prefetch * 2:
+                    job = next(job_iter, None)
+                    if job is None:
+                        break
+                    pending.append((job, decoder.submit(load_job_images, job), time.perf_counter()))
+
+                # Đưa các job đã giải mã xong sang worker (giữ đúng thứ tự, giới hạn số job đang chạy)
+                while pending and pending[0][1].done() and len(inflight) < max_inflight:
+                    job, decoded, started = pending.popleft()
+                    try:
+                        front_img, back_img, image_hashes = decoded.result()
+                        future = runner.process_cccd(front_img, back_img, job['cccd_type'],
+                                                     ocr_method=args.ocr_method, model_name=args.model,
+                                                     image_hashes=image_hashes)
+                    except Exception as e:
+                        record = make_record(job, error=str(e), seconds=time.perf_counter() - started)
+                        writer.write(record)
+                        progress.update(record)
+                        continue
+                    inflight[future] = (job, started)
+
+                if not pending and not inflight:
+                    break
+
+                waiting = set(inflight)
+                if pending and len(inflight) < max_inflight:
+                    waiting.add(pending[0][1])
+                done, _ = wait(waiting, timeout=args.progress_interval, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    if future not in inflight:
+                        continue
+                    job, started = inflight.pop(future)
+                    seconds = time.perf_counter() - started
+                    try:
+                        record = make_record(job, results=future.result(), seconds=seconds)
+                    except Exception as e:
+                        record = make_record(job, error=str(e), seconds=seconds)
+                    writer.write(record)
+                    progress.update(record)
+                progress.update(None)
+    finally:
+        progress.update(None, force=True)
+        print(file=sys.stderr)
+        runner.shutdown()
+        writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', required=True, help='Thư mục ảnh, file .zip hoặc manifest .csv')
+    parser.add_argument('--output', required=True, help='File kết quả .jsonl hoặc .csv (ghi tiếp nếu đã tồn tại)')
+    parser.add_argument('--cccd-type', default="CCCD Mới", choices=CCCD_TYPES)
+    parser.add_argument('--ocr-method', default="OCR trực tiếp", choices=OCR_METHODS)
+    parser.add_argument('--model', default='yolov8', help='Mô hình YOLO khi dùng Object Detection + OCR')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help='Số worker process (0 = chạy bằng thread trong process hiện tại)')
+    parser.add_argument('--threads', type=int, default=2, help='Số thread xử lý khi --workers 0')
+    parser.add_argument('--prefetch', type=int, default=4, help='Số thread đọc và giải mã ảnh trước')
+    parser.add_argument('--progress-interval', type=float, default=2.0, help='Chu kỳ in tiến độ (giây)')
+    parser.add_argument('--skip-errors', action='store_true', help='Khi resume, không chạy lại các thẻ đã bị lỗi')
+    args = parser.parse_args()
+
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Compare detector backends (latency and agreement with PyTorch) on the same images.
+
+Usage:
+    python benchmarks/compare_backends.py --images path/to/cards --models yolov8 yolov11 \
+        --backends pytorch onnx onnx-int8 openvino --threads 4 --output backends.json
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.model_inference import get_backends, get_model, predict_boxes
+
+
+def load_images(pattern):
+    if os.path.isdir(pattern):
+        paths = sorted(
+            path for ext in ('jpg', 'jpeg', 'png')
+            for path in glob.glob(os.path.join(pattern, f'*.{ext}'))
+        )
+    else:
+        paths = sorted(glob.glob(pattern))
+
+    images = []
+    for path in paths:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is not None:
+            images.append((path, image))
+    return images
+
+
+def box_iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_boxes(reference, candidate, iou_threshold=0.5):
+    """
+    Greedy same-class matching of candidate boxes against reference boxes.
+
+    Returns:
+        matched : int : Number of matched pairs
+        ious : list : IoU of each matched pair
+    """
+    ious = []
+    used = set()
+    for ref in reference:
+        best, best_j = 0.0, None
+        for j, cand in enumerate(candidate):
+            if j in used or int(cand[5]) != int(ref[5]):
+                continue
+            iou = box_iou(ref, cand)
+            if iou > best:
+                best, best_j = iou, j
+        if best_j is not None and best >= iou_threshold:
+            used.add(best_j)
+            ious.append(best)
+    return len(ious), ious
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def run_backend(model_name, backend, images, threads, repeat, warmup):
+    start = time.perf_counter()
+    model = get_model(model_name=model_name, device='cpu', backend=backend, num_threads=threads)
+    load_seconds = time.perf_counter() - start
+
+    for _, image in images[:warmup]:
+        predict_boxes(model, [image])
+
+    latencies = []
+    predictions = []
+    for _, image in images:
+        boxes = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            boxes = predict_boxes(model, [image])[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+        predictions.append(np.asarray(boxes))
+
+    return load_seconds, latencies, predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', required=True, help='Image directory or glob pattern')
+    parser.add_argument('--models', nargs='+', default=['yolov8', 'yolov11'])
+    parser.add_argument('--backends', nargs='+', default=get_backends(), choices=get_backends())
+    parser.add_argument('--threads', type=int, default=0, help='Intra-op threads for exported backends (0 = runtime default)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        parser.error(f"No images found at {args.images}")
+
+    report = []
+    for model_name in args.models:
+        reference = None
+        for backend in args.backends:
+            load_seconds, latencies, predictions = run_backend(
+                model_name, backend, images, args.threads, args.repeat, args.warmup
+            )
+            # The first backend in the list (pytorch by default) is the accuracy reference
+            if reference is None:
+                reference = predictions
+
+            total_ref = sum(len(p) for p in reference)
+            total_cand = sum(len(p) for p in predictions)
+            matched, ious = 0, []
+            for ref, cand in zip(reference, predictions):
+                m, pair_ious = match_boxes(ref, cand)
+                matched += m
+                ious.extend(pair_ious)
+
+            row = {
+                'model': model_name,
+                'backend': backend,
+                'images': len(images),
+                'load_seconds': round(load_seconds, 3),
+                'latency_ms_p50': round(percentile(latencies, 50), 2),
+                'latency_ms_p95': round(percentile(latencies, 95), 2),
+                'latency_ms_mean': round(float(np.mean(latencies)), 2),
+                'recall_vs_reference': round(matched / total_ref, 4) if total_ref else 1.0,
+                'precision_vs_reference': round(matched / total_cand, 4) if total_cand else 1.0,
+                'mean_iou_vs_reference': round(float(np.mean(ious)), 4) if ious else 0.0,
+            }
+            report.append(row)
+            print(
+                f"{model_name:8s} {backend:10s} p50={row['latency_ms_p50']:8.2f}ms "
+                f"p95={row['latency_ms_p95']:8.2f}ms recall={row['recall_vs_reference']:.3f} "
+                f"precision={row['precision_vs_reference']:.3f} iou={row['mean_iou_vs_reference']:.3f}"
+            )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
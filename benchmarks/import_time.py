@@ -0,0 +1,149 @@
+"""
+Report the cold-start import time of the app's entry points and which heavy libraries they pull in.
+
+Every module is imported in a fresh interpreter with `python -X importtime`, so the numbers
+include everything the import drags in. Modules on the serving path must not load torch,
+EasyOCR, ultralytics or matplotlib at import time; the report fails (exit code 1) if one does,
+or if a module exceeds --budget-ms. Pass an earlier --output file to --compare to track regressions.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --modules utils.pipeline utils.qr_engine --budget-ms 800
+    python benchmarks/import_time.py --output imports.json --compare imports_old.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    'utils.ingest',
+    'utils.qr_engine',
+    'utils.pipeline',
+    'utils.ocr',
+    'utils.model_inference',
+    'utils.reader_pool',
+    'utils.worker_pool',
+    'qr_service',
+    'batch_scan',
+    'api',
+    'app',
+]
+
+# Libraries that cost seconds to import and are only needed once a model actually runs
+HEAVY_PACKAGES = ['torch', 'torchvision', 'easyocr', 'ultralytics', 'matplotlib', 'onnxruntime', 'openvino']
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output.
+
+    Returns:
+        list : (module, self_us, cumulative_us, depth) in import-completion order
+    """
+    rows = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def measure_import(module, top=10):
+    """
+    Import `module` in a fresh interpreter and summarize what it cost.
+
+    Returns:
+        dict : total_ms, heavy packages loaded, slowest top-level dependencies, or 'error'
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'},
+    )
+    rows = parse_importtime(proc.stderr)
+    report = {'module': module}
+    if proc.returncode != 0:
+        report['error'] = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'import failed'
+
+    own = [row for row in rows if row[0] == module]
+    report['total_ms'] = round((own[-1][2] if own else sum(row[1] for row in rows)) / 1000, 1)
+
+    loaded = {row[0].split('.')[0] for row in rows}
+    report['heavy'] = [package for package in HEAVY_PACKAGES if package in loaded]
+
+    # Direct dependencies: the depth-1 rows printed just before the module's own row
+    direct = []
+    end = max((i for i, row in enumerate(rows) if row[0] == module), default=None)
+    if end is not None:
+        for name, _, cumulative, depth in reversed(rows[:end]):
+            if depth == 0:
+                break
+            if depth == 1:
+                direct.append((name, cumulative))
+    direct.sort(key=lambda dep: -dep[1])
+    report['slowest'] = [{'module': name, 'ms': round(cumulative / 1000, 1)} for name, cumulative in direct[:top]]
+    return report
+
+
+def compare(reports, baseline_path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {row['module']: row for row in json.load(f)['results']}
+
+    print(f"\nChange vs {baseline_path}:")
+    for row in reports:
+        old = baseline.get(row['module'])
+        if old is None:
+            continue
+        delta = row['total_ms'] - old['total_ms']
+        print(f"{row['module']:24s} {old['total_ms']:9.1f} -> {row['total_ms']:9.1f} ms ({delta:+.1f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', nargs='+', default=MODULES)
+    parser.add_argument('--budget-ms', type=float, default=None, help='Fail if any module takes longer to import')
+    parser.add_argument('--allow-heavy', nargs='*', default=[],
+                        help='Modules allowed to load heavy packages at import time')
+    parser.add_argument('--top', type=int, default=5, help='Slowest dependencies listed per module')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Earlier JSON output to compare against')
+    args = parser.parse_args()
+
+    reports = []
+    failed = False
+    for module in args.modules:
+        report = measure_import(module, top=args.top)
+        reports.append(report)
+
+        problems = []
+        if 'error' in report:
+            problems.append(f"error: {report['error']}")
+        if report['heavy'] and module not in args.allow_heavy:
+            problems.append(f"loads {', '.join(report['heavy'])}")
+        if args.budget_ms is not None and report['total_ms'] > args.budget_ms:
+            problems.append(f"over budget ({args.budget_ms:g} ms)")
+        failed = failed or bool(problems)
+
+        slowest = ', '.join(f"{dep['module']} {dep['ms']:.0f}ms" for dep in report['slowest'])
+        print(f"{module:24s} {report['total_ms']:9.1f} ms  {'FAIL ' + '; '.join(problems) if problems else 'ok'}")
+        if slowest:
+            print(f"{'':24s} slowest: {slowest}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'results': reports}, f, indent=2)
+    if args.compare:
+        compare(reports, args.compare)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""
+Benchmark each pipeline stage and the end-to-end scan on synthetic CCCD images.
+
+Images come from benchmarks/synthetic_cards.py (seeded, no network), rendered at
+several resolutions, rotations and noise levels. For every stage and variant the
+suite reports latency percentiles, throughput, peak traced memory and how often
+the stage produced the right answer. Results are written as JSON; pass an older
+file to --compare to print the change per stage.
+
+Usage:
+    python benchmarks/run_benchmarks.py --count 10 --output bench.json
+    python benchmarks/run_benchmarks.py --stages decode qr --resolutions 1000 4000 --no-model
+    python benchmarks/run_benchmarks.py --output new.json --compare bench.json
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_cards import encode_jpeg, generate_cards, make_variant
+from utils.metrics import process_rss_bytes
+from utils.model_inference import apply_rotation, estimate_rotation, get_class, predict_boxes, rotate_if_necessary
+from utils.pipeline import decode_image_bytes, process_cccd
+from utils.qr_engine import decode_qr_fast
+from utils.quality import check_image_quality
+
+STAGES = ['decode', 'quality', 'rotate', 'orientation', 'qr', 'detect', 'ocr_detection', 'end_to_end']
+MODEL_STAGES = {'detect', 'ocr_detection'}
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def build_variants(resolutions, rotations, noises, matrix):
+    """
+    Variant grid: every combination ('full'), or each axis varied alone around the first value ('axes').
+    """
+    if matrix == 'full':
+        return list(itertools.product(resolutions, rotations, noises))
+    base = (resolutions[0], rotations[0], noises[0])
+    variants = [base]
+    for axis, values in enumerate((resolutions, rotations, noises)):
+        for value in values[1:]:
+            variant = list(base)
+            variant[axis] = value
+            variants.append(tuple(variant))
+    return variants
+
+
+def prepare_inputs(cards, long_side, rotation, noise, seed):
+    rng = np.random.default_rng(seed)
+    inputs = []
+    for card in cards:
+        front = make_variant(card['front'], long_side, rotation, noise, rng)
+        back = make_variant(card['back'], long_side, rotation, noise, rng)
+        inputs.append({
+            'card': card,
+            'front': front,
+            'back': back,
+            'front_bytes': encode_jpeg(front),
+            'back_bytes': encode_jpeg(back),
+        })
+    return inputs
+
+
+def make_stage(stage, model, class_names, ocr_method):
+    """
+    Return fn(input) -> bool (whether the stage produced the expected result) for one stage.
+    """
+    if stage == 'decode':
+        return lambda item: decode_image_bytes(item['front_bytes']) is not None
+
+    if stage == 'quality':
+        def run_quality(item):
+            try:
+                check_image_quality(item['front'])
+            except ValueError:
+                return False
+            return True
+        return run_quality
+
+    if stage == 'rotate':
+        def run_rotate(item):
+            height, width = rotate_if_necessary(item['front']).shape[:2]
+            return width >= height
+        return run_rotate
+
+    if stage == 'orientation':
+        def run_orientation(item):
+            height, width = apply_rotation(item['front'], estimate_rotation(item['front'])).shape[:2]
+            return width >= height
+        return run_orientation
+
+    if stage == 'qr':
+        def run_qr(item):
+            try:
+                return decode_qr_fast(item['back']) == item['card']['qr_payload']
+            except ValueError:
+                return False
+        return run_qr
+
+    if stage == 'detect':
+        return lambda item: len(predict_boxes(model, [item['front']])[0]) > 0
+
+    if stage == 'ocr_detection':
+        from utils.ocr import OCR_with_detection
+
+        def run_ocr(item):
+            try:
+                detected_info, _ = OCR_with_detection(item['front'], model, class_names)
+            except ValueError:
+                return False
+            digits = ''.join(c for c in detected_info.get('Số CCCD', '') if c.isdigit())
+            return digits == item['card']['identity']['id']
+        return run_ocr
+
+    if stage == 'end_to_end':
+        def run_end_to_end(item):
+            results = process_cccd(
+                decode_image_bytes(item['front_bytes']),
+                decode_image_bytes(item['back_bytes']),
+                "CCCD Mới",
+                ocr_method=ocr_method,
+                detection_model=model,
+                class_names=class_names,
+            )
+            return results.get('qr_code') == item['card']['qr_payload'] or bool(results.get('detected_info'))
+        return run_end_to_end
+
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def measure(fn, inputs, repeat, warmup, concurrency=1, trace_memory=True):
+    """
+    Time fn over the inputs.
+
+    Peak memory is measured in a separate pass, since tracemalloc slows allocation-heavy code down.
+
+    Returns:
+        dict : latency percentiles (ms), throughput, success rate and peak traced memory
+    """
+    for item in inputs[:warmup]:
+        fn(item)
+
+    def timed_call(item):
+        start = time.perf_counter()
+        ok = fn(item)
+        return time.perf_counter() - start, bool(ok)
+
+    work = [item for item in inputs for _ in range(repeat)]
+    gc.collect()
+    wall_start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(timed_call, work))
+    else:
+        outcomes = [timed_call(item) for item in work]
+    wall = time.perf_counter() - wall_start
+
+    latencies = [seconds * 1000 for seconds, _ in outcomes]
+    row = {
+        'runs': len(outcomes),
+        'latency_ms_p50': round(percentile(latencies, 50), 3),
+        'latency_ms_p90': round(percentile(latencies, 90), 3),
+        'latency_ms_p95': round(percentile(latencies, 95), 3),
+        'latency_ms_p99': round(percentile(latencies, 99), 3),
+        'latency_ms_mean': round(float(np.mean(latencies)), 3) if latencies else 0.0,
+        'latency_ms_max': round(max(latencies), 3) if latencies else 0.0,
+        'throughput_per_s': round(len(outcomes) / wall, 3) if wall > 0 else 0.0,
+        'success_rate': round(sum(ok for _, ok in outcomes) / len(outcomes), 4) if outcomes else 0.0,
+    }
+
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+        for item in inputs:
+            fn(item)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        row['peak_traced_mb'] = round(peak / (1024 * 1024), 2)
+    row['rss_mb'] = round(process_rss_bytes() / (1024 * 1024), 1)
+    return row
+
+
+def result_key(row):
+    return row['stage'], row['long_side'], row['rotation'], row['noise']
+
+
+def compare(report, baseline_path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {result_key(row): row for row in json.load(f)['results']}
+
+    print(f"\nChange vs {baseline_path}:")
+    for row in report['results']:
+        old = baseline.get(result_key(row))
+        if old is None:
+            continue
+
+        def change(field):
+            return (row[field] - old[field]) / old[field] * 100 if old[field] else 0.0
+
+        print(
+            f"{row['stage']:14s} {row['long_side']:>5} rot={row['rotation']:<5g} noise={row['noise']:<4g} "
+            f"p50 {old['latency_ms_p50']:9.2f} -> {row['latency_ms_p50']:9.2f} ms ({change('latency_ms_p50'):+6.1f}%)  "
+            f"throughput {change('throughput_per_s'):+6.1f}%  success {old['success_rate']:.2f} -> {row['success_rate']:.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=10, help='Number of synthetic cards')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    parser.add_argument('--resolutions', nargs='+', type=int, default=[1000, 2000, 4000], help='Longest image side in pixels')
+    parser.add_argument('--rotations', nargs='+', type=float, default=[0, 5, 180], help='Degrees counter-clockwise')
+    parser.add_argument('--noise', nargs='+', type=float, default=[0, 8, 20], help='Gaussian noise sigma (0-255)')
+    parser.add_argument('--matrix', choices=['axes', 'full'], default='axes',
+                        help="'axes' varies one dimension at a time around the first values, 'full' runs every combination")
+    parser.add_argument('--model', default='yolov8')
+    parser.add_argument('--backend', default=None, help='Detector backend (see get_backends())')
+    parser.add_argument('--no-model', action='store_true', help='Skip stages that need the YOLO weights')
+    parser.add_argument('--ocr-method', default="Object Detection + OCR")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=1, help='Concurrent callers for the end_to_end stage')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc pass')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Earlier JSON output to compare against')
+    args = parser.parse_args()
+
+    class_names = get_class()
+    model = None
+    model_load_seconds = None
+    stages = list(args.stages)
+    if not args.no_model and (MODEL_STAGES & set(stages) or args.ocr_method == "Object Detection + OCR"):
+        from utils.model_registry import get_shared_model
+
+        start = time.perf_counter()
+        model = get_shared_model(model_name=args.model, device='cpu', backend=args.backend)
+        model_load_seconds = round(time.perf_counter() - start, 3)
+    if model is None:
+        stages = [stage for stage in stages if stage not in MODEL_STAGES]
+
+    cards = generate_cards(args.count, args.seed)
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'opencv': cv2.__version__,
+            'model': args.model if model is not None else None,
+            'backend': args.backend,
+            'model_load_seconds': model_load_seconds,
+            'args': vars(args),
+        },
+        'results': [],
+    }
+
+    for long_side, rotation, noise in build_variants(args.resolutions, args.rotations, args.noise, args.matrix):
+        inputs = prepare_inputs(cards, long_side, rotation, noise, args.seed)
+        for stage in stages:
+            fn = make_stage(stage, model, class_names, args.ocr_method if model is not None else "OCR trực tiếp")
+            row = {'stage': stage, 'long_side': long_side, 'rotation': rotation, 'noise': noise}
+            row.update(measure(
+                fn, inputs, args.repeat, args.warmup,
+                concurrency=args.concurrency if stage == 'end_to_end' else 1,
+                trace_memory=not args.no_memory,
+            ))
+            report['results'].append(row)
+            print(
+                f"{stage:14s} {long_side:>5} rot={rotation:<5g} noise={noise:<4g} "
+                f"p50={row['latency_ms_p50']:9.2f}ms p95={row['latency_ms_p95']:9.2f}ms "
+                f"{row['throughput_per_s']:8.2f}/s success={row['success_rate']:.2f} "
+                f"peak={row.get('peak_traced_mb', 0):7.1f}MB"
+            )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+"""
+Generate synthetic CCCD images offline, for benchmarks and smoke tests.
+
+Front sides carry text fields laid out like the detector classes (get_class());
+back sides carry a QR code in the `cccd|cmnd|name|dob|gender|place|issue_date`
+format read by parse_qr_result. No real identity data or network access is used.
+
+Usage:
+    python benchmarks/synthetic_cards.py --count 20 --output synthetic_cards/
+    python batch_scan.py --input synthetic_cards/manifest.csv --output results.jsonl
+"""
+import argparse
+import csv
+import os
+import sys
+import unicodedata
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.model_inference import get_class
+
+# ID-1 card (85.6 x 54 mm) at 10 px/mm
+CARD_SIZE = (856, 540)
+
+FAMILY_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng', 'Bùi', 'Đỗ']
+MIDDLE_NAMES = ['Văn', 'Thị', 'Hữu', 'Minh', 'Ngọc', 'Thanh', 'Quốc', 'Đức']
+GIVEN_NAMES = ['An', 'Bình', 'Chi', 'Dũng', 'Giang', 'Hà', 'Hùng', 'Lan', 'Long', 'Mai', 'Nam', 'Phương', 'Sơn', 'Tâm']
+PLACES = [
+    'Phường Bến Nghé, Quận 1, TP. Hồ Chí Minh',
+    'Phường Tràng Tiền, Quận Hoàn Kiếm, Hà Nội',
+    'Xã Hòa Phước, Huyện Hòa Vang, Đà Nẵng',
+    'Phường Vĩnh Ninh, TP. Huế, Thừa Thiên Huế',
+    'Xã Tân Phú, Huyện Châu Thành, Tiền Giang',
+]
+
+# Field positions on the front side, as fractions of the card: (x1, y1, x2, y2)
+FRONT_LAYOUT = {
+    'id': (0.36, 0.30, 0.80, 0.38),
+    'name': (0.30, 0.42, 0.95, 0.49),
+    'dob': (0.52, 0.51, 0.75, 0.57),
+    'gender': (0.40, 0.59, 0.52, 0.65),
+    'nationality': (0.72, 0.59, 0.95, 0.65),
+    'origin_place': (0.30, 0.68, 0.95, 0.75),
+    'current_place': (0.30, 0.78, 0.95, 0.91),
+    'expire_date': (0.03, 0.86, 0.25, 0.92),
+}
+
+# Back side: the QR code plus the remaining classes
+BACK_LAYOUT = {
+    'qr': (0.70, 0.06, 0.96, 0.47),
+    'features': (0.04, 0.10, 0.60, 0.22),
+    'issue_date': (0.04, 0.28, 0.40, 0.35),
+    'finger_print': (0.04, 0.50, 0.30, 0.92),
+}
+
+FRONT_LABELS = {
+    'id': 'So / No.',
+    'name': 'Ho va ten / Full name',
+    'dob': 'Ngay sinh / Date of birth',
+    'gender': 'Gioi tinh / Sex',
+    'nationality': 'Quoc tich',
+    'origin_place': 'Que quan / Place of origin',
+    'current_place': 'Noi thuong tru / Place of residence',
+    'expire_date': 'Co gia tri den',
+}
+
+
+def ascii_fold(text):
+    """
+    Strip Vietnamese diacritics; OpenCV's Hershey fonts only draw ASCII.
+    """
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    return ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
+
+
+def random_identity(rng):
+    """
+    Build a random, clearly fake identity.
+
+    Returns:
+        dict : One value per field; dates are ddmmyyyy like the CCCD QR payload
+    """
+    def date(start_year, end_year):
+        return f"{rng.integers(1, 29):02d}{rng.integers(1, 13):02d}{rng.integers(start_year, end_year)}"
+
+    dob = date(1950, 2006)
+    issue_date = date(2016, 2024)
+    return {
+        'id': ''.join(str(d) for d in rng.integers(0, 10, 12)),
+        'cmnd': ''.join(str(d) for d in rng.integers(0, 10, 9)),
+        'name': f"{rng.choice(FAMILY_NAMES)} {rng.choice(MIDDLE_NAMES)} {rng.choice(GIVEN_NAMES)}",
+        'dob': dob,
+        'gender': str(rng.choice(['Nam', 'Nữ'])),
+        'nationality': 'Việt Nam',
+        'origin_place': str(rng.choice(PLACES)),
+        'current_place': str(rng.choice(PLACES)),
+        'issue_date': issue_date,
+        'expire_date': f"{dob[:4]}{int(dob[4:]) + 60}",
+        'features': 'Nốt ruồi cách 2cm trên đầu lông mày phải',
+    }
+
+
+def qr_payload(identity):
+    """
+    The CCCD QR string: cccd|cmnd|họ và tên|ngày sinh|giới tính|nơi thường trú|ngày cấp
+    """
+    return '|'.join(identity[key] for key in ('id', 'cmnd', 'name', 'dob', 'gender', 'current_place', 'issue_date'))
+
+
+def format_date(value):
+    return f"{value[0:2]}/{value[2:4]}/{value[4:8]}"
+
+
+def render_qr(payload, side):
+    """
+    Encode the payload with OpenCV's QR encoder and scale it to `side` pixels (BGR).
+    """
+    encoder = cv2.QRCodeEncoder.create()
+    qr = encoder.encode(payload)
+    qr = cv2.resize(qr, (side, side), interpolation=cv2.INTER_NEAREST)
+    return cv2.cvtColor(qr, cv2.COLOR_GRAY2BGR)
+
+
+def _pixel_box(box, size):
+    width, height = size
+    return int(box[0] * width), int(box[1] * height), int(box[2] * width), int(box[3] * height)
+
+
+def _draw_text(img, text, box, color=(20, 20, 20)):
+    x1, y1, x2, y2 = box
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    text = ascii_fold(text)
+
+    # Largest scale that fits the box
+    (width, height), _ = cv2.getTextSize(text, font, 1.0, 2)
+    scale = min((x2 - x1) / max(1, width), (y2 - y1) / max(1, height) * 0.8)
+    cv2.putText(img, text, (x1, y2 - max(1, (y2 - y1) // 6)), font, scale, color, max(1, int(round(scale * 2))), cv2.LINE_AA)
+
+
+def _blank_card(rng):
+    width, height = CARD_SIZE
+    base = np.array([rng.integers(215, 240), rng.integers(225, 245), rng.integers(230, 250)], dtype=np.uint8)
+    card = np.empty((height, width, 3), dtype=np.uint8)
+    card[...] = base
+    # Faint guilloche-like background pattern
+    for y in range(0, height, 12):
+        cv2.line(card, (0, y), (width, (y + 40) % height), (base - 12).tolist(), 1, cv2.LINE_AA)
+    return card
+
+
+def render_front(identity, rng, with_qr=False):
+    """
+    Draw the front side.
+
+    Parameters:
+        identity : dict : From random_identity()
+        rng : np.random.Generator
+        with_qr : bool : Put the QR code on the front (old-style card) instead of the back
+
+    Returns:
+        img : np.ndarray : BGR card image
+        boxes : dict : class name -> (x1, y1, x2, y2) in pixels
+    """
+    card = _blank_card(rng)
+    width, height = CARD_SIZE
+    cv2.putText(card, 'CAN CUOC CONG DAN', (int(0.34 * width), int(0.2 * height)),
+                cv2.FONT_HERSHEY_DUPLEX, 1.1, (40, 40, 160), 2, cv2.LINE_AA)
+    # Portrait placeholder
+    x1, y1, x2, y2 = _pixel_box((0.03, 0.30, 0.27, 0.80), CARD_SIZE)
+    cv2.rectangle(card, (x1, y1), (x2, y2), (150, 150, 150), -1)
+
+    values = dict(identity, dob=format_date(identity['dob']), expire_date=format_date(identity['expire_date']))
+    boxes = {}
+    for name, box in FRONT_LAYOUT.items():
+        x1, y1, x2, y2 = _pixel_box(box, CARD_SIZE)
+        label_height = max(8, (y2 - y1) // 3)
+        _draw_text(card, FRONT_LABELS[name], (x1, y1 - label_height, x1 + (x2 - x1) // 2, y1), color=(90, 90, 90))
+        _draw_text(card, values[name], (x1, y1, x2, y2))
+        boxes[name] = (x1, y1, x2, y2)
+
+    if with_qr:
+        x1, y1, x2, y2 = _pixel_box((0.80, 0.04, 0.97, 0.31), CARD_SIZE)
+        side = min(x2 - x1, y2 - y1)
+        card[y1:y1 + side, x1:x1 + side] = render_qr(qr_payload(identity), side)
+        boxes['qr'] = (x1, y1, x1 + side, y1 + side)
+    return card, boxes
+
+
+def render_back(identity, rng):
+    """
+    Draw the back side with the QR code.
+
+    Returns:
+        img : np.ndarray : BGR card image
+        boxes : dict : class name -> (x1, y1, x2, y2) in pixels
+    """
+    card = _blank_card(rng)
+    boxes = {}
+
+    x1, y1, x2, y2 = _pixel_box(BACK_LAYOUT['qr'], CARD_SIZE)
+    side = min(x2 - x1, y2 - y1)
+    card[y1:y1 + side, x1:x1 + side] = render_qr(qr_payload(identity), side)
+    boxes['qr'] = (x1, y1, x1 + side, y1 + side)
+
+    x1, y1, x2, y2 = _pixel_box(BACK_LAYOUT['features'], CARD_SIZE)
+    _draw_text(card, identity['features'], (x1, y1, x2, y2))
+    boxes['features'] = (x1, y1, x2, y2)
+
+    x1, y1, x2, y2 = _pixel_box(BACK_LAYOUT['issue_date'], CARD_SIZE)
+    _draw_text(card, format_date(identity['issue_date']), (x1, y1, x2, y2))
+    boxes['issue_date'] = (x1, y1, x2, y2)
+
+    # Fingerprint placeholder: concentric ellipses
+    x1, y1, x2, y2 = _pixel_box(BACK_LAYOUT['finger_print'], CARD_SIZE)
+    center = ((x1 + x2) // 2, (y1 + y2) // 2)
+    for r in range(4, min(x2 - x1, y2 - y1) // 2, 5):
+        cv2.ellipse(card, center, (r, int(r * 1.3)), 0, 0, 360, (110, 110, 110), 1, cv2.LINE_AA)
+    boxes['finger_print'] = (x1, y1, x2, y2)
+
+    # MRZ-like lines
+    width, height = CARD_SIZE
+    mrz = f"IDVNM{identity['id'][3:]}<<{identity['id'][-1]}"
+    for i, line in enumerate([mrz.ljust(30, '<'), identity['dob'][4:] + 'X' * 8, ascii_fold(identity['name']).upper().replace(' ', '<').ljust(30, '<')]):
+        _draw_text(card, line, (int(0.35 * width), int((0.68 + 0.09 * i) * height), int(0.97 * width), int((0.75 + 0.09 * i) * height)))
+    return card, boxes
+
+
+def make_variant(img, long_side=None, rotation=0, noise=0.0, rng=None):
+    """
+    Degrade a rendered card the way a phone photo would.
+
+    Parameters:
+        img : np.ndarray : BGR image
+        long_side : int : Resize so the longest side has this many pixels (None keeps the size)
+        rotation : float : Degrees counter-clockwise; multiples of 90 are exact rotations
+        noise : float : Standard deviation of additive Gaussian noise (0-255 scale)
+        rng : np.random.Generator : Noise source (seeded for reproducible runs)
+
+    Returns:
+        np.ndarray : BGR image
+    """
+    if long_side:
+        ratio = long_side / max(img.shape[:2])
+        interpolation = cv2.INTER_AREA if ratio < 1 else cv2.INTER_CUBIC
+        img = cv2.resize(img, None, fx=ratio, fy=ratio, interpolation=interpolation)
+
+    rotation = rotation % 360
+    if rotation in (90, 180, 270):
+        img = cv2.rotate(img, {90: cv2.ROTATE_90_COUNTERCLOCKWISE, 180: cv2.ROTATE_180,
+                               270: cv2.ROTATE_90_CLOCKWISE}[rotation])
+    elif rotation:
+        # Small tilt on a larger canvas, with a neutral background like a table top
+        height, width = img.shape[:2]
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), rotation, 1.0)
+        cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+        new_width, new_height = int(height * sin + width * cos), int(height * cos + width * sin)
+        matrix[0, 2] += new_width / 2 - width / 2
+        matrix[1, 2] += new_height / 2 - height / 2
+        img = cv2.warpAffine(img, matrix, (new_width, new_height), flags=cv2.INTER_LINEAR,
+                             borderMode=cv2.BORDER_CONSTANT, borderValue=(90, 90, 90))
+
+    if noise > 0:
+        rng = rng or np.random.default_rng(0)
+        noisy = img.astype(np.float32) + rng.normal(0.0, noise, img.shape).astype(np.float32)
+        img = np.clip(noisy, 0, 255).astype(np.uint8)
+    return img
+
+
+def generate_cards(count, seed=0):
+    """
+    Generate `count` synthetic cards deterministically from `seed`.
+
+    Returns:
+        list : dicts with id, identity, qr_payload, front, back, front_boxes, back_boxes
+    """
+    rng = np.random.default_rng(seed)
+    class_names = get_class()
+    cards = []
+    for index in range(count):
+        identity = random_identity(rng)
+        front, front_boxes = render_front(identity, rng)
+        back, back_boxes = render_back(identity, rng)
+        assert set(front_boxes) | set(back_boxes) <= set(class_names)
+        cards.append({
+            'id': f'synthetic_{index:04d}',
+            'identity': identity,
+            'qr_payload': qr_payload(identity),
+            'front': front,
+            'back': back,
+            'front_boxes': front_boxes,
+            'back_boxes': back_boxes,
+        })
+    return cards
+
+
+def encode_jpeg(img, quality=90):
+    ok, buffer = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Could not encode image")
+    return buffer.tobytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', required=True, help='Directory for <id>_front.jpg / <id>_back.jpg and manifest.csv')
+    parser.add_argument('--long-side', type=int, default=None, help='Resize images so the longest side has this many pixels')
+    parser.add_argument('--rotation', type=float, default=0)
+    parser.add_argument('--noise', type=float, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    rng = np.random.default_rng(args.seed + 1)
+    with open(os.path.join(args.output, 'manifest.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'front', 'back', 'cccd_type', 'qr_payload'])
+        for card in generate_cards(args.count, args.seed):
+            names = {}
+            for side in ('front', 'back'):
+                img = make_variant(card[side], args.long_side, args.rotation, args.noise, rng)
+                names[side] = f"{card['id']}_{side}.jpg"
+                with open(os.path.join(args.output, names[side]), 'wb') as img_file:
+                    img_file.write(encode_jpeg(img))
+            writer.writerow([card['id'], names['front'], names['back'], "CCCD Mới", card['qr_payload']])
+    print(f"Wrote {args.count} cards to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
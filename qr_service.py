@@ -0,0 +1,188 @@
+"""
+Dịch vụ quét QR nhẹ (fast lane): chỉ giải mã ảnh và quét QR, không load EasyOCR / YOLO / torch.
+
+Ảnh quét được QR trả kết quả ngay. Ảnh không quét được QR được ghi vào hàng đợi file
+(utils/spool.py) cho tầng OCR nặng (spool_worker.py) xử lý; client nhận job_id (HTTP 202)
+và hỏi kết quả qua GET /jobs/<job_id>. Hai tầng chạy và scale độc lập, dùng chung thư mục spool.
+
+Ví dụ:
+    python qr_service.py --port 8001
+    python spool_worker.py
+
+Endpoint (cùng form field với api.py):
+    POST /cccd/new   back (bắt buộc), front, ocr_method, model_name
+    POST /cccd/old   front (bắt buộc), ocr_method, model_name
+    GET  /jobs/<job_id>, /healthz, /metrics
+"""
+import argparse
+import json
+import os
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.metrics import CONTENT_TYPE, METRICS, Gauge, render_metrics, trace_request
+from utils.pipeline import OCR_METHODS, decode_image_bytes, parse_qr_result
+from utils.qr_engine import decode_qr_fast
+from utils.result_cache import get_result_cache, hash_image_bytes, make_cache_key
+from utils.spool import Spool
+
+# Giới hạn kích thước request (2 ảnh điện thoại)
+MAX_BODY_MB = float(os.environ.get('QR_SERVICE_MAX_BODY_MB', '40'))
+
+# Mặt chứa QR và mặt bắt buộc theo endpoint
+ROUTES = {
+    '/cccd/new': ("CCCD Mới", 'back'),
+    '/cccd/old': ("CCCD Cũ", 'front'),
+}
+
+
+class BadRequest(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def parse_multipart(content_type, body):
+    """
+    Tách form multipart thành (fields, files) bằng thư viện chuẩn
+
+    Returns:
+        fields: Dict tên -> chuỗi
+        files: Dict tên -> bytes
+    """
+    if not content_type or not content_type.startswith('multipart/form-data'):
+        raise BadRequest(415, "Cần gửi multipart/form-data")
+    message = BytesParser(policy=HTTP).parsebytes(
+        f'Content-Type: {content_type}\r\n\r\n'.encode('latin-1') + body
+    )
+    fields, files = {}, {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if not name:
+            continue
+        payload = part.get_payload(decode=True) or b''
+        if part.get_filename() is not None:
+            files[name] = payload
+        else:
+            fields[name] = payload.decode('utf-8')
+    return fields, files
+
+
+def scan_qr(cccd_type, qr_side, fields, files, spool):
+    """
+    Quét QR ở mặt chứa QR; nếu thất bại, đưa job vào hàng đợi cho tầng OCR
+
+    Returns:
+        (status, body): HTTP status và JSON trả về
+    """
+    ocr_method = fields.get('ocr_method', "OCR trực tiếp")
+    if ocr_method not in OCR_METHODS:
+        raise BadRequest(400, f"ocr_method phải là một trong: {', '.join(OCR_METHODS)}")
+    data = files.get(qr_side)
+    if not data:
+        raise BadRequest(422, f"Thiếu ảnh {qr_side}")
+
+    try:
+        img = decode_image_bytes(data)
+    except ValueError as ve:
+        raise BadRequest(400, f"{qr_side}: {ve}")
+
+    # Dùng chung cache với api.py / app; chỉ lưu kết quả quét được để tầng OCR vẫn thử lại QR với detector
+    cache = get_result_cache()
+    qr_key = make_cache_key(hash_image_bytes(data), method='qr', cccd_type=cccd_type)
+    cached = cache.get(qr_key) if cache is not None else None
+    if cached is not None and cached.get('qr_code'):
+        qr_result = cached['qr_code']
+    else:
+        try:
+            qr_result = decode_qr_fast(img)
+        except ValueError:
+            # QR lỗi encoding: tầng OCR (process_cccd) cũng bỏ qua QR lỗi và OCR ảnh mặt trước
+            qr_result = None
+        if qr_result and cache is not None:
+            cache.put(qr_key, {'qr_code': qr_result})
+
+    if qr_result:
+        return 200, {'cccd_type': cccd_type, 'qr_code': qr_result, 'qr_info': parse_qr_result(qr_result)}
+
+    if not files.get('front'):
+        return 200, {'cccd_type': cccd_type, 'qr_code': None, 'error': "❌ Cần ảnh mặt trước để thực hiện OCR!"}
+
+    job_files = {side: files[side] for side in ('front', 'back') if files.get(side)}
+    job_id = spool.enqueue(job_files, {
+        'cccd_type': cccd_type,
+        'ocr_method': ocr_method,
+        'model_name': fields.get('model_name') or None,
+    })
+    return 202, {'job_id': job_id, 'status': 'queued', 'result_url': f'/jobs/{job_id}'}
+
+
+class QRServiceHandler(BaseHTTPRequestHandler):
+    spool = None
+
+    def _send(self, status, body, content_type='application/json; charset=utf-8'):
+        if not isinstance(body, bytes):
+            body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == '/healthz':
+            self._send(200, {'status': 'ok'})
+        elif path == '/metrics':
+            self._send(200, render_metrics().encode('utf-8'), CONTENT_TYPE)
+        elif path.startswith('/jobs/'):
+            status = self.spool.status(path[len('/jobs/'):])
+            self._send(404 if status['status'] == 'unknown' else 200, status)
+        else:
+            self._send(404, {'detail': 'Not Found'})
+
+    def do_POST(self):
+        path = self.path.split('?')[0]
+        if path not in ROUTES:
+            self._send(404, {'detail': 'Not Found'})
+            return
+
+        cccd_type, qr_side = ROUTES[path]
+        with trace_request(path, method='POST', lane='qr') as trace:
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                if length > MAX_BODY_MB * 1024 * 1024:
+                    raise BadRequest(413, "Ảnh quá lớn")
+                fields, files = parse_multipart(self.headers.get('Content-Type'), self.rfile.read(length))
+                status, body = scan_qr(cccd_type, qr_side, fields, files, self.spool)
+            except BadRequest as e:
+                status, body = e.status, {'detail': e.detail}
+            if status >= 400:
+                trace['status'] = str(status)
+        self._send(status, body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('QR_SERVICE_PORT', '8001')))
+    parser.add_argument('--spool', default=None, help='Thư mục hàng đợi (mặc định CCCD_SPOOL_DIR)')
+    args = parser.parse_args()
+
+    spool = Spool(args.spool) if args.spool else Spool()
+    QRServiceHandler.spool = spool
+    METRICS['cccd_spool_pending_jobs'] = Gauge('cccd_spool_pending_jobs', 'Jobs waiting for the OCR tier.',
+                                               callback=spool.depth)
+
+    server = ThreadingHTTPServer((args.host, args.port), QRServiceHandler)
+    print(f"QR fast lane on http://{args.host}:{args.port} (spool: {spool.root})")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
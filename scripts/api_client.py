@@ -0,0 +1,100 @@
+"""
+Local test client for the CCCD Scanner API (api.py).
+
+Usage:
+    python scripts/api_client.py ready
+    python scripts/api_client.py new --back back.jpg [--front front.jpg] [--ocr-method "Object Detection + OCR"]
+    python scripts/api_client.py old --front front.jpg
+    python scripts/api_client.py ocr --image front.jpg
+    python scripts/api_client.py detect --image front.jpg [--model yolov11]
+"""
+import argparse
+import json
+import mimetypes
+import os
+import sys
+import urllib.error
+import urllib.request
+import uuid
+
+
+def encode_multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    body = bytearray()
+    for name, value in fields.items():
+        body += f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode()
+        body += f'{value}\r\n'.encode()
+    for name, path in files.items():
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        body += (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+            f'filename="{os.path.basename(path)}"\r\nContent-Type: {content_type}\r\n\r\n'
+        ).encode()
+        with open(path, 'rb') as f:
+            body += f.read()
+        body += b'\r\n'
+    body += f'--{boundary}--\r\n'.encode()
+    return bytes(body), f'multipart/form-data; boundary={boundary}'
+
+
+def request(url, fields=None, files=None):
+    if files is None:
+        req = urllib.request.Request(url)
+    else:
+        body, content_type = encode_multipart(fields or {}, files)
+        req = urllib.request.Request(url, data=body, headers={'Content-Type': content_type})
+    try:
+        with urllib.request.urlopen(req) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'{}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=os.environ.get('CCCD_API_URL', 'http://localhost:8000'))
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('ready')
+
+    new = sub.add_parser('new')
+    new.add_argument('--back', required=True)
+    new.add_argument('--front')
+    new.add_argument('--ocr-method', default='OCR trực tiếp')
+    new.add_argument('--model', default='yolov8')
+
+    old = sub.add_parser('old')
+    old.add_argument('--front', required=True)
+    old.add_argument('--ocr-method', default='OCR trực tiếp')
+    old.add_argument('--model', default='yolov8')
+
+    ocr = sub.add_parser('ocr')
+    ocr.add_argument('--image', required=True)
+
+    detect = sub.add_parser('detect')
+    detect.add_argument('--image', required=True)
+    detect.add_argument('--model', default='yolov8')
+
+    args = parser.parse_args()
+    url = args.url.rstrip('/')
+
+    if args.command == 'ready':
+        status, payload = request(f'{url}/readyz')
+    elif args.command == 'new':
+        files = {'back': args.back}
+        if args.front:
+            files['front'] = args.front
+        status, payload = request(f'{url}/cccd/new', {'ocr_method': args.ocr_method, 'model_name': args.model}, files)
+    elif args.command == 'old':
+        status, payload = request(f'{url}/cccd/old', {'ocr_method': args.ocr_method, 'model_name': args.model}, {'front': args.front})
+    elif args.command == 'ocr':
+        status, payload = request(f'{url}/ocr', {}, {'image': args.image})
+    else:
+        status, payload = request(f'{url}/ocr/detection', {'model_name': args.model}, {'image': args.image})
+
+    print(json.dumps(payload, ensure_ascii=False, indent=2))
+    sys.exit(0 if status < 400 else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Calibrate the field template used by utils/card_template.py from real front-side photos.
+
+Every photo is rectified to the canonical card size, the YOLO detector runs on the
+rectified card and the per-field median of the detected boxes becomes the template.
+Photos whose outline is not found with enough confidence are skipped.
+
+Usage:
+    python scripts/calibrate_template.py --cccd-type "CCCD Mới" --images anh_mat_truoc/*.jpg
+    python scripts/calibrate_template.py --cccd-type "CCCD Cũ" --images a.jpg b.jpg --model yolov11 --output templates.json
+"""
+import argparse
+import json
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.card_template import (
+    CANONICAL_SIZE, TEMPLATE_FILE, TEMPLATE_MIN_CONFIDENCE, detect_card_corners, get_card_templates, rectify_card,
+    template_from_detections
+)
+from utils.ingest import decode_image
+from utils.model_inference import get_class, get_model, predict_boxes
+from utils.pipeline import CCCD_TYPES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cccd-type', required=True, choices=CCCD_TYPES)
+    parser.add_argument('--images', nargs='+', required=True, help='Front-side photos')
+    parser.add_argument('--model', default='yolov8')
+    parser.add_argument('--min-confidence', type=float, default=TEMPLATE_MIN_CONFIDENCE,
+                        help='Skip photos whose card outline is less certain than this')
+    parser.add_argument('--min-samples', type=int, default=3, help='Drop fields detected on fewer photos')
+    parser.add_argument('--output', default=TEMPLATE_FILE)
+    args = parser.parse_args()
+
+    class_names = get_class()
+    model = get_model(model_name=args.model, device='cpu')
+    # The current template only picks which way up the rectified card is; without one
+    # (e.g. "CCCD Cũ" before its first calibration) the detector picks it
+    current = get_card_templates().get(args.cccd_type)
+
+    samples = {}
+    used = 0
+    for path in args.images:
+        with open(path, 'rb') as f:
+            img = decode_image(f.read(), max_side=0)
+        corners, confidence = detect_card_corners(img)
+        if corners is None or confidence < args.min_confidence:
+            print(f"skip {path}: card outline confidence {confidence:.2f}")
+            continue
+        card, _ = rectify_card(img, corners, current or {})
+        predictions = predict_boxes(model, [card])[0]
+        if current is None:
+            flipped = cv2.rotate(card, cv2.ROTATE_180)
+            flipped_predictions = predict_boxes(model, [flipped])[0]
+            if np.asarray(flipped_predictions).reshape(-1, 6)[:, 4].sum() > np.asarray(predictions).reshape(-1, 6)[:, 4].sum():
+                predictions = flipped_predictions
+        boxes = template_from_detections(predictions, class_names, CANONICAL_SIZE)
+        for name, box in boxes.items():
+            samples.setdefault(name, []).append(box)
+        used += 1
+
+    template = {
+        name: [round(float(v), 4) for v in np.median(np.array(boxes), axis=0)]
+        for name, boxes in sorted(samples.items())
+        if len(boxes) >= args.min_samples
+    }
+    print(f"{used}/{len(args.images)} photos used, {len(template)} fields: {', '.join(template)}")
+    if not template:
+        sys.exit("No field was detected on enough photos; template not written")
+
+    templates = {}
+    if os.path.exists(args.output):
+        with open(args.output, encoding='utf-8') as f:
+            templates = json.load(f)
+    templates[args.cccd_type] = template
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(templates, f, indent=2, ensure_ascii=False)
+    print(f"Template for {args.cccd_type} written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Tầng OCR (nặng) cho các ảnh không quét được QR ở qr_service.py.
+
+Lấy job từ hàng đợi file (utils/spool.py), chạy đầy đủ luồng process_cccd (thử lại QR với detector
+nếu dùng Object Detection, sau đó OCR mặt trước) và ghi kết quả để client lấy qua GET /jobs/<job_id>.
+Có thể chạy nhiều process trên cùng thư mục spool; mỗi job chỉ được một process nhận.
+
+Ví dụ:
+    python spool_worker.py
+    python spool_worker.py --spool /var/lib/cccd/spool --threads 2 --metrics-port 9102
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import traceback
+
+from utils.metrics import start_metrics_server, trace_request
+from utils.spool import SPOOL_RESULT_TTL, SPOOL_STALE_SECONDS, Spool
+
+# Mô hình mặc định khi job không chỉ định (giống api.py)
+DEFAULT_MODEL = os.environ.get('API_DEFAULT_MODEL', 'yolov8')
+
+
+def run_job(meta, files):
+    """
+    Xử lý một job: giải mã ảnh, chạy process_cccd
+
+    Returns:
+        Dict kết quả giống response của api.py, hoặc {'detail': ...} nếu ảnh / tham số không hợp lệ
+    """
+    from utils.model_inference import get_class
+    from utils.model_registry import get_shared_model
+    from utils.pipeline import decode_image_bytes, process_cccd
+    from utils.result_cache import get_result_cache, hash_image_bytes
+
+    images = {}
+    image_hashes = {}
+    for side in ('front', 'back'):
+        data = files.get(side)
+        images[side] = decode_image_bytes(data) if data else None
+        image_hashes[side] = hash_image_bytes(data) if data else None
+
+    ocr_method = meta.get('ocr_method', "OCR trực tiếp")
+    model_name = meta.get('model_name') or DEFAULT_MODEL
+    use_detection = ocr_method == "Object Detection + OCR"
+    return process_cccd(
+        images['front'],
+        images['back'],
+        meta['cccd_type'],
+        ocr_method=ocr_method,
+        detection_model=get_shared_model(model_name=model_name, device='cpu') if use_detection else None,
+        class_names=get_class(),
+        cache=get_result_cache(),
+        image_hashes=image_hashes,
+        model_name=model_name if use_detection else None
+    )
+
+
+def work(spool, poll_interval, stop, once=False):
+    last_maintenance = 0.0
+    while not stop.is_set():
+        now = time.monotonic()
+        if now - last_maintenance > 60:
+            # Job của worker đã chết được đưa lại hàng đợi, kết quả cũ bị xóa
+            spool.requeue_stale(SPOOL_STALE_SECONDS)
+            spool.purge_incoming(SPOOL_STALE_SECONDS)
+            spool.purge_done(SPOOL_RESULT_TTL)
+            last_maintenance = now
+
+        job = spool.claim()
+        if job is None:
+            if once:
+                return
+            stop.wait(poll_interval)
+            continue
+
+        job_id, meta, files = job
+        # Job chạy lâu hơn SPOOL_STALE_SECONDS vẫn được giữ, không bị worker khác nhận lại
+        with spool.heartbeat(job_id), trace_request('spool_job', lane='ocr', cccd_type=meta.get('cccd_type')) as trace:
+            try:
+                result = run_job(meta, files)
+            except ValueError as ve:
+                trace['status'] = 'invalid'
+                result = {'detail': str(ve)}
+            except Exception as e:
+                trace['status'] = 'error'
+                traceback.print_exc()
+                result = {'detail': f"❌ Lỗi khi xử lý: {e}"}
+        spool.complete(job_id, result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spool', default=None, help='Thư mục hàng đợi (mặc định CCCD_SPOOL_DIR)')
+    parser.add_argument('--threads', type=int, default=1, help='Số job xử lý song song trong process này')
+    parser.add_argument('--poll', type=float, default=0.5, help='Thời gian chờ khi hàng đợi rỗng (giây)')
+    parser.add_argument('--models', nargs='*', default=[DEFAULT_MODEL], help='Mô hình YOLO load sẵn khi khởi động')
+    parser.add_argument('--metrics-port', type=int, default=None, help='Port phục vụ /metrics')
+    parser.add_argument('--once', action='store_true', help='Xử lý hết hàng đợi rồi thoát')
+    args = parser.parse_args()
+
+    from utils.model_registry import get_shared_model
+    from utils.reader_pool import warm_up_reader_pool
+
+    spool = Spool(args.spool) if args.spool else Spool()
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+
+    # Tầng nặng: load OCR reader và mô hình một lần trước khi nhận job
+    warm_up_reader_pool(size=args.threads)
+    for model_name in args.models:
+        get_shared_model(model_name=model_name, device='cpu')
+    print(f"OCR worker ready (spool: {spool.root}, threads: {args.threads})", file=sys.stderr)
+
+    stop = threading.Event()
+    threads = [threading.Thread(target=work, args=(spool, args.poll, stop, args.once), name=f'spool-worker-{i}')
+               for i in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+if __name__ == '__main__':
+    main()
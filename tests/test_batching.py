@@ -0,0 +1,113 @@
+import gc
+import weakref
+from functools import partial
+
+import numpy as np
+import pytest
+
+from utils.batching import MicroBatcher
+from utils.model_registry import ModelRegistry
+
+
+class FakeModel:
+    def __init__(self, model_path, name):
+        self.model_path = model_path
+        self.name = name
+
+    def predict_boxes(self, images):
+        return [np.zeros((0, 6), dtype=np.float32) for _ in images]
+
+
+def _registry(tmp_path):
+    # Every fake model "weighs" 1000 bytes and only one fits in the budget
+    weights = tmp_path / 'best.pt'
+    weights.write_bytes(b'\0' * 1000)
+    loader = lambda model_name, device, backend: FakeModel(str(weights), model_name)
+    return ModelRegistry(budget_mb=1500 / (1024 * 1024), loader=loader)
+
+
+def test_resolving_batcher_does_not_keep_evicted_model(tmp_path):
+    registry = _registry(tmp_path)
+    batcher = MicroBatcher(partial(registry.get, model_name='yolov8', device='cpu', backend='pytorch'),
+                           max_wait_ms=0, resolve=True)
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    try:
+        assert batcher.predict_boxes([image])[0].shape == (0, 6)
+        first = weakref.ref(registry.get('yolov8', backend='pytorch'))
+
+        # Loading another model evicts the batcher's one
+        registry.get('yolov11', backend='pytorch')
+        gc.collect()
+        assert first() is None
+
+        # The next batch loads it again through the registry, which keeps a single copy
+        assert batcher.predict_boxes([image])[0].shape == (0, 6)
+        assert [m['name'] for m in registry.loaded_models()] == ['yolov8']
+    finally:
+        batcher.close()
+
+
+class CountingModel:
+    """
+    Returns one box per image whose confidence is the image's fill value, recording batch sizes.
+    """
+
+    def __init__(self, fail=False):
+        self.batch_sizes = []
+        self.fail = fail
+
+    def predict_boxes(self, images):
+        self.batch_sizes.append(len(images))
+        if self.fail:
+            raise RuntimeError("detector failed")
+        return [np.array([[0, 0, 1, 1, float(image[0, 0, 0]), 0]], dtype=np.float32) for image in images]
+
+
+def _image(value):
+    return np.full((2, 2, 3), value, dtype=np.uint8)
+
+
+def test_concurrent_images_are_batched_and_answered_in_order():
+    model = CountingModel()
+    batcher = MicroBatcher(model, max_batch_size=4, max_wait_ms=200)
+    try:
+        futures = [batcher.submit(_image(value)) for value in range(6)]
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        batcher.close()
+
+    assert [int(boxes[0, 4]) for boxes in results] == list(range(6))
+    assert model.batch_sizes == [4, 2]
+    metrics = batcher.metrics()
+    assert metrics['batches'] == 2 and metrics['images'] == 6
+    assert metrics['batch_size_histogram'] == {2: 1, 4: 1}
+
+
+def test_batch_runs_after_max_wait_without_filling_up():
+    model = CountingModel()
+    batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=5)
+    try:
+        assert int(batcher.predict_boxes([_image(7)])[0][0, 4]) == 7
+    finally:
+        batcher.close()
+
+    assert model.batch_sizes == [1]
+
+
+def test_detector_error_reaches_every_caller_in_the_batch():
+    batcher = MicroBatcher(CountingModel(fail=True), max_batch_size=2, max_wait_ms=200)
+    try:
+        futures = [batcher.submit(_image(value)) for value in range(2)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="detector failed"):
+                future.result(timeout=5)
+    finally:
+        batcher.close()
+
+
+def test_closed_batcher_rejects_new_images():
+    batcher = MicroBatcher(CountingModel())
+    batcher.close()
+
+    with pytest.raises(RuntimeError):
+        batcher.submit(_image(0))
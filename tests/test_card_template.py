@@ -0,0 +1,77 @@
+import json
+
+import numpy as np
+import pytest
+
+import utils.card_template as card_template
+import utils.ocr as ocr
+from utils.card_template import get_card_templates, invalid_template_fields
+from utils.model_inference import get_class, get_required_fields
+
+CLASS_NAMES = get_class()
+
+OLD_CARD_LAYOUT = {name: [0.1, 0.1 * i, 0.9, 0.1 * i + 0.08] for i, name in enumerate(get_required_fields(), 1)}
+
+
+@pytest.fixture
+def template_file(tmp_path, monkeypatch):
+    """
+    Point TEMPLATE_FILE at a file where only "CCCD Cũ" is calibrated.
+    """
+    path = tmp_path / 'card_templates.json'
+    path.write_text(json.dumps({"CCCD Cũ": OLD_CARD_LAYOUT}), encoding='utf-8')
+    monkeypatch.setattr(card_template, 'TEMPLATE_FILE', str(path))
+    monkeypatch.setattr(card_template, '_calibrated', None)
+    return path
+
+
+def test_calibrated_only_leaves_out_default_layouts(template_file):
+    assert set(get_card_templates(calibrated_only=True)) == {"CCCD Cũ"}
+    assert set(get_card_templates()) == {"CCCD Mới", "CCCD Cũ"}
+
+
+def test_uncalibrated_card_type_goes_through_detector(template_file, monkeypatch):
+    def no_template(*args, **kwargs):
+        raise AssertionError("the card outline must not be searched for an uncalibrated card type")
+
+    image = np.zeros((10, 10, 3), dtype=np.uint8)
+    readings = {'id': ('001099012345', 0.9), 'name': ('NGUYỄN VĂN A', 0.9), 'dob': ('01/01/1990', 0.9),
+                'gender': ('Nam', 0.9), 'current_place': ('Hà Nội', 0.9)}
+    detected = []
+
+    def detect_field_crops(img, model, class_names):
+        detected.append(True)
+        return [(image, class_names.index(name)) for name in get_required_fields()], image
+
+    monkeypatch.setattr(card_template, 'detect_card_corners', no_template)
+    monkeypatch.setattr(ocr, '_detect_field_crops', detect_field_crops)
+    monkeypatch.setattr(ocr, '_ocr_docs', lambda docs, class_names, batched=True: {
+        class_names[class_id]: readings[class_names[class_id]] for _, class_id in docs
+    })
+
+    info, _ = ocr.OCR_with_detection(image, None, CLASS_NAMES, cccd_type="CCCD Mới", use_template='calibrated',
+                                     check_quality=False, optional_fields=())
+
+    assert detected == [True]
+    assert info['Số CCCD'] == '001099012345'
+
+
+def test_crop_fields_with_template_skips_uncalibrated_type(template_file):
+    image = np.zeros((10, 10, 3), dtype=np.uint8)
+
+    docs, card, confidence = card_template.crop_fields_with_template(image, CLASS_NAMES, "CCCD Mới",
+                                                                     calibrated_only=True)
+
+    assert (docs, card, confidence) == (None, None, 0.0)
+
+
+def test_invalid_template_fields():
+    readings = {
+        'id': ('001 099 012 345', 0.9),
+        'dob': ('Ngày sinh 01/01/1990', 0.9),
+        'gender': ('Nữ', 0.9),
+        'name': ('Họ và tên NGUYỄN VĂN A', 0.9),
+        'current_place': ('Hà Nội', 0.9),
+    }
+
+    assert invalid_template_fields(readings) == ['dob', 'name']
@@ -0,0 +1,98 @@
+import numpy as np
+
+from utils.cascade import CascadeDetector, merge_boxes, weak_classes
+from utils.model_inference import get_class, get_required_fields
+
+CLASS_NAMES = get_class()
+REQUIRED_IDS = [float(CLASS_NAMES.index(name)) for name in get_required_fields()]
+
+
+def _box(class_name, confidence, x=0.0):
+    return [x, 0.0, x + 10.0, 10.0, confidence, float(CLASS_NAMES.index(class_name))]
+
+
+def _boxes(*boxes):
+    return np.array(boxes, dtype=np.float32).reshape(-1, 6)
+
+
+def _all_required(confidence):
+    return [_box(name, confidence) for name in get_required_fields()]
+
+
+class FakeModel:
+    def __init__(self, boxes):
+        self.boxes = boxes
+        self.calls = 0
+
+    def predict_boxes(self, images):
+        self.calls += len(images)
+        return [_boxes(*self.boxes) for _ in images]
+
+
+def _cascade(monkeypatch, first, second):
+    models = {'yolov11': FakeModel(first), 'yolov8': FakeModel(second)}
+    cascade = CascadeDetector(['yolov11', 'yolov8'], min_confidence=0.5, class_names=CLASS_NAMES)
+    monkeypatch.setattr(cascade, '_model', lambda name: models[name])
+    return cascade, models
+
+
+def test_weak_classes_reports_missing_and_low_confidence():
+    boxes = _boxes(_box('id', 0.9), _box('name', 0.3), _box('name', 0.4))
+    id_, name, dob = (float(CLASS_NAMES.index(n)) for n in ('id', 'name', 'dob'))
+
+    assert weak_classes(boxes, [id_, name, dob], 0.5) == {name, dob}
+    assert weak_classes(np.zeros((0, 6)), [id_], 0.5) == {id_}
+
+
+def test_merge_boxes_takes_only_more_confident_weak_classes():
+    name, dob, gender = (float(CLASS_NAMES.index(n)) for n in ('name', 'dob', 'gender'))
+    primary = _boxes(_box('id', 0.9), _box('name', 0.3), _box('dob', 0.45))
+    secondary = _boxes(_box('id', 0.99, x=50), _box('name', 0.8, x=50), _box('dob', 0.2, x=50), _box('gender', 0.7, x=50))
+
+    merged, replaced = merge_boxes(primary, secondary, {name, dob, gender})
+
+    assert replaced == {name, gender}
+    by_class = {row[5]: row for row in merged}
+    assert len(merged) == 4
+    # Strong classes and classes the secondary model read worse keep the primary box
+    assert by_class[float(CLASS_NAMES.index('id'))][4] == np.float32(0.9)
+    assert by_class[dob][4] == np.float32(0.45)
+    assert by_class[name][0] == 50 and by_class[gender][0] == 50
+
+
+def test_merge_boxes_without_replacement_returns_primary():
+    primary = _boxes(_box('name', 0.6))
+    merged, replaced = merge_boxes(primary, np.zeros((0, 6)), {float(CLASS_NAMES.index('name'))})
+
+    assert replaced == set()
+    assert np.array_equal(merged, primary)
+
+
+def test_cascade_does_not_escalate_confident_images(monkeypatch):
+    cascade, models = _cascade(monkeypatch, _all_required(0.9), _all_required(0.95))
+
+    outputs = cascade.predict_boxes([np.zeros((4, 4, 3), dtype=np.uint8)] * 2)
+
+    assert models['yolov8'].calls == 0
+    assert all(np.allclose(boxes[:, 4], 0.9) for boxes in outputs)
+    assert cascade.stats()['escalation_rate'] == 0.0
+
+
+def test_cascade_escalates_weak_required_fields_only(monkeypatch):
+    # 'name' is missing and 'dob' is below min_confidence
+    first = [_box('id', 0.9), _box('gender', 0.9), _box('current_place', 0.9), _box('dob', 0.2)]
+    second = [_box(name, 0.8, x=50) for name in get_required_fields()]
+    cascade, models = _cascade(monkeypatch, first, second)
+
+    (boxes,) = cascade.predict_boxes([np.zeros((4, 4, 3), dtype=np.uint8)])
+
+    assert models['yolov8'].calls == 1
+    by_class = {CLASS_NAMES[int(row[5])]: row for row in boxes}
+    assert set(by_class) == set(get_required_fields())
+    assert by_class['name'][0] == 50 and by_class['dob'][0] == 50
+    assert by_class['id'][4] == np.float32(0.9)
+
+    stats = cascade.stats()
+    assert stats['escalations'] == {'yolov8': 1}
+    assert stats['escalation_rate'] == 1.0
+    assert stats['replaced_fields'] == {'name': 1, 'dob': 1}
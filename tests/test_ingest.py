@@ -0,0 +1,65 @@
+import struct
+
+import cv2
+import numpy as np
+import pytest
+
+from utils.ingest import decode_image, jpeg_size, reduced_decode_flag
+
+
+def _encode(ext, width=320, height=200, params=()):
+    image = np.full((height, width, 3), 128, dtype=np.uint8)
+    ok, encoded = cv2.imencode(ext, image, list(params))
+    assert ok
+    return encoded.tobytes()
+
+
+def _with_app1(jpeg, payload=b'Exif\x00\x00' + b'\x00' * 64):
+    # An APP1 (EXIF) segment before the frame header, as cameras write it
+    segment = b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload
+    return jpeg[:2] + segment + jpeg[2:]
+
+
+def test_jpeg_size_baseline():
+    assert jpeg_size(_encode('.jpg')) == (320, 200)
+
+
+def test_jpeg_size_progressive():
+    assert jpeg_size(_encode('.jpg', params=(cv2.IMWRITE_JPEG_PROGRESSIVE, 1))) == (320, 200)
+
+
+def test_jpeg_size_skips_segments_before_frame_header():
+    assert jpeg_size(_with_app1(_encode('.jpg', width=641, height=33))) == (641, 33)
+
+
+def test_jpeg_size_accepts_any_buffer():
+    data = _encode('.jpg')
+    assert jpeg_size(memoryview(data)) == (320, 200)
+    assert jpeg_size(np.frombuffer(data, dtype=np.uint8)) == (320, 200)
+
+
+@pytest.mark.parametrize('data', [b'', b'\xff\xd8', b'not an image at all', None])
+def test_jpeg_size_rejects_non_jpeg(data):
+    assert jpeg_size(_encode('.png') if data is None else data) is None
+
+
+def test_jpeg_size_rejects_truncated_header():
+    assert jpeg_size(_with_app1(_encode('.jpg'))[:40]) is None
+
+
+def test_reduced_decode_flag():
+    assert reduced_decode_flag(4000, 2000) == cv2.IMREAD_REDUCED_COLOR_2
+    assert reduced_decode_flag(16000, 2000) == cv2.IMREAD_REDUCED_COLOR_8
+    assert reduced_decode_flag(1999, 2000) == cv2.IMREAD_COLOR
+    assert reduced_decode_flag(16000, 0) == cv2.IMREAD_COLOR
+
+
+def test_decode_image_reduces_large_jpeg():
+    img = decode_image(_encode('.jpg', width=800, height=400), max_side=200)
+    assert img.shape == (100, 200, 3)
+    assert img.flags['C_CONTIGUOUS']
+
+
+def test_decode_image_rejects_garbage():
+    with pytest.raises(ValueError):
+        decode_image(b'not an image at all')
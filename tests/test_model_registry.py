@@ -0,0 +1,47 @@
+from utils.model_registry import ModelRegistry
+
+
+class FakeModel:
+    def __init__(self, model_path):
+        self.model_path = model_path
+
+
+def _registry(tmp_path, models_in_budget=1):
+    # Every fake model "weighs" 1000 bytes
+    weights = tmp_path / 'best.pt'
+    weights.write_bytes(b'\0' * 1000)
+    loads = []
+
+    def loader(model_name, device, backend):
+        loads.append((model_name, backend))
+        return FakeModel(str(weights))
+
+    registry = ModelRegistry(budget_mb=(models_in_budget * 1000 + 500) / (1024 * 1024), loader=loader)
+    return registry, loads
+
+
+def test_model_is_loaded_once(tmp_path):
+    registry, loads = _registry(tmp_path)
+
+    assert registry.get('yolov8', backend='pytorch') is registry.get('yolov8', backend='pytorch')
+    assert loads == [('yolov8', 'pytorch')]
+
+
+def test_least_recently_used_model_is_evicted(tmp_path):
+    registry, _ = _registry(tmp_path, models_in_budget=2)
+    registry.get('yolov8', backend='pytorch')
+    registry.get('yolov11', backend='pytorch')
+    registry.get('yolov8', backend='pytorch')
+    registry.get('yolov8', backend='onnx')
+
+    assert [(m['name'], m['backend']) for m in registry.loaded_models()] == [('yolov8', 'pytorch'), ('yolov8', 'onnx')]
+
+
+def test_unload_uses_the_same_default_backend_as_get(tmp_path, monkeypatch):
+    monkeypatch.setenv('DETECTOR_BACKEND', 'onnx')
+    registry, _ = _registry(tmp_path)
+    registry.get('yolov8')
+
+    assert registry.loaded_models()[0]['backend'] == 'onnx'
+    assert registry.unload('yolov8')
+    assert registry.loaded_models() == []
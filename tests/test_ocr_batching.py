@@ -0,0 +1,110 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+import utils.ocr as ocr
+from utils.ocr import EASYOCR_IMG_HEIGHT, ocr_field_crops, recognize_crops_batched
+
+
+class FakeReader:
+    """
+    Stands in for easyocr.Reader: readtext() reads every crop as 'readtext', get_text() (below) as 'batched'.
+    """
+    character = 'abc'
+    lang_char = 'ab'
+    recognizer = converter = device = None
+
+    def __init__(self):
+        self.readtext_calls = []
+
+    def readtext(self, img):
+        self.readtext_calls.append(img.shape)
+        return [(None, 'dòng 1', 0.8), (None, 'dòng 2', 0.6)]
+
+
+@pytest.fixture
+def recognizer(monkeypatch):
+    """
+    Install a fake easyocr.recognition.get_text and record the batches it receives.
+    """
+    batches = []
+
+    def get_text(character, img_h, max_width, recognizer, converter, image_list, ignore_char='', batch_size=1,
+                 workers=0, device='cpu'):
+        batches.append({'image_list': image_list, 'max_width': max_width, 'batch_size': batch_size,
+                        'ignore_char': ignore_char})
+        return [(index, f' batched {index} ', 0.9) for index, _ in image_list]
+
+    easyocr = types.ModuleType('easyocr')
+    recognition = types.ModuleType('easyocr.recognition')
+    recognition.get_text = get_text
+    easyocr.recognition = recognition
+    monkeypatch.setitem(sys.modules, 'easyocr', easyocr)
+    monkeypatch.setitem(sys.modules, 'easyocr.recognition', recognition)
+    return batches
+
+
+def _crop(height, width):
+    return np.full((height, width, 3), 200, dtype=np.uint8)
+
+
+def test_all_crops_go_through_one_recognizer_batch(recognizer):
+    crops = [_crop(30, 300), np.zeros((0, 0, 3), dtype=np.uint8), _crop(100, 250)]
+
+    results = recognize_crops_batched(FakeReader(), crops)
+
+    assert results == [('batched 0', 0.9), ('', 0.0), ('batched 2', 0.9)]
+    (batch,) = recognizer
+    assert batch['batch_size'] == 2
+    assert batch['ignore_char'] == 'c'
+    # Every crop is resized to the recognizer height, the batch is padded to the widest one
+    assert all(img.shape[0] == EASYOCR_IMG_HEIGHT for _, img in batch['image_list'])
+    assert batch['image_list'][0][1].shape[1] == 640
+    assert batch['max_width'] == 10 * EASYOCR_IMG_HEIGHT
+
+
+def test_no_usable_crop_skips_the_recognizer(recognizer):
+    assert recognize_crops_batched(FakeReader(), [np.zeros((0, 0, 3), dtype=np.uint8)]) == [('', 0.0)]
+    assert recognizer == []
+
+
+def test_tall_crops_fall_back_to_readtext(recognizer):
+    reader = FakeReader()
+    # Median height 30: the 80 px address block is more than MULTILINE_HEIGHT_RATIO lines tall
+    crops = [_crop(30, 300), _crop(30, 200), _crop(80, 400), _crop(32, 100)]
+
+    results = ocr_field_crops(reader, crops)
+
+    assert reader.readtext_calls == [(80, 400, 3)]
+    assert results[2] == ('dòng 1 dòng 2', pytest.approx(0.7))
+    assert [results[i][0] for i in (0, 1, 3)] == ['batched 0', 'batched 1', 'batched 2']
+
+
+def test_unbatched_mode_runs_readtext_per_crop(recognizer):
+    reader = FakeReader()
+
+    results = ocr_field_crops(reader, [_crop(30, 300), _crop(30, 200)], batched=False)
+
+    assert recognizer == []
+    assert len(reader.readtext_calls) == 2
+    assert results == [('dòng 1 dòng 2', pytest.approx(0.7))] * 2
+
+
+def test_ocr_docs_keeps_most_confident_reading_per_class(monkeypatch):
+    class NoPool:
+        def __enter__(self):
+            return None
+
+        def __exit__(self, *exc):
+            return False
+
+    readings = iter([('001099012345', 0.6), ('001099012346', 0.9), ('', 0.99)])
+    monkeypatch.setattr(ocr, 'borrow_ocr_reader', lambda **kwargs: NoPool())
+    monkeypatch.setattr(ocr, 'ocr_field_crops', lambda reader, crops, batched=True: [next(readings) for _ in crops])
+    class_names = ['id', 'name']
+
+    result = ocr._ocr_docs([(None, 0), (None, 0), (None, 1)], class_names)
+
+    assert result == {'id': ('001099012346', 0.9)}
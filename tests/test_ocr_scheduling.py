@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+import utils.ocr as ocr
+from utils.model_inference import get_class, get_optional_fields, get_required_fields
+
+CLASS_NAMES = get_class()
+
+CARD = {
+    'id': ('001099012345', 0.95),
+    'name': ('NGUYỄN VĂN A', 0.9),
+    'dob': ('01/01/1990', 0.9),
+    'gender': ('Nam', 0.9),
+    'current_place': ('Hà Nội', 0.9),
+    'nationality': ('Việt Nam', 0.9),
+    'origin_place': ('Nam Định', 0.9),
+    'expire_date': ('01/01/2040', 0.9),
+    'issue_date': ('01/01/2025', 0.9),
+    'features': ('Nốt ruồi', 0.9),
+}
+
+
+class FakeCard:
+    """
+    Stands in for the detector and the OCR reader: boxes every field in `boxed`, reads `readings`.
+    """
+
+    def __init__(self, boxed, readings):
+        self.boxed = boxed
+        self.readings = readings
+        self.ocr_calls = []
+
+    def detect_field_crops(self, img, model, class_names):
+        image = np.zeros((10, 10, 3), dtype=np.uint8)
+        return [(image, class_names.index(name)) for name in self.boxed], image
+
+    def ocr_docs(self, docs, class_names, batched=True):
+        names = [class_names[class_id] for _, class_id in docs]
+        self.ocr_calls.append(names)
+        return {name: self.readings[name] for name in names if name in self.readings}
+
+    @property
+    def ocr_fields(self):
+        return [name for call in self.ocr_calls for name in call]
+
+
+@pytest.fixture
+def card(monkeypatch):
+    fake = FakeCard(boxed=list(CLASS_NAMES), readings=dict(CARD))
+    monkeypatch.setattr(ocr, '_detect_field_crops', fake.detect_field_crops)
+    monkeypatch.setattr(ocr, '_ocr_docs', fake.ocr_docs)
+    return fake
+
+
+def _scan(optional_fields=()):
+    image = np.zeros((10, 10, 3), dtype=np.uint8)
+    return ocr.OCR_with_detection(image, None, CLASS_NAMES, use_template=False, check_quality=False,
+                                  optional_fields=optional_fields)[0]
+
+
+def test_missing_required_box_stops_before_any_ocr(card):
+    card.boxed = [name for name in CLASS_NAMES if name != 'dob']
+
+    with pytest.raises(ValueError, match="Ngày sinh"):
+        _scan(optional_fields=True)
+
+    assert card.ocr_calls == []
+
+
+def test_unreadable_required_field_stops_before_optional_fields(card):
+    del card.readings['name']
+
+    with pytest.raises(ValueError, match="Họ và tên"):
+        _scan(optional_fields=True)
+
+    assert card.ocr_calls == [[name for name in CLASS_NAMES if name in get_required_fields()]]
+
+
+def test_required_fields_are_read_first_then_optional_ones(card):
+    info = _scan(optional_fields=True)
+
+    required, optional = card.ocr_calls
+    assert set(required) == set(get_required_fields())
+    assert set(optional) == set(get_optional_fields()) - {'finger_print', 'qr'}
+    assert info['Quê quán'] == 'Nam Định'
+
+
+def test_only_requested_optional_fields_are_read(card):
+    info = _scan(optional_fields=('issue_date', 'qr'))
+
+    assert card.ocr_calls[1:] == [['issue_date']]
+    assert 'Ngày cấp' in info and 'Quê quán' not in info
+
+
+def test_no_optional_fields_means_a_single_ocr_pass(card):
+    info = _scan(optional_fields=())
+
+    assert len(card.ocr_calls) == 1
+    assert set(info) == {'Số CCCD', 'Họ và tên', 'Ngày sinh', 'Giới tính', 'Nơi thường trú'}
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('all', True),
+    ('none', ()),
+    ('', ()),
+    (' issue_date , expire_date ', ('issue_date', 'expire_date')),
+])
+def test_parse_optional_fields(value, expected):
+    assert ocr.parse_optional_fields(value) == expected
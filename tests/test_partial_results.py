@@ -0,0 +1,186 @@
+import pickle
+
+import numpy as np
+import pytest
+
+import utils.ocr as ocr
+from utils.model_inference import get_class, get_class_vietnamese, get_required_fields
+from utils.partial_results import PartialResult, PartialResultStore
+
+CLASS_NAMES = get_class()
+
+CARD_A = {
+    'id': ('001099012345', 0.95),
+    'name': ('NGUYỄN VĂN A', 0.9),
+    'dob': ('01/01/1990', 0.9),
+    'gender': ('Nam', 0.9),
+    'current_place': ('Hà Nội', 0.9),
+}
+
+CARD_B = {
+    'id': ('079200054321', 0.95),
+    'name': ('TRẦN THỊ B', 0.9),
+    'dob': ('02/02/2000', 0.9),
+    'gender': ('Nữ', 0.9),
+    'current_place': ('TP Hồ Chí Minh', 0.9),
+}
+
+
+def test_merge_keeps_most_confident_reading():
+    partial = PartialResult('CCCD Mới')
+    partial.merge({'id': ('001099012345', 0.9), 'name': ('NGUYEN VAN A', 0.4)})
+    changed = partial.merge({'name': ('NGUYỄN VĂN A', 0.8), 'id': ('001099012345', 0.5)})
+
+    assert changed == {'name'}
+    assert partial.fields['name'] == ('NGUYỄN VĂN A', 0.8)
+    assert partial.fields['id'] == ('001099012345', 0.9)
+    assert partial.attempts == 2
+
+
+def test_merge_ignores_empty_text():
+    partial = PartialResult()
+    partial.merge({'name': ('NGUYỄN VĂN A', 0.8)})
+    partial.merge({'name': ('', 0.99)})
+
+    assert partial.fields['name'] == ('NGUYỄN VĂN A', 0.8)
+
+
+def test_accepted_only_counts_confident_fields():
+    partial = PartialResult(min_confidence=0.6)
+    partial.merge({'id': ('001099012345', 0.95), 'name': ('NGUYEN', 0.3), 'dob': ('01/01/1990', 0.6)})
+
+    assert partial.accepted() == {'id', 'dob'}
+
+
+def test_merge_resets_on_different_card_number():
+    partial = PartialResult('CCCD Mới')
+    partial.merge(CARD_A)
+    partial.merge({'id': CARD_B['id'], 'name': CARD_B['name']})
+
+    assert partial.fields == {'id': CARD_B['id'], 'name': CARD_B['name']}
+    assert partial.attempts == 1
+
+
+def test_same_card_compares_digits_only():
+    partial = PartialResult()
+    assert partial.same_card(None)
+    assert partial.same_card(('001099012345', 0.9))
+
+    partial.merge({'id': ('001 099 012 345', 0.9)})
+    assert partial.same_card(('001099012345', 0.5))
+    assert not partial.same_card(('079200054321', 0.9))
+    # An unreadable number cannot prove it is the same card
+    assert not partial.same_card(None)
+    assert not partial.same_card(('Số', 0.9))
+
+
+def test_same_card_needs_a_stored_number():
+    partial = PartialResult()
+    partial.merge({'name': CARD_A['name'], 'dob': CARD_A['dob']})
+
+    assert not partial.same_card(CARD_B['id'])
+    assert not partial.same_card(None)
+
+
+def test_state_round_trip_and_pickle():
+    partial = PartialResult('CCCD Mới')
+    partial.merge(CARD_A)
+
+    loaded = PartialResult()
+    loaded.load(partial.state())
+    assert loaded.state() == partial.state()
+
+    copy = pickle.loads(pickle.dumps(partial))
+    assert copy.fields == partial.fields
+    assert copy.scan_lock is not partial.scan_lock
+
+
+def test_store_drops_least_recently_used():
+    store = PartialResultStore(max_sessions=2, ttl=60)
+    first = store.get('a')
+    second = store.get('b')
+    assert store.get('a') is first
+    store.get('c')
+
+    assert len(store) == 2
+    assert store.get('a') is first
+    assert store.get('b') is not second
+
+
+@pytest.fixture
+def fake_card(monkeypatch):
+    """
+    Replace detection and OCR by a card whose fields read as `card['readings']`, recording which fields are OCR'd.
+    """
+    card = {'readings': {}, 'ocr_calls': []}
+    image = np.zeros((10, 10, 3), dtype=np.uint8)
+
+    def detect_field_crops(img, model, class_names):
+        docs = [(image, class_names.index(name)) for name in get_required_fields()]
+        return docs, image
+
+    def ocr_docs(docs, class_names, batched=True):
+        names = [class_names[class_id] for _, class_id in docs]
+        card['ocr_calls'].append(names)
+        return {name: card['readings'][name] for name in names if name in card['readings']}
+
+    monkeypatch.setattr(ocr, '_detect_field_crops', detect_field_crops)
+    monkeypatch.setattr(ocr, '_ocr_docs', ocr_docs)
+    return card
+
+
+def _scan(partial):
+    image = np.zeros((10, 10, 3), dtype=np.uint8)
+    return ocr.OCR_with_detection(image, None, CLASS_NAMES, use_template=False, check_quality=False, partial=partial,
+                                  optional_fields=())[0]
+
+
+def test_retake_of_same_card_reuses_accepted_fields(fake_card):
+    partial = PartialResult('CCCD Mới')
+    partial.merge({name: CARD_A[name] for name in ('id', 'name', 'dob')})
+    fake_card['readings'] = dict(CARD_A)
+
+    _scan(partial)
+
+    # The card number is always read again; the other accepted fields are not
+    assert fake_card['ocr_calls'] == [['id', 'gender', 'current_place']]
+    assert partial.reused == {'name', 'dob'}
+
+
+def test_retake_of_different_card_does_not_mix_fields(fake_card):
+    partial = PartialResult('CCCD Mới')
+    partial.merge({name: CARD_A[name] for name in ('id', 'name', 'dob', 'gender')})
+    fake_card['readings'] = dict(CARD_B)
+
+    detected_info = _scan(partial)
+
+    labels = get_class_vietnamese()
+    assert detected_info == {labels[name]: text for name, (text, _) in CARD_B.items()}
+    assert partial.fields == CARD_B
+    assert partial.reused == set()
+
+
+def test_retake_with_unreadable_number_does_not_reuse_fields(fake_card):
+    partial = PartialResult('CCCD Mới')
+    partial.merge({name: CARD_A[name] for name in ('id', 'name', 'dob', 'gender')})
+    fake_card['readings'] = {name: reading for name, reading in CARD_B.items() if name != 'id'}
+
+    with pytest.raises(ValueError):
+        _scan(partial)
+
+    assert 'id' not in partial.fields
+    assert not any(partial.fields.get(name) == CARD_A[name] for name in CARD_A)
+
+
+def test_retake_after_attempt_without_number_does_not_mix_fields(fake_card):
+    # The first attempt read card A's fields but not its number
+    partial = PartialResult('CCCD Mới')
+    partial.merge({name: CARD_A[name] for name in ('name', 'dob', 'gender')})
+    fake_card['readings'] = dict(CARD_B)
+
+    detected_info = _scan(partial)
+
+    labels = get_class_vietnamese()
+    assert detected_info == {labels[name]: text for name, (text, _) in CARD_B.items()}
+    assert partial.fields == CARD_B
+    assert partial.reused == set()
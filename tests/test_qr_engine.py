@@ -0,0 +1,100 @@
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+import utils.qr_engine as qr_engine
+from utils.qr_engine import QRIntermediates, decode_qr_fast, decode_qr_parallel, locate_qr_with_finder_patterns
+
+PAYLOAD = '001099012345|123456789|Nguyễn Văn A|01011990|Nam|Hà Nội|01012021'
+
+
+def _symbol(text):
+    return [types.SimpleNamespace(data=text.encode('utf-8'))]
+
+
+@pytest.fixture
+def zbar(monkeypatch):
+    """
+    Replace zbar with a decoder that only succeeds on images of the heights in `readable`.
+    """
+    state = {'readable': set(), 'payload': PAYLOAD, 'shapes': []}
+
+    def decode(image):
+        state['shapes'].append(image.shape)
+        return _symbol(state['payload']) if image.shape[0] in state['readable'] else []
+
+    monkeypatch.setattr(qr_engine, 'zbar_decode', decode)
+    return state
+
+
+def _photo(height=100, width=150):
+    return np.full((height, width, 3), 128, dtype=np.uint8)
+
+
+def test_parallel_decode_returns_the_successful_attempt(zbar):
+    zbar['readable'] = {200}
+
+    assert decode_qr_parallel(_photo(), scales=(1, 2, 3)) == PAYLOAD
+
+
+def test_parallel_decode_returns_none_when_every_attempt_misses(zbar):
+    assert decode_qr_parallel(_photo(), scales=(1, 2)) is None
+    assert len(zbar['shapes']) == 2 * len(qr_engine.QR_VARIANTS)
+
+
+def test_parallel_decode_raises_when_only_broken_payloads_were_found(zbar):
+    zbar['readable'] = {100}
+    zbar['payload'] = 'Nguy盻n'
+
+    with pytest.raises(ValueError, match="encoding"):
+        decode_qr_parallel(_photo(), scales=(1,))
+
+
+def test_scales_past_the_size_limit_are_skipped(zbar):
+    decode_qr_parallel(_photo(), scales=(1, 2, 3), max_side=320)
+
+    assert {shape[0] for shape in zbar['shapes']} == {100, 200}
+
+
+def test_intermediates_are_computed_once_per_scale():
+    intermediates = QRIntermediates(_photo())
+
+    assert intermediates.scaled(2) is intermediates.scaled(2)
+    assert intermediates.gray() is intermediates.scaled(1)
+    assert intermediates.variant(2, 'otsu').shape == (200, 300)
+    with pytest.raises(ValueError):
+        intermediates.variant(1, 'unknown')
+
+
+def test_fast_decode_tries_the_located_region_first(zbar, monkeypatch):
+    monkeypatch.setattr(qr_engine, 'locate_qr_region', lambda img, model=None, class_names=None: (40, 20, 80, 60))
+    # Only the cropped region (40 px + margins = 52 px tall) is readable
+    zbar['readable'] = {52}
+
+    assert decode_qr_fast(_photo(), fallback=False) == PAYLOAD
+    assert {shape[0] for shape in zbar['shapes']} <= {52, 104, 156}
+
+
+def test_fast_decode_falls_back_to_the_full_image(zbar, monkeypatch):
+    monkeypatch.setattr(qr_engine, 'locate_qr_region', lambda img, model=None, class_names=None: None)
+    zbar['readable'] = {100}
+
+    assert decode_qr_fast(_photo()) == PAYLOAD
+    assert decode_qr_fast(_photo(), fallback=False) is None
+
+
+def test_finder_patterns_locate_a_real_qr_code():
+    code = cv2.QRCodeEncoder.create().encode('001099012345')
+    code = cv2.resize(code, None, fx=6, fy=6, interpolation=cv2.INTER_NEAREST)
+    photo = np.full((600, 900), 255, dtype=np.uint8)
+    y, x = 150, 500
+    photo[y:y + code.shape[0], x:x + code.shape[1]] = code
+
+    x1, y1, x2, y2 = locate_qr_with_finder_patterns(cv2.cvtColor(photo, cv2.COLOR_GRAY2BGR), max_side=450)
+
+    # The box covers the symbol (the encoder adds a quiet zone around it)
+    assert x <= x1 < x2 <= x + code.shape[1]
+    assert y <= y1 < y2 <= y + code.shape[0]
+    assert x2 - x1 > code.shape[1] / 2
@@ -0,0 +1,76 @@
+import contextlib
+
+import cv2
+import numpy as np
+import pytest
+
+import utils.ocr as ocr
+import utils.pipeline as pipeline
+from utils.quality import check_image_quality, measure_quality, quality_problems
+
+
+def _card_photo(card_scale=1.0, background=90):
+    """
+    Synthetic photo: a light card with dark text lines on a darker table.
+    """
+    img = np.full((900, 1200, 3), background, dtype=np.uint8)
+    width, height = int(856 * card_scale), int(540 * card_scale)
+    x0, y0 = (1200 - width) // 2, (900 - height) // 2
+    img[y0:y0 + height, x0:x0 + width] = 200
+    for i in range(12):
+        y = y0 + int(height * (0.2 + 0.06 * i))
+        cv2.putText(img, 'NGUYEN VAN A 0123456789', (x0 + int(40 * card_scale), y), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.9 * card_scale, (30, 30, 30), max(1, int(2 * card_scale)))
+    return img
+
+
+def _glared(img):
+    img = img.copy()
+    cv2.circle(img, (600, 450), 150, (255, 255, 255), -1)
+    return img
+
+
+def test_sharp_well_exposed_card_passes():
+    measurements = check_image_quality(_card_photo())
+
+    assert measurements['card_area'] > 0.3
+    assert quality_problems(measurements) == []
+
+
+@pytest.mark.parametrize('img, problem', [
+    (cv2.GaussianBlur(_card_photo(), (0, 0), 8), "ảnh bị mờ"),
+    ((_card_photo() * 0.15).astype(np.uint8), "ảnh quá tối"),
+    (cv2.add(_card_photo(), 80), "ảnh quá sáng"),
+    (_card_photo(card_scale=0.3), "CCCD quá nhỏ hoặc quá xa trong khung ảnh"),
+    (_glared(_card_photo()), "ảnh bị chói / phản chiếu ánh sáng trên thẻ"),
+])
+def test_unusable_photo_is_rejected(img, problem):
+    assert problem in quality_problems(measure_quality(img))
+    with pytest.raises(ValueError, match="Vui lòng chụp lại"):
+        check_image_quality(img)
+
+
+@pytest.fixture
+def no_reader(monkeypatch):
+    @contextlib.contextmanager
+    def borrow(**kwargs):
+        raise AssertionError("a rejected photo must not reach EasyOCR")
+        yield
+
+    monkeypatch.setattr(ocr, 'borrow_ocr_reader', borrow)
+
+
+def test_direct_ocr_applies_the_gate(no_reader):
+    with pytest.raises(ValueError, match="Ảnh chưa đạt chất lượng: Ảnh bị mờ"):
+        ocr.OCR_img(cv2.GaussianBlur(_card_photo(), (0, 0), 8), check_quality=True)
+
+
+def test_direct_ocr_in_pipeline_returns_retake_error(no_reader, monkeypatch):
+    monkeypatch.setattr(pipeline, 'decode_qr_fast', lambda img, model=None, class_names=None: None)
+    monkeypatch.setattr(pipeline, 'OCR_img', lambda img: ocr.OCR_img(img, check_quality=True))
+    blurry = cv2.GaussianBlur(_card_photo(), (0, 0), 8)
+
+    results = pipeline.process_cccd(blurry, blurry, "CCCD Mới")
+
+    assert 'ocr_text' not in results
+    assert "Ảnh chưa đạt chất lượng: Ảnh bị mờ" in results['error']
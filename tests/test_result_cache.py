@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+
+from utils.result_cache import ResultCache, detector_cache_name, hash_image_array, hash_image_bytes, make_cache_key
+
+
+def test_memory_tier_is_lru():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', {'qr_code': 'a'})
+    cache.put('b', {'qr_code': 'b'})
+    assert cache.get('a') == {'qr_code': 'a'}
+    cache.put('c', {'qr_code': 'c'})
+
+    assert cache.get('b') is None
+    assert cache.get('a') == {'qr_code': 'a'}
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['misses'], stats['memory_entries']) == (2, 1, 2)
+
+
+def test_disk_tier_is_shared_between_caches(tmp_path):
+    ResultCache(max_entries=4, disk_dir=str(tmp_path)).put('key', {'ocr_text': ['dòng 1']})
+
+    other = ResultCache(max_entries=4, disk_dir=str(tmp_path))
+    assert other.get('key') == {'ocr_text': ['dòng 1']}
+    assert other.stats()['disk_hits'] == 1
+    # Promoted to memory on the first disk hit
+    assert other.get('key') == {'ocr_text': ['dòng 1']}
+    assert other.stats()['memory_hits'] == 1
+
+
+def test_disk_tier_drops_oldest_files_past_its_budget(tmp_path):
+    cache = ResultCache(max_entries=1, disk_dir=str(tmp_path), disk_max_mb=1500 / (1024 * 1024))
+    cache.put('old', {'ocr_text': ['x' * 600]})
+    old_path = os.path.join(str(tmp_path), 'old.json')
+    os.utime(old_path, (1, 1))
+    cache.put('new', {'ocr_text': ['y' * 600]})
+    cache.put('newest', {'ocr_text': ['z' * 600]})
+
+    assert not os.path.exists(old_path)
+    assert cache.stats()['disk_evictions'] == 1
+
+
+def test_unreadable_disk_entry_is_a_miss(tmp_path):
+    (tmp_path / 'broken.json').write_text('{not json', encoding='utf-8')
+
+    assert ResultCache(disk_dir=str(tmp_path)).get('broken') is None
+
+
+def test_cache_key_covers_everything_that_changes_the_result(monkeypatch):
+    monkeypatch.delenv('DETECTOR_BACKEND', raising=False)
+    image_hash = hash_image_bytes(b'jpeg bytes')
+    keys = {
+        make_cache_key(image_hash, method='qr', cccd_type="CCCD Mới"),
+        make_cache_key(image_hash, method='qr', cccd_type="CCCD Cũ"),
+        make_cache_key(image_hash, model=detector_cache_name('yolov8'), method='qr', cccd_type="CCCD Mới"),
+        make_cache_key(image_hash, model=detector_cache_name('yolov8', 'onnx'), method='qr', cccd_type="CCCD Mới"),
+        make_cache_key(hash_image_bytes(b'other bytes'), method='qr', cccd_type="CCCD Mới"),
+    }
+
+    assert len(keys) == 5
+    assert detector_cache_name('yolov8') == 'yolov8/pytorch'
+
+
+def test_array_hash_depends_on_shape_and_content():
+    img = np.zeros((4, 6, 3), dtype=np.uint8)
+
+    assert hash_image_array(img) == hash_image_array(img.copy())
+    assert hash_image_array(img) != hash_image_array(img.reshape(6, 4, 3))
+    assert hash_image_array(img) != hash_image_array(img + 1)
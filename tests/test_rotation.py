@@ -0,0 +1,37 @@
+import cv2
+import numpy as np
+import pytest
+
+from utils.model_inference import flip_boxes_180, unrotate_box
+
+
+def _marked_box(mask):
+    ys, xs = np.nonzero(mask)
+    return xs.min(), ys.min(), xs.max() + 1, ys.max() + 1
+
+
+@pytest.mark.parametrize('rotation', [None, cv2.ROTATE_90_CLOCKWISE, cv2.ROTATE_180, cv2.ROTATE_90_COUNTERCLOCKWISE])
+def test_unrotate_box_maps_back_to_source(rotation):
+    # Non-square image and an off-centre box, so a swapped axis or a wrong side would show
+    source = np.zeros((60, 100), dtype=np.uint8)
+    source[10:25, 30:80] = 255
+    rotated = source if rotation is None else cv2.rotate(source, rotation)
+
+    box = unrotate_box(_marked_box(rotated), rotation, rotated.shape)
+
+    assert tuple(int(v) for v in box) == _marked_box(source)
+
+
+def test_unrotate_box_ignores_extra_columns():
+    assert unrotate_box([1, 2, 3, 4, 0.9, 6], None, (10, 10)) == (1, 2, 3, 4)
+
+
+def test_flip_boxes_180_matches_rotated_image():
+    source = np.zeros((60, 100), dtype=np.uint8)
+    source[10:25, 30:80] = 255
+    predictions = np.array([[*_marked_box(source), 0.9, 6]], dtype=np.float32)
+
+    flipped = flip_boxes_180(predictions, source.shape)
+
+    assert tuple(flipped[0, :4].astype(int)) == _marked_box(cv2.rotate(source, cv2.ROTATE_180))
+    assert flipped[0, 4] == np.float32(0.9) and flipped[0, 5] == 6
@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import spool_worker
+import utils.pipeline as pipeline
+import utils.result_cache as result_cache
+from utils.spool import Spool
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return Spool(str(tmp_path))
+
+
+def _age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_claim_returns_jobs_in_submission_order(spool):
+    first = spool.enqueue({'front.jpg': b'a'}, {'n': 1})
+    second = spool.enqueue({'front.jpg': b'b'}, {'n': 2})
+    assert spool.depth() == 2
+
+    assert spool.claim() == (first, {'n': 1}, {'front.jpg': b'a'})
+    assert spool.status(first) == {'status': 'processing'}
+    assert spool.status(second) == {'status': 'queued'}
+    assert spool.claim()[0] == second
+    assert spool.claim() is None
+
+
+def test_complete_stores_result_and_drops_files(spool):
+    job_id = spool.enqueue({'front.jpg': b'a'}, {})
+    spool.claim()
+    spool.complete(job_id, {'qr_code': '001099012345|...'})
+
+    assert spool.status(job_id) == {'status': 'done', 'result': {'qr_code': '001099012345|...'}}
+    assert not os.path.exists(os.path.join(spool.root, 'processing', job_id))
+
+
+def test_status_rejects_unknown_and_malformed_ids(spool):
+    assert spool.status('00000000000000000000-000000000000') == {'status': 'unknown'}
+    assert spool.status('../done/x') == {'status': 'unknown'}
+
+
+def test_failed_enqueue_leaves_no_staging_directory(spool):
+    with pytest.raises(TypeError):
+        spool.enqueue({'front.jpg': b'a'}, {'bad': object()})
+
+    assert os.listdir(os.path.join(spool.root, 'incoming')) == []
+    assert spool.depth() == 0
+
+
+def test_requeue_stale_uses_claim_time(spool):
+    job_id = spool.enqueue({'front.jpg': b'a'}, {})
+    # Waited in the queue for a long time before being claimed
+    _age(os.path.join(spool.root, 'pending', job_id), 3600)
+    spool.claim()
+
+    assert spool.requeue_stale(max_age=600) == 0
+
+    _age(os.path.join(spool.root, 'processing', job_id), 3600)
+    assert spool.requeue_stale(max_age=600) == 1
+    assert spool.status(job_id) == {'status': 'queued'}
+
+
+def test_heartbeat_keeps_long_job_claimed(spool):
+    job_id = spool.enqueue({'front.jpg': b'a'}, {})
+    spool.claim()
+    path = os.path.join(spool.root, 'processing', job_id)
+    _age(path, 3600)
+
+    with spool.heartbeat(job_id, interval=0.01):
+        deadline = time.time() + 5
+        while os.path.getmtime(path) < time.time() - 60 and time.time() < deadline:
+            time.sleep(0.01)
+
+    assert spool.requeue_stale(max_age=600) == 0
+    assert spool.status(job_id) == {'status': 'processing'}
+
+
+def test_purge_incoming_removes_only_old_staging(spool):
+    old = os.path.join(spool.root, 'incoming', 'old')
+    fresh = os.path.join(spool.root, 'incoming', 'fresh')
+    os.makedirs(old)
+    os.makedirs(fresh)
+    _age(old, 3600)
+
+    spool.purge_incoming(max_age=600)
+
+    assert os.listdir(os.path.join(spool.root, 'incoming')) == ['fresh']
+
+
+def test_worker_ocrs_front_when_qr_encoding_is_broken(spool, monkeypatch):
+    def broken_qr(img, model=None, class_names=None):
+        raise ValueError("QR code có chứa ký tự lỗi encoding.")
+
+    monkeypatch.setattr(pipeline, 'decode_qr_fast', broken_qr)
+    monkeypatch.setattr(pipeline, 'OCR_img', lambda img: ['CĂN CƯỚC CÔNG DÂN', '001099012345'])
+    monkeypatch.setattr(result_cache, 'get_result_cache', lambda: None)
+
+    image = cv2.imencode('.jpg', np.full((40, 60, 3), 200, dtype=np.uint8))[1].tobytes()
+    job_id = spool.enqueue({'front': image, 'back': image}, {'cccd_type': "CCCD Mới", 'ocr_method': "OCR trực tiếp"})
+    spool_worker.work(spool, 0, threading.Event(), once=True)
+
+    result = spool.status(job_id)['result']
+    assert 'detail' not in result
+    assert result['qr_code'] is None
+    assert result['ocr_text'] == ['CĂN CƯỚC CÔNG DÂN', '001099012345']
@@ -0,0 +1,56 @@
+import os
+from collections import Counter
+from multiprocessing import resource_tracker
+
+import numpy as np
+
+from utils import worker_pool
+from utils.worker_pool import THREAD_ENV_VARS, attach_image, share_image, threads_per_worker
+
+
+def test_shared_image_round_trip():
+    img = np.arange(2 * 3 * 3, dtype=np.uint8).reshape(2, 3, 3)
+    owner, spec = share_image(img)
+    try:
+        shm, view = attach_image(spec)
+        assert np.array_equal(view, img)
+        del view
+        shm.close()
+    finally:
+        owner.close()
+        owner.unlink()
+
+
+def test_attach_leaves_segment_to_its_owner(monkeypatch):
+    registered = Counter()
+    monkeypatch.setattr(resource_tracker, 'register', lambda name, rtype: registered.update([name]))
+    monkeypatch.setattr(resource_tracker, 'unregister', lambda name, rtype: registered.subtract([name]))
+
+    owner, spec = share_image(np.zeros((4, 4), dtype=np.uint8))
+    owned = +registered
+    shm, view = attach_image(spec)
+    del view
+    shm.close()
+
+    # Only the owner's registration is left, for the owner's unlink to remove
+    assert +registered == owned
+    owner.close()
+    owner.unlink()
+
+
+def test_thread_environ_is_restored(monkeypatch):
+    monkeypatch.setenv('OMP_NUM_THREADS', '8')
+    monkeypatch.delenv('OPENBLAS_NUM_THREADS', raising=False)
+
+    with worker_pool._thread_environ(2):
+        assert all(os.environ[var] == '2' for var in THREAD_ENV_VARS)
+
+    assert os.environ['OMP_NUM_THREADS'] == '8'
+    assert 'OPENBLAS_NUM_THREADS' not in os.environ
+
+
+def test_threads_per_worker_splits_cores(monkeypatch):
+    monkeypatch.setattr(os, 'cpu_count', lambda: 8)
+
+    assert threads_per_worker(4) == 2
+    assert threads_per_worker(16) == 1
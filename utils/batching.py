@@ -0,0 +1,197 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from functools import partial
+
+from utils.model_inference import predict_boxes
+
+# Largest number of images sent to the detector in one forward pass
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get('DETECTOR_BATCH_MAX_SIZE', '8'))
+
+# How long the first queued image waits for others before the batch runs
+DEFAULT_MAX_WAIT_MS = float(os.environ.get('DETECTOR_BATCH_MAX_WAIT_MS', '20'))
+
+
+class MicroBatcher:
+    """
+    Collects detector requests from concurrent callers and runs them as one batch.
+
+    A batch runs when `max_batch_size` images are queued or when the oldest
+    queued image has waited `max_wait_ms`, whichever comes first. The batcher
+    exposes `predict_boxes(images)`, so it can be passed anywhere a model is.
+
+    `model` is either the detector itself or, with `resolve=True`, a callable returning
+    it that is called for every batch (e.g. a registry lookup, so the batcher does not
+    keep a model alive after the registry evicted it).
+    """
+
+    def __init__(self, model, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS, name='detector',
+                 resolve=False):
+        self.model = model
+        self.resolve = resolve
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'batcher-{name}', daemon=True)
+        self._thread.start()
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._queue_times = deque(maxlen=1000)
+        self._queue_time_sum = 0.0
+        self._queue_time_count = 0
+        self._batch_seconds_sum = 0.0
+
+    def submit(self, image):
+        """
+        Queue one BGR image. The returned future resolves to its (N, 6) box array.
+        """
+        if self._stopped.is_set():
+            raise RuntimeError(f"Batcher {self.name} is closed")
+        future = Future()
+        self._queue.put((image, future, time.perf_counter()))
+        return future
+
+    def predict_boxes(self, images):
+        futures = [self.submit(image) for image in images]
+        return [future.result() for future in futures]
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopped.set()
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            started = time.perf_counter()
+            try:
+                # No reference to a resolved model outlives the batch
+                outputs = predict_boxes(self.model() if self.resolve else self.model, [image for image, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future, _), boxes in zip(batch, outputs):
+                    future.set_result(boxes)
+            self._record(batch, started)
+
+            if self._stopped.is_set() and self._queue.empty():
+                return
+
+    def _record(self, batch, started):
+        finished = time.perf_counter()
+        with self._stats_lock:
+            self._batch_sizes[len(batch)] += 1
+            self._batch_seconds_sum += finished - started
+            for _, _, enqueued in batch:
+                waited = started - enqueued
+                self._queue_times.append(waited)
+                self._queue_time_sum += waited
+                self._queue_time_count += 1
+
+    def metrics(self):
+        """
+        Report batch-size and queue-time statistics.
+
+        Returns:
+            dict : batches, images, mean_batch_size, batch_size_histogram,
+                   queue_ms_mean / p50 / p95 / max (over the last 1000 images), mean_batch_ms
+        """
+        with self._stats_lock:
+            batches = sum(self._batch_sizes.values())
+            images = sum(size * count for size, count in self._batch_sizes.items())
+            recent = sorted(self._queue_times)
+
+            def quantile(q):
+                return recent[min(len(recent) - 1, int(q * len(recent)))] * 1000 if recent else 0.0
+
+            return {
+                'name': self.name,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'queue_depth': self._queue.qsize(),
+                'batches': batches,
+                'images': images,
+                'mean_batch_size': images / batches if batches else 0.0,
+                'batch_size_histogram': dict(sorted(self._batch_sizes.items())),
+                'queue_ms_mean': self._queue_time_sum / self._queue_time_count * 1000 if self._queue_time_count else 0.0,
+                'queue_ms_p50': quantile(0.5),
+                'queue_ms_p95': quantile(0.95),
+                'queue_ms_max': recent[-1] * 1000 if recent else 0.0,
+                'mean_batch_ms': self._batch_seconds_sum / batches * 1000 if batches else 0.0,
+            }
+
+    def close(self):
+        """
+        Stop accepting images; queued images are still processed.
+        """
+        self._stopped.set()
+        self._queue.put(None)
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(model_name='yolov8', device='cpu', backend=None):
+    """
+    Get the process-wide batcher in front of a shared detector.
+
+    The batcher looks the model up in the registry for every batch, so the registry's
+    memory budget still applies and an evicted model is reloaded only once, there.
+
+    Parameters:
+        model_name : str : Name of the model variant (e.g., yolov8, yolov11, etc.)
+        device : str : Device to load the model on ('cpu' or 'cuda')
+        backend : str : Detector backend (see get_backends())
+
+    Returns:
+        batcher : MicroBatcher
+    """
+    from utils.model_registry import get_shared_model
+
+    backend = backend or os.environ.get('DETECTOR_BACKEND', 'pytorch')
+    key = (model_name, device, backend)
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            # Load now so the first batch does not pay for it
+            get_shared_model(model_name=model_name, device=device, backend=backend)
+            batcher = MicroBatcher(partial(get_shared_model, model_name=model_name, device=device, backend=backend),
+                                   name=f'{model_name}-{backend}', resolve=True)
+            _batchers[key] = batcher
+    return batcher
+
+
+def get_batcher_metrics():
+    """
+    Metrics of every batcher created in this process.
+    """
+    with _batchers_lock:
+        batchers = list(_batchers.values())
+    return [batcher.metrics() for batcher in batchers]
@@ -0,0 +1,322 @@
+import json
+import os
+import re
+import threading
+import unicodedata
+
+import cv2
+import numpy as np
+
+from utils.metrics import timed
+from utils.preprocess import to_working_resolution
+
+# ID-1 card: 85.6 x 54 mm
+CARD_ASPECT = 85.6 / 54
+
+# Size of the rectified card the field crops are cut from (20 px/mm, enough for the OCR recognizer)
+CANONICAL_SIZE = (1712, 1080)
+
+# Longest side of the copy searched for the card outline
+CORNER_SEARCH_MAX_SIDE = 640
+
+# Smallest share of the photo the card must cover for its outline to be trusted
+MIN_CARD_AREA = 0.2
+
+# Below this confidence the template is not used and the detector runs instead
+TEMPLATE_MIN_CONFIDENCE = float(os.environ.get('CCCD_TEMPLATE_MIN_CONFIDENCE', '0.75'))
+
+# JSON file with calibrated templates (see scripts/calibrate_template.py); overrides DEFAULT_TEMPLATES
+TEMPLATE_FILE = os.environ.get('CCCD_TEMPLATE_FILE', os.path.join(os.getcwd(), 'models_inference', 'card_templates.json'))
+
+# A text field counts as present when at least this share of its pixels is ink
+MIN_FIELD_INK = 0.03
+
+# Normalized (x1, y1, x2, y2) of each text field on the front side of the chip card ("CCCD Mới").
+# Approximate defaults: calibrate them on real photos with scripts/calibrate_template.py.
+# By default template cropping only runs for card types calibrated in TEMPLATE_FILE (see utils/ocr.py).
+_CHIP_FRONT_LAYOUT = {
+    'id': (0.37, 0.36, 0.80, 0.46),
+    'name': (0.29, 0.51, 0.97, 0.59),
+    'dob': (0.54, 0.58, 0.82, 0.65),
+    'gender': (0.44, 0.64, 0.58, 0.71),
+    'nationality': (0.74, 0.64, 0.98, 0.71),
+    'origin_place': (0.29, 0.70, 0.98, 0.80),
+    'current_place': (0.29, 0.79, 0.98, 0.97),
+    'expire_date': (0.02, 0.85, 0.28, 0.93),
+}
+
+# "CCCD Cũ" has a different layout that has not been measured: it has no default and
+# always goes through the detector unless a calibrated template is provided
+DEFAULT_TEMPLATES = {
+    "CCCD Mới": _CHIP_FRONT_LAYOUT,
+}
+
+# Expected format of the fields read from template crops; a crop that is shifted or includes
+# the printed label still contains text, so presence alone does not validate it
+_DATE = re.compile(r'\d{2}/\d{2}/\d{4}')
+FIELD_PATTERNS = {
+    'id': re.compile(r'\d{12}|\d{9}'),
+    'dob': _DATE,
+    'issue_date': _DATE,
+    'expire_date': _DATE,
+}
+GENDER_VALUES = {'nam', 'nữ', 'nu'}
+
+# Printed labels of the front side, lower case; none of them belongs in a field value
+PRINTED_LABELS = (
+    'họ và tên', 'full name', 'ngày sinh', 'date of birth', 'giới tính', 'sex', 'quốc tịch', 'nationality',
+    'quê quán', 'place of origin', 'nơi thường trú', 'place of residence', 'có giá trị đến', 'date of expiry',
+    'số định danh', 'personal identification', 'căn cước',
+)
+
+_calibrated = None
+_templates_lock = threading.Lock()
+
+
+def get_card_templates(calibrated_only=False):
+    """
+    Field templates per card type: calibrated ones from TEMPLATE_FILE if present, else DEFAULT_TEMPLATES.
+
+    Parameters:
+        calibrated_only : bool : Leave out the card types that only have an approximate default
+
+    Returns:
+        dict : cccd_type -> {class_name: (x1, y1, x2, y2) normalized to the rectified card}
+    """
+    global _calibrated
+    with _templates_lock:
+        if _calibrated is None:
+            calibrated = {}
+            if os.path.exists(TEMPLATE_FILE):
+                with open(TEMPLATE_FILE, encoding='utf-8') as f:
+                    calibrated = {
+                        cccd_type: {name: tuple(box) for name, box in fields.items()}
+                        for cccd_type, fields in json.load(f).items()
+                    }
+            _calibrated = calibrated
+    if calibrated_only:
+        return dict(_calibrated)
+    return {**DEFAULT_TEMPLATES, **_calibrated}
+
+
+def invalid_template_fields(readings):
+    """
+    Fields read from template crops whose text does not look like the field's value.
+
+    Parameters:
+        readings : dict : class name -> (text, confidence)
+
+    Returns:
+        list : Names of the fields that fail validation
+    """
+    invalid = []
+    for name, (text, _) in readings.items():
+        value = unicodedata.normalize('NFC', text).strip()
+        compact = re.sub(r'[\s.\-]', '', value)
+        lowered = value.lower()
+        if name in FIELD_PATTERNS:
+            valid = FIELD_PATTERNS[name].fullmatch(compact) is not None
+        elif name == 'gender':
+            valid = lowered in GENDER_VALUES
+        else:
+            valid = len(compact) >= 2 and not any(label in lowered for label in PRINTED_LABELS)
+        if not valid:
+            invalid.append(name)
+    return invalid
+
+
+def order_corners(points):
+    """
+    Order four points as top-left, top-right, bottom-right, bottom-left.
+    """
+    points = np.asarray(points, dtype=np.float32).reshape(4, 2)
+    sums = points.sum(axis=1)
+    diffs = points[:, 1] - points[:, 0]
+    return np.array([
+        points[np.argmin(sums)],
+        points[np.argmin(diffs)],
+        points[np.argmax(sums)],
+        points[np.argmax(diffs)],
+    ], dtype=np.float32)
+
+
+def _edge_lengths(quad):
+    top = np.linalg.norm(quad[1] - quad[0])
+    bottom = np.linalg.norm(quad[2] - quad[3])
+    left = np.linalg.norm(quad[3] - quad[0])
+    right = np.linalg.norm(quad[2] - quad[1])
+    return (top + bottom) / 2, (left + right) / 2
+
+
+def detect_card_corners(img, max_side=CORNER_SEARCH_MAX_SIDE, min_area=MIN_CARD_AREA):
+    """
+    Find the card outline on a downscaled copy of the photo.
+
+    The corners are ordered so the card's long edge runs from corner 0 to corner 1;
+    whether the card is upside down is decided later (see rectify_card).
+
+    Parameters:
+        img : np.ndarray : BGR image
+        max_side : int : Longest side of the copy searched
+        min_area : float : Smallest share of the photo an outline may cover
+
+    Returns:
+        corners : np.ndarray | None : (4, 2) float32 corners in `img` coordinates
+        confidence : float : 0-1, from the outline's aspect ratio and how well it fills a quadrilateral
+    """
+    small, (sx, sy) = to_working_resolution(img, max_side)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    gray = cv2.GaussianBlur(gray, (5, 5), 0)
+    edges = cv2.dilate(cv2.Canny(gray, 50, 150), np.ones((3, 3), np.uint8))
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    height, width = gray.shape[:2]
+    image_area = float(height * width)
+    scale = np.array([sx, sy], dtype=np.float32)
+
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:5]:
+        hull = cv2.convexHull(contour)
+        approx = cv2.approxPolyDP(hull, 0.02 * cv2.arcLength(hull, True), True)
+        if len(approx) != 4:
+            continue
+        quad_area = cv2.contourArea(approx)
+        if quad_area < min_area * image_area:
+            continue
+
+        quad = order_corners(approx)
+        long_edge, short_edge = _edge_lengths(quad)
+        if short_edge > long_edge:
+            # Card photographed in portrait: start from the bottom-left so the long edge comes first
+            quad = np.roll(quad, 1, axis=0)
+            long_edge, short_edge = short_edge, long_edge
+
+        aspect_error = abs(long_edge / max(short_edge, 1.0) - CARD_ASPECT) / CARD_ASPECT
+        fill = min(1.0, cv2.contourArea(hull) / max(quad_area, 1.0))
+        confidence = float(np.clip(1.0 - 4.0 * aspect_error, 0.0, 1.0) * fill)
+        return quad * scale, confidence
+
+    # No outline: the photo may already be cropped to the card
+    long_side, short_side = max(img.shape[:2]), min(img.shape[:2])
+    aspect_error = abs(long_side / short_side - CARD_ASPECT) / CARD_ASPECT
+    confidence = float(np.clip(1.0 - 4.0 * aspect_error, 0.0, 1.0)) * 0.9
+    if confidence <= 0:
+        return None, 0.0
+    img_h, img_w = img.shape[:2]
+    quad = np.array([[0, 0], [img_w, 0], [img_w, img_h], [0, img_h]], dtype=np.float32)
+    if img_h > img_w:
+        quad = np.roll(quad, 1, axis=0)
+    return quad, confidence
+
+
+def field_ink_ratio(gray, box):
+    """
+    Share of dark (text) pixels inside a normalized box of a binarized card.
+    """
+    height, width = gray.shape[:2]
+    x1, y1, x2, y2 = box
+    region = gray[int(y1 * height):int(y2 * height), int(x1 * width):int(x2 * width)]
+    return float(np.count_nonzero(region)) / region.size if region.size else 0.0
+
+
+def template_score(card, template):
+    """
+    How well the text on a rectified card matches the template.
+
+    Parameters:
+        card : np.ndarray : Rectified BGR card
+        template : dict : Field boxes from get_card_templates()
+
+    Returns:
+        filled : float : Share of template fields that contain text (0-1)
+        ink : float : Mean ink ratio over the template fields
+    """
+    small, _ = to_working_resolution(card, CANONICAL_SIZE[0] // 4)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 10)
+    ratios = [field_ink_ratio(binary, box) for box in template.values()]
+    if not ratios:
+        return 0.0, 0.0
+    return sum(ratio >= MIN_FIELD_INK for ratio in ratios) / len(ratios), float(np.mean(ratios))
+
+
+def rectify_card(img, corners, template, size=CANONICAL_SIZE):
+    """
+    Warp the card to the canonical size, picking the upright of the two possible orientations.
+
+    Returns:
+        card : np.ndarray : Rectified BGR card of `size`
+        score : float : template_score of the chosen orientation
+    """
+    width, height = size
+    target = np.array([[0, 0], [width, 0], [width, height], [0, height]], dtype=np.float32)
+    card = cv2.warpPerspective(img, cv2.getPerspectiveTransform(np.asarray(corners, np.float32), target),
+                               (width, height), flags=cv2.INTER_LINEAR)
+
+    # The corners do not tell which short edge is the top: keep the orientation
+    # whose template fields hold the most text
+    flipped = cv2.rotate(card, cv2.ROTATE_180)
+    filled, ink = template_score(card, template)
+    flipped_filled, flipped_ink = template_score(flipped, template)
+    if flipped_ink > ink:
+        return flipped, flipped_filled
+    return card, filled
+
+
+def crop_fields_with_template(img, class_names, cccd_type, min_confidence=TEMPLATE_MIN_CONFIDENCE, calibrated_only=False):
+    """
+    Cut field crops from a fixed per-card-type layout instead of running the detector.
+
+    Parameters:
+        img : np.ndarray : BGR photo of the front side
+        class_names : list : Class names from get_class()
+        cccd_type : str : Card type, selects the template
+        min_confidence : float : Combined corner / template confidence required
+        calibrated_only : bool : Return no crops for a card type without a calibrated template
+
+    Returns:
+        docs : list | None : (crop, class_id) pairs, or None when the template is not trusted
+        card : np.ndarray | None : The rectified card
+        confidence : float
+    """
+    template = get_card_templates(calibrated_only).get(cccd_type)
+    if not template:
+        return None, None, 0.0
+
+    with timed('template'):
+        corners, corner_confidence = detect_card_corners(img)
+        if corners is None or corner_confidence < min_confidence:
+            return None, None, corner_confidence
+
+        card, score = rectify_card(img, corners, template)
+        confidence = corner_confidence * score
+        if confidence < min_confidence:
+            return None, card, confidence
+
+        height, width = card.shape[:2]
+        docs = []
+        for name, (x1, y1, x2, y2) in template.items():
+            if name not in class_names:
+                continue
+            crop = card[int(y1 * height):int(y2 * height), int(x1 * width):int(x2 * width)]
+            docs.append((crop, class_names.index(name)))
+    return docs, card, confidence
+
+
+def template_from_detections(predictions, class_names, size=CANONICAL_SIZE):
+    """
+    Normalized field boxes from detector output on a rectified card (used for calibration).
+
+    Parameters:
+        predictions : np.ndarray : (N, 6) boxes from predict_boxes on a card of `size`
+        class_names : list : Class names from get_class()
+
+    Returns:
+        dict : class_name -> (x1, y1, x2, y2) of the most confident box per class
+    """
+    width, height = size
+    best = {}
+    for x1, y1, x2, y2, conf, cls in np.asarray(predictions).reshape(-1, 6).tolist():
+        name = class_names[int(cls)]
+        if conf > best.get(name, (None, -1.0))[1]:
+            best[name] = ((x1 / width, y1 / height, x2 / width, y2 / height), conf)
+    return {name: box for name, (box, _) in best.items()}
@@ -0,0 +1,181 @@
+import os
+import threading
+from collections import Counter
+
+import numpy as np
+
+from utils.metrics import METRICS, Gauge
+from utils.model_inference import get_class, get_required_fields, predict_boxes
+
+# Model name that selects the cascade wherever a detector name is accepted (app, API, workers, CLI)
+CASCADE_MODEL_NAME = 'cascade'
+
+# Models tried in order: the cheaper one first (YOLOv11n has fewer FLOPs than YOLOv8n at imgsz 640)
+CASCADE_ORDER = [name for name in os.environ.get('CCCD_CASCADE_ORDER', 'yolov11,yolov8').split(',') if name]
+
+# A required field whose best box is less confident than this is re-detected by the next model
+CASCADE_MIN_CONFIDENCE = float(os.environ.get('CCCD_CASCADE_MIN_CONFIDENCE', '0.5'))
+
+
+def weak_classes(boxes, class_ids, min_confidence):
+    """
+    Required classes that are missing or only found with low confidence.
+
+    Parameters:
+        boxes : np.ndarray : (N, 6) detector output
+        class_ids : iterable : Class ids that must be present
+        min_confidence : float : Lowest acceptable best-box confidence
+
+    Returns:
+        set : Class ids to escalate
+    """
+    boxes = np.asarray(boxes).reshape(-1, 6)
+    weak = set()
+    for class_id in class_ids:
+        confidences = boxes[boxes[:, 5] == class_id, 4]
+        if confidences.size == 0 or confidences.max() < min_confidence:
+            weak.add(class_id)
+    return weak
+
+
+def merge_boxes(primary, secondary, class_ids):
+    """
+    Replace the boxes of `class_ids` in `primary` by those of `secondary` where the secondary model is more confident.
+
+    Returns:
+        tuple : (merged (N, 6) array, set of class ids taken from `secondary`)
+    """
+    primary = np.asarray(primary, dtype=np.float32).reshape(-1, 6)
+    secondary = np.asarray(secondary, dtype=np.float32).reshape(-1, 6)
+    replaced = set()
+    for class_id in class_ids:
+        ours = primary[primary[:, 5] == class_id, 4]
+        theirs = secondary[secondary[:, 5] == class_id, 4]
+        if theirs.size and (ours.size == 0 or theirs.max() > ours.max()):
+            replaced.add(class_id)
+    if not replaced:
+        return primary, replaced
+
+    keep = ~np.isin(primary[:, 5], list(replaced))
+    taken = np.isin(secondary[:, 5], list(replaced))
+    return np.concatenate([primary[keep], secondary[taken]]), replaced
+
+
+class CascadeDetector:
+    """
+    Runs the cheaper detector first and escalates to the next one only when required fields are weak.
+
+    Escalation happens per image: the next model sees the whole image, but only the boxes
+    of required fields that were missing or below `min_confidence` are taken from it.
+    Models are fetched from the shared registry on every call, so its memory budget still
+    applies. The cascade exposes `predict_boxes(images)`, so it can be passed anywhere a model is.
+    """
+
+    def __init__(self, model_names=CASCADE_ORDER, device='cpu', backend=None, min_confidence=CASCADE_MIN_CONFIDENCE,
+                 class_names=None):
+        if len(model_names) < 2:
+            raise ValueError("A cascade needs at least two models")
+        self.model_names = list(model_names)
+        self.device = device
+        self.backend = backend
+        self.min_confidence = min_confidence
+        class_names = class_names or get_class()
+        self.required_ids = [float(class_names.index(name)) for name in get_required_fields() if name in class_names]
+        self._class_names = class_names
+
+        self._stats_lock = threading.Lock()
+        self._images = 0
+        self._escalations = Counter()
+        self._escalated_fields = Counter()
+        self._replaced_fields = Counter()
+
+    def _model(self, name):
+        from utils.model_registry import get_shared_model
+
+        return get_shared_model(model_name=name, device=self.device, backend=self.backend)
+
+    def predict_boxes(self, images):
+        images = list(images)
+        outputs = [np.asarray(boxes).reshape(-1, 6) for boxes in predict_boxes(self._model(self.model_names[0]), images)]
+        weak = [weak_classes(boxes, self.required_ids, self.min_confidence) for boxes in outputs]
+
+        for name in self.model_names[1:]:
+            pending = [i for i, classes in enumerate(weak) if classes]
+            if not pending:
+                break
+            with self._stats_lock:
+                self._escalations[name] += len(pending)
+                for i in pending:
+                    self._escalated_fields.update(self._class_names[int(c)] for c in weak[i])
+
+            for i, boxes in zip(pending, predict_boxes(self._model(name), [images[i] for i in pending])):
+                outputs[i], replaced = merge_boxes(outputs[i], boxes, weak[i])
+                weak[i] = weak_classes(outputs[i], weak[i], self.min_confidence)
+                with self._stats_lock:
+                    self._replaced_fields.update(self._class_names[int(c)] for c in replaced)
+
+        with self._stats_lock:
+            self._images += len(images)
+        return outputs
+
+    def stats(self):
+        """
+        Escalation statistics since the process started.
+
+        Returns:
+            dict : images, escalations per model, escalation_rate (share of images that needed
+                   the second model), which required fields triggered it and which were replaced
+        """
+        with self._stats_lock:
+            escalated = self._escalations.get(self.model_names[1], 0)
+            return {
+                'models': self.model_names,
+                'min_confidence': self.min_confidence,
+                'images': self._images,
+                'escalations': dict(self._escalations),
+                'escalation_rate': escalated / self._images if self._images else 0.0,
+                'escalated_fields': dict(self._escalated_fields),
+                'replaced_fields': dict(self._replaced_fields),
+            }
+
+
+_cascades = {}
+_cascades_lock = threading.Lock()
+
+
+def get_cascade(device='cpu', backend=None):
+    """
+    Get the process-wide cascade over CASCADE_ORDER for a device / backend.
+
+    The first model is loaded right away; the others only when an image is first escalated.
+    """
+    backend = backend or os.environ.get('DETECTOR_BACKEND', 'pytorch')
+    key = (device, backend)
+    with _cascades_lock:
+        cascade = _cascades.get(key)
+        if cascade is None:
+            cascade = CascadeDetector(CASCADE_ORDER, device=device, backend=backend)
+            cascade._model(cascade.model_names[0])
+            _cascades[key] = cascade
+    return cascade
+
+
+def get_cascade_stats():
+    """
+    Statistics of every cascade created in this process.
+    """
+    with _cascades_lock:
+        cascades = list(_cascades.items())
+    return [{'device': device, 'backend': backend, **cascade.stats()} for (device, backend), cascade in cascades]
+
+
+def _escalation_rate():
+    stats = get_cascade_stats()
+    images = sum(s['images'] for s in stats)
+    return sum(s['escalation_rate'] * s['images'] for s in stats) / images if images else 0.0
+
+
+METRICS['cccd_cascade_escalation_ratio'] = Gauge(
+    'cccd_cascade_escalation_ratio', 'Share of images the cascade sent to its second detector.',
+    callback=_escalation_rate,
+)
@@ -0,0 +1,225 @@
+import abc
+import os
+
+import cv2
+import numpy as np
+
+from utils.model_inference import get_model_path
+
+# Backends able to run the exported YOLO field detector
+EXPORTED_BACKENDS = ('onnx', 'onnx-int8', 'openvino')
+
+# Both detectors were trained with imgsz: 640 (see args.yaml)
+DEFAULT_IMGSZ = 640
+
+# Intra-op threads for ONNX Runtime / OpenVINO (0 lets the runtime decide)
+DEFAULT_NUM_THREADS = int(os.environ.get('DETECTOR_NUM_THREADS', '0'))
+
+
+def get_export_path(model_name='yolov8', backend='onnx'):
+    """
+    Get the file path of an exported model.
+
+    Parameters:
+        model_name : str : Name of the model variant (e.g., yolov8, yolov11, etc.)
+        backend : str : One of EXPORTED_BACKENDS
+
+    Returns:
+        export_path : str : .onnx file, or OpenVINO .xml file
+    """
+    weights_dir = os.path.dirname(get_model_path(model_name))
+    if backend == 'onnx':
+        return os.path.join(weights_dir, 'best.onnx')
+    if backend == 'onnx-int8':
+        return os.path.join(weights_dir, 'best.int8.onnx')
+    if backend == 'openvino':
+        return os.path.join(weights_dir, 'best_openvino_model', 'best.xml')
+    raise ValueError(f"Unknown detector backend: {backend}")
+
+
+def export_model(model_name='yolov8', backend='onnx', imgsz=DEFAULT_IMGSZ, force=False):
+    """
+    Export the PyTorch weights for an exported backend (no-op if already exported).
+
+    'onnx-int8' applies ONNX Runtime dynamic int8 quantization to the ONNX export.
+
+    Parameters:
+        model_name : str : Name of the model variant (e.g., yolov8, yolov11, etc.)
+        backend : str : One of EXPORTED_BACKENDS
+        imgsz : int : Input size used for export
+        force : bool : Re-export even if the file exists
+
+    Returns:
+        export_path : str
+    """
+    export_path = get_export_path(model_name, backend)
+    if os.path.exists(export_path) and not force:
+        return export_path
+
+    from ultralytics import YOLO
+
+    if backend == 'onnx-int8':
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        onnx_path = export_model(model_name, 'onnx', imgsz=imgsz, force=force)
+        quantize_dynamic(onnx_path, export_path, weight_type=QuantType.QInt8)
+        return export_path
+
+    fmt = 'onnx' if backend == 'onnx' else 'openvino'
+    YOLO(get_model_path(model_name)).export(format=fmt, imgsz=imgsz, dynamic=True)
+
+    if not os.path.exists(export_path):
+        raise RuntimeError(f"Export of {model_name} to {backend} did not produce {export_path}")
+    return export_path
+
+
+def letterbox(image, imgsz=DEFAULT_IMGSZ):
+    """
+    Resize keeping aspect ratio and pad to a square imgsz x imgsz canvas (YOLO preprocessing).
+
+    Returns:
+        canvas : np.ndarray : Padded BGR image
+        ratio : float : Resize ratio applied to the image
+        pad : tuple : (pad_x, pad_y) offsets of the image inside the canvas
+    """
+    height, width = image.shape[:2]
+    ratio = min(imgsz / height, imgsz / width)
+    new_w, new_h = int(round(width * ratio)), int(round(height * ratio))
+    pad_x, pad_y = (imgsz - new_w) // 2, (imgsz - new_h) // 2
+
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = resized
+    return canvas, ratio, (pad_x, pad_y)
+
+
+class ExportedDetector(abc.ABC):
+    """
+    YOLOv8/YOLOv11 detector running an exported graph instead of PyTorch.
+
+    Subclasses implement `_infer` on a preprocessed NCHW float32 batch; this
+    class does the letterbox preprocessing, confidence filtering and NMS.
+    """
+
+    def __init__(self, model_path, imgsz=DEFAULT_IMGSZ, conf=0.25, iou=0.7, num_threads=DEFAULT_NUM_THREADS):
+        self.model_path = model_path
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.num_threads = num_threads
+
+    @abc.abstractmethod
+    def _infer(self, batch):
+        """
+        Run the exported graph.
+
+        Parameters:
+            batch : np.ndarray : (N, 3, imgsz, imgsz) float32 RGB batch scaled to [0, 1]
+
+        Returns:
+            np.ndarray : Raw (N, 4 + num_classes, num_anchors) predictions
+        """
+
+    def predict_boxes(self, images):
+        """
+        Run the detector on a list of BGR images.
+
+        Returns:
+            list : One (N, 6) float array per image with x1, y1, x2, y2, conf, class_id
+        """
+        letterboxed = [letterbox(image, self.imgsz) for image in images]
+        batch = np.stack([canvas[:, :, ::-1] for canvas, _, _ in letterboxed])
+        batch = np.ascontiguousarray(batch.transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+
+        outputs = self._infer(batch)
+        return [
+            self._postprocess(output, ratio, pad)
+            for output, (_, ratio, pad) in zip(outputs, letterboxed)
+        ]
+
+    def _postprocess(self, output, ratio, pad):
+        # (4 + num_classes, num_anchors) -> (num_anchors, 4 + num_classes)
+        predictions = output.T
+        scores = predictions[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+
+        keep = confidences >= self.conf
+        if not np.any(keep):
+            return np.zeros((0, 6), dtype=np.float32)
+        predictions, class_ids, confidences = predictions[keep], class_ids[keep], confidences[keep]
+
+        cx, cy, w, h = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / ratio
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / ratio
+
+        # Class-aware NMS: shift boxes of each class apart so they never overlap
+        offsets = class_ids[:, None].astype(np.float32) * (float(boxes.max()) + 1)
+        shifted = boxes + offsets
+        xywh = np.concatenate([shifted[:, :2], shifted[:, 2:] - shifted[:, :2]], axis=1)
+        indices = cv2.dnn.NMSBoxes(xywh.tolist(), confidences.tolist(), self.conf, self.iou)
+        indices = np.array(indices, dtype=int).reshape(-1)
+
+        return np.concatenate([
+            boxes[indices],
+            confidences[indices, None],
+            class_ids[indices, None].astype(np.float32),
+        ], axis=1).astype(np.float32)
+
+    def __call__(self, image):
+        return self.predict_boxes([image])[0]
+
+
+class OnnxDetector(ExportedDetector):
+    """
+    Detector running on ONNX Runtime (CPU execution provider).
+    """
+
+    def __init__(self, model_path, **kwargs):
+        super().__init__(model_path, **kwargs)
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.num_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _infer(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVinoDetector(ExportedDetector):
+    """
+    Detector running on the OpenVINO CPU plugin.
+    """
+
+    def __init__(self, model_path, **kwargs):
+        super().__init__(model_path, **kwargs)
+        import openvino as ov
+
+        config = {'INFERENCE_NUM_THREADS': self.num_threads} if self.num_threads else {}
+        self.compiled_model = ov.Core().compile_model(model_path, 'CPU', config)
+
+    def _infer(self, batch):
+        return self.compiled_model([batch])[0]
+
+
+def load_exported_detector(model_name='yolov8', backend='onnx', num_threads=DEFAULT_NUM_THREADS):
+    """
+    Export (if needed) and load a detector for an exported backend.
+
+    Parameters:
+        model_name : str : Name of the model variant (e.g., yolov8, yolov11, etc.)
+        backend : str : One of EXPORTED_BACKENDS
+        num_threads : int : Intra-op threads (0 lets the runtime decide)
+
+    Returns:
+        detector : ExportedDetector
+    """
+    export_path = export_model(model_name, backend)
+    if backend == 'openvino':
+        return OpenVinoDetector(export_path, num_threads=num_threads)
+    return OnnxDetector(export_path, num_threads=num_threads)
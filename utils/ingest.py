@@ -0,0 +1,141 @@
+import io
+import os
+
+import cv2
+import numpy as np
+
+# Longest side wanted from the decoder. Large JPEGs are decoded at 1/2, 1/4 or 1/8
+# scale in the DCT domain as long as the result stays at least this big (0 = always full size).
+INGEST_MAX_SIDE = int(os.environ.get('CCCD_INGEST_MAX_SIDE', '2000'))
+
+DECODE_ERROR = "❌ Không đọc được ảnh. Vui lòng dùng file JPG, JPEG hoặc PNG."
+
+# Start-of-frame markers carrying the image size (baseline, progressive, arithmetic...)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def jpeg_size(data):
+    """
+    Read (width, height) from a JPEG header without decoding it.
+
+    Parameters:
+        data : bytes-like : Encoded file
+
+    Returns:
+        tuple | None : (width, height), or None if `data` is not a readable JPEG
+    """
+    view = memoryview(data).cast('B')
+    n = len(view)
+    if n < 4 or view[0] != 0xFF or view[1] != 0xD8:
+        return None
+
+    i = 2
+    while i + 9 < n:
+        if view[i] != 0xFF:
+            return None
+        marker = view[i + 1]
+        if marker == 0xFF:
+            # Fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Markers without a length field
+            i += 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height = (view[i + 5] << 8) | view[i + 6]
+            width = (view[i + 7] << 8) | view[i + 8]
+            return width, height
+        i += 2 + ((view[i + 2] << 8) | view[i + 3])
+    return None
+
+
+def reduced_decode_flag(longest, max_side):
+    """
+    Pick the strongest IMREAD_REDUCED_COLOR_* flag that keeps the longest side >= max_side.
+    """
+    if max_side > 0:
+        for factor, flag in _REDUCED_FLAGS:
+            if longest // factor >= max_side:
+                return flag
+    return cv2.IMREAD_COLOR
+
+
+def _decode_with_pil(data, max_side):
+    # Formats OpenCV can not read (or builds without libjpeg); draft() is PIL's DCT-domain downscale
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if max_side > 0:
+                image.draft('RGB', (max_side, max_side))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            return cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
+    except Exception:
+        return None
+
+
+def decode_image(data, max_side=INGEST_MAX_SIDE):
+    """
+    Decode an encoded image (JPG/PNG upload or camera capture) into a BGR array.
+
+    The buffer is wrapped, not copied; EXIF orientation is applied by the decoder;
+    large JPEGs are decoded directly at a reduced scale (see INGEST_MAX_SIDE).
+
+    Parameters:
+        data : bytes-like : Encoded file (bytes, bytearray, memoryview)
+        max_side : int : Smallest longest side the reduced decode may produce (0 = full size)
+
+    Returns:
+        img : np.ndarray : C-contiguous BGR image
+
+    Raises:
+        ValueError: If the data can not be decoded as an image
+    """
+    buffer = np.frombuffer(memoryview(data).cast('B'), dtype=np.uint8)
+    if buffer.size == 0:
+        raise ValueError(DECODE_ERROR)
+
+    flag = cv2.IMREAD_COLOR
+    size = jpeg_size(buffer) if max_side > 0 else None
+    if size is not None:
+        flag = reduced_decode_flag(max(size), max_side)
+
+    img = cv2.imdecode(buffer, flag)
+    if img is None:
+        img = _decode_with_pil(buffer, max_side)
+    if img is None:
+        raise ValueError(DECODE_ERROR)
+    return np.ascontiguousarray(img)
+
+
+def upload_buffer(source):
+    """
+    Zero-copy view of an uploaded file's bytes (Streamlit UploadedFile, BytesIO, open file).
+
+    Returns:
+        memoryview | bytes
+    """
+    if hasattr(source, 'getbuffer'):
+        return source.getbuffer()
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return source.read()
+
+
+def from_pil(image):
+    """
+    Convert a PIL image to a contiguous BGR array, applying its EXIF orientation.
+    """
+    from PIL import ImageOps
+
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    return cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
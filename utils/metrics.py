@@ -0,0 +1,296 @@
+import contextvars
+import json
+import os
+import resource
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, from a single zbar attempt up to a cold model load
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# JSON-lines file receiving one trace per request (unset = tracing off)
+TRACE_LOG_PATH = os.environ.get('CCCD_TRACE_LOG') or None
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = [
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    ]
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Histogram:
+    """
+    Cumulative latency histogram in the Prometheus text format, one series per label set.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {key: (list(s['counts']), s['sum'], s['count']) for key, s in self._series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, key, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Gauge:
+    """
+    Single value that goes up and down; `callback` (if given) is read at scrape time instead.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, callback=None):
+        self.name = name
+        self.documentation = documentation
+        self._callback = callback
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self._value = value
+
+    def value(self):
+        if self._callback is not None:
+            return self._callback()
+        with self._lock:
+            return self._value
+
+    def render(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge',
+                f'{self.name} {_format_value(self.value())}']
+
+
+def process_rss_bytes():
+    """
+    Resident set size of the current process (peak RSS where /proc is not available).
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+STAGE_SECONDS = Histogram('cccd_stage_duration_seconds', 'Time spent in each scan stage.', ('stage',))
+QR_ATTEMPT_SECONDS = Histogram('cccd_qr_attempt_duration_seconds', 'Time of one QR decode attempt.',
+                               ('scale', 'variant', 'result'))
+MODEL_LOAD_SECONDS = Histogram('cccd_model_load_duration_seconds', 'Time to load a detection model.',
+                               ('model', 'backend'))
+READER_LOAD_SECONDS = Histogram('cccd_reader_load_duration_seconds', 'Time to create an EasyOCR reader.', ('lang',))
+REQUEST_SECONDS = Histogram('cccd_request_duration_seconds', 'End-to-end request time.', ('endpoint', 'status'))
+IN_FLIGHT = Gauge('cccd_requests_in_flight', 'Requests currently being processed.')
+PROCESS_RSS = Gauge('cccd_process_resident_memory_bytes', 'Resident memory of the serving process.',
+                    callback=process_rss_bytes)
+
+METRICS = {metric.name: metric for metric in (
+    STAGE_SECONDS, QR_ATTEMPT_SECONDS, MODEL_LOAD_SECONDS, READER_LOAD_SECONDS, REQUEST_SECONDS, IN_FLIGHT, PROCESS_RSS,
+)}
+
+# Spans of the request running in the current context (None outside a trace)
+_spans = contextvars.ContextVar('cccd_spans', default=None)
+
+
+def record(metric, seconds, **labels):
+    """
+    Observe a duration and add it to the current trace, if any.
+    """
+    metric.observe(seconds, **labels)
+    spans = _spans.get()
+    if spans is not None:
+        spans.append({'metric': metric.name, 'labels': labels, 'seconds': round(seconds, 6)})
+
+
+@contextmanager
+def timed(stage, metric=STAGE_SECONDS, **labels):
+    """
+    Time a block. Without an explicit metric the block is recorded as a scan stage.
+
+    Parameters:
+        stage : str : Stage name (ignored when metric is not STAGE_SECONDS)
+        metric : Histogram : Where to record the duration
+        **labels : Labels of the metric
+    """
+    if metric is STAGE_SECONDS:
+        labels = {'stage': stage, **labels}
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(metric, time.perf_counter() - start, **labels)
+
+
+@contextmanager
+def collect_spans():
+    """
+    Collect the spans recorded in this block into a list (e.g. to ship them out of a worker process).
+    """
+    spans = []
+    token = _spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _spans.reset(token)
+
+
+def replay_spans(spans, trace=None):
+    """
+    Record spans collected in another process into this process's metrics.
+
+    Parameters:
+        spans : list : Output of collect_spans()
+        trace : list : Span list of the caller's trace (current_spans() taken on the caller's thread)
+    """
+    for span in spans:
+        metric = METRICS.get(span['metric'])
+        if metric is not None:
+            metric.observe(span['seconds'], **span['labels'])
+    if trace is not None:
+        trace.extend(spans)
+
+
+def current_spans():
+    return _spans.get()
+
+
+_trace_lock = threading.Lock()
+
+
+@contextmanager
+def trace_request(endpoint, **fields):
+    """
+    Track one request: in-flight gauge, end-to-end histogram and (if CCCD_TRACE_LOG is set) a trace line.
+
+    Parameters:
+        endpoint : str : Request name used as the histogram label
+        **fields : JSON-serialisable values added to the trace line
+
+    Yields:
+        trace : dict : 'spans' recorded so far; set 'status' to report something other than 'ok'
+    """
+    spans = []
+    trace = {'status': 'ok', 'spans': spans}
+    token = _spans.set(spans)
+    IN_FLIGHT.inc()
+    start = time.perf_counter()
+    try:
+        yield trace
+    except BaseException:
+        trace['status'] = 'error'
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        status = trace['status']
+        IN_FLIGHT.dec()
+        _spans.reset(token)
+        REQUEST_SECONDS.observe(seconds, endpoint=endpoint, status=status)
+        if TRACE_LOG_PATH:
+            line = json.dumps({
+                'ts': time.time(),
+                'request_id': uuid.uuid4().hex,
+                'endpoint': endpoint,
+                'status': status,
+                'seconds': round(seconds, 6),
+                **fields,
+                'spans': spans,
+            }, ensure_ascii=False, default=str)
+            with _trace_lock, open(TRACE_LOG_PATH, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+def render_metrics():
+    """
+    Every metric of this process in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in METRICS.values():
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_metrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port, host='0.0.0.0'):
+    """
+    Serve /metrics from a background thread, for processes without their own HTTP server (Streamlit).
+    Calling it again is a no-op.
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+    return _server
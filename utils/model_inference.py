@@ -1,8 +1,7 @@
 import os
-from ultralytics import YOLO
 import numpy as np
 import cv2
-from PIL import Image
+from utils.metrics import timed
 
 def get_class():
     """
@@ -55,6 +54,15 @@ def get_optional_fields():
     """
     return ['features', 'finger_print', 'expire_date', 'nationality', 'origin_place', 'issue_date', 'qr']
 
+def get_non_text_fields():
+    """
+    Get the list of fields that contain no text and are never sent to the OCR engine.
+
+    Returns:
+        list : List of field names
+    """
+    return ['finger_print', 'qr']
+
 def get_model_path(model_name='yolov8', model_dir='models_inference'):
     """
     Get the file path of a model.
@@ -70,20 +78,66 @@ def get_model_path(model_name='yolov8', model_dir='models_inference'):
     model_path = os.path.join(os.getcwd(), model_dir, model_name.upper(), "content/runs/detect/train/weights", model_filename)
     return model_path
 
-def get_model(model_name='yolov8', device='cpu'):
+def get_model_names():
+    """
+    Get the detector models shipped in models_inference.
+
+    Returns:
+        list : Model names accepted by get_model
+    """
+    return ['yolov8', 'yolov11']
+
+def get_backends():
+    """
+    Get the available detector backends.
+
+    Returns:
+        list : 'pytorch' (ultralytics) followed by the exported backends
+    """
+    return ['pytorch', 'onnx', 'onnx-int8', 'openvino']
+
+def get_model(model_name='yolov8', device='cpu', backend=None, num_threads=None):
     """
     Load and return a model.
 
     Parameters:
         model_name : str : Name of the model variant (e.g., yolov8, yolov11, etc.)
         device : str : Device to load the model on ('cpu' or 'cuda')
+        backend : str : One of get_backends() (default DETECTOR_BACKEND env, then 'pytorch')
+        num_threads : int : Intra-op threads for exported backends
 
     Returns:
         model : model
     """
+    backend = backend or os.environ.get('DETECTOR_BACKEND', 'pytorch')
+    if backend != 'pytorch':
+        from utils.detector_backends import DEFAULT_NUM_THREADS, load_exported_detector
+        return load_exported_detector(model_name, backend, num_threads=DEFAULT_NUM_THREADS if num_threads is None else num_threads)
+
+    # ultralytics (and torch) load only when a PyTorch model is actually needed
+    from ultralytics import YOLO
+
     model = YOLO(get_model_path(model_name)).to(device)
     return model
 
+def predict_boxes(model, images):
+    """
+    Run a detector of any backend on a batch of images.
+
+    Parameters:
+        model : model : YOLO model or object exposing predict_boxes(images)
+        images : list : Decoded BGR images
+
+    Returns:
+        list : One (N, 6) array per image with x1, y1, x2, y2, conf, class_id
+    """
+    if hasattr(model, 'predict_boxes'):
+        return model.predict_boxes(images)
+
+    # Ultralytics treats numpy input as BGR, the same layout as cv2
+    results = model(list(images), verbose=False)
+    return [result.boxes.data.cpu().numpy() for result in results]
+
 def compare_white_pixels(image):
     """
     Returns True if the left half of image
@@ -102,43 +156,235 @@ def compare_white_pixels(image):
 
     return left_white_pixels > right_white_pixels
 
-def rotate_if_necessary(image):
+def get_rotation(image):
     """
-    Resets an image that has been rotated 90°/180°/270°.
+    Work out how to reset an image that has been rotated 90°/180°/270°.
+
+    The decision only depends on the image layout, so it can be made on a
+    downscaled copy and applied to the full-resolution image with apply_rotation.
 
     Parameters
-        image : np.ndarray
+        image : np.ndarray : BGR image
+
+    Returns
+        int | None : cv2.rotate code, or None if the image is already upright
     """
 
-    # Reset image to horizontal position if necessary
-    if image.shape[0] > image.shape[1]:
-        image = cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+    # Convert image to grayscale (images are BGR everywhere in the pipeline)
+    image_binary = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-    # Convert image to grayscale
-    image_binary = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    # Reset image to horizontal position if necessary
+    portrait = image_binary.shape[0] > image_binary.shape[1]
+    if portrait:
+        image_binary = cv2.rotate(image_binary, cv2.ROTATE_90_CLOCKWISE)
 
     # Apply some Gaussian blur and then Otsu's thresholding
     image_binary = cv2.GaussianBlur(image_binary,(5,5),0)
     _, image_binary = cv2.threshold(image_binary, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
 
-    # Rotate image by 180° if necessary
-    if not compare_white_pixels(image_binary):
-        image = cv2.rotate(image, cv2.ROTATE_180)
+    # Rotate image by 180° if necessary (90° clockwise + 180° = 90° counter-clockwise)
+    upside_down = not compare_white_pixels(image_binary)
+    if portrait:
+        return cv2.ROTATE_90_COUNTERCLOCKWISE if upside_down else cv2.ROTATE_90_CLOCKWISE
+    return cv2.ROTATE_180 if upside_down else None
+
+def apply_rotation(image, rotation):
+    """
+    Apply a rotation returned by get_rotation.
+    """
+    return image if rotation is None else cv2.rotate(image, rotation)
+
+def rotate_if_necessary(image):
+    """
+    Resets an image that has been rotated 90°/180°/270°.
+
+    Parameters
+        image : np.ndarray
+    """
+    return apply_rotation(image, get_rotation(image))
+
+# Longest side of the thumbnail used by estimate_rotation
+ORIENTATION_THUMBNAIL_SIDE = 64
+
+# Front-side fields printed from the top of the card to the bottom
+FRONT_FIELD_ORDER = ['id', 'name', 'dob', 'gender', 'origin_place', 'current_place']
+
+_ROTATION_DEGREES = {None: 0, cv2.ROTATE_90_CLOCKWISE: 90, cv2.ROTATE_180: 180, cv2.ROTATE_90_COUNTERCLOCKWISE: 270}
+_DEGREES_ROTATION = {degrees: rotation for rotation, degrees in _ROTATION_DEGREES.items()}
+
+def combine_rotations(first, second):
+    """
+    cv2.rotate code equivalent to applying `first` then `second` (None = no rotation).
+    """
+    return _DEGREES_ROTATION[(_ROTATION_DEGREES[first] + _ROTATION_DEGREES[second]) % 360]
+
+def estimate_rotation(image, side=ORIENTATION_THUMBNAIL_SIDE):
+    """
+    Cheap 0°/90°/270° estimate made on a tiny thumbnail.
+
+    Landscape images are assumed upright: whether the card is upside down is
+    decided afterwards from the detected field layout (layout_is_upside_down),
+    which is far more reliable than comparing pixel counts.
+
+    Parameters
+        image : np.ndarray : BGR image
+        side : int : Longest side of the thumbnail
+
+    Returns
+        int | None : cv2.rotate code, or None if the image is landscape
+    """
+    height, width = image.shape[:2]
+    if height <= width:
+        return None
+
+    ratio = side / height
+    thumbnail = cv2.resize(image, (max(1, int(width * ratio)), side), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY) if thumbnail.ndim == 3 else thumbnail
+    gray = cv2.rotate(gray, cv2.ROTATE_90_CLOCKWISE)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+    # Same cue as get_rotation (more ink on the left when upright), on ~1000 pixels
+    if compare_white_pixels(binary):
+        return cv2.ROTATE_90_CLOCKWISE
+    return cv2.ROTATE_90_COUNTERCLOCKWISE
+
+def layout_is_upside_down(predictions, class_names):
+    """
+    Decide from the detected boxes whether the card is upside down.
+
+    Every pair of front-side fields found votes on whether it appears in the
+    printed top-to-bottom order (FRONT_FIELD_ORDER).
+
+    Parameters:
+        predictions : np.ndarray : (N, 6) boxes from predict_boxes
+        class_names : list : Class names from get_class()
+
+    Returns:
+        bool : True if most pairs are in reverse order
+    """
+    centers = {}
+    confidences = {}
+    for x1, y1, x2, y2, conf, cls in np.asarray(predictions).tolist():
+        name = class_names[int(cls)]
+        if name in FRONT_FIELD_ORDER and conf > confidences.get(name, -1.0):
+            centers[name] = (y1 + y2) / 2
+            confidences[name] = conf
+
+    found = [name for name in FRONT_FIELD_ORDER if name in centers]
+    votes = 0
+    for i, upper in enumerate(found):
+        for lower in found[i + 1:]:
+            votes += 1 if centers[upper] < centers[lower] else -1
+    return votes < 0
+
+def flip_boxes_180(predictions, shape):
+    """
+    Map boxes found on an image to the same image rotated by 180°.
+    """
+    height, width = shape[:2]
+    flipped = np.array(predictions, dtype=np.float32, copy=True).reshape(-1, 6)
+    flipped[:, [0, 2]] = width - flipped[:, [2, 0]]
+    flipped[:, [1, 3]] = height - flipped[:, [3, 1]]
+    return flipped
+
+def unrotate_box(box, rotation, rotated_shape):
+    """
+    Map an (x1, y1, x2, y2) box on a rotated image back to the image before rotation.
+
+    Parameters:
+        box : sequence : Box on the rotated image
+        rotation : int | None : cv2.rotate code that produced the rotated image
+        rotated_shape : tuple : Shape of the rotated image
+    """
+    height, width = rotated_shape[:2]
+    x1, y1, x2, y2 = box[:4]
+    if rotation == cv2.ROTATE_180:
+        return width - x2, height - y2, width - x1, height - y1
+    if rotation == cv2.ROTATE_90_CLOCKWISE:
+        return y1, width - x2, y2, width - x1
+    if rotation == cv2.ROTATE_90_COUNTERCLOCKWISE:
+        return height - y2, x1, height - y1, x2
+    return x1, y1, x2, y2
 
-    return image
+def clip_box(box, shape):
+    """
+    Convert a float (x1, y1, x2, y2) box to integer pixel coordinates inside the image.
+
+    Parameters:
+        box : sequence : x1, y1, x2, y2
+        shape : tuple : Image shape (height, width, ...)
+
+    Returns:
+        tuple : x1, y1, x2, y2 as ints
+    """
+    height, width = shape[:2]
+    x1, y1, x2, y2 = box[:4]
+    x1 = min(max(int(x1), 0), width)
+    y1 = min(max(int(y1), 0), height)
+    x2 = min(max(int(x2), x1), width)
+    y2 = min(max(int(y2), y1), height)
+    return x1, y1, x2, y2
+
+def retrieve_documents_from_image(model, image, crop_from=None):
+    """
+    Run the detector and cut one crop per detected field.
+
+    Parameters:
+        model : model : Detector of any backend (see predict_boxes)
+        image : np.ndarray | str : Decoded BGR image, or path to an image file
+        crop_from : np.ndarray : Higher-resolution version of `image` to cut the
+                                 crops from; boxes are scaled to its size
+
+    Returns:
+        docs : list : (crop, class_id) pairs. Crops are BGR views into the
+                      decoded image, so no extra copy or file I/O is made.
+    """
+    if not isinstance(image, np.ndarray):
+        image = cv2.imread(image, cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Could not decode image file")
 
-def retrieve_documents_from_image(model, image_path):
-    results = model(image_path)
-    predictions = results[0].boxes.data.tolist()
+    return crop_fields(detect_fields(model, image), image.shape, image if crop_from is None else crop_from)
+
+def detect_fields(model, image):
+    """
+    Run the detector on one decoded BGR image.
+
+    Returns:
+        np.ndarray : (N, 6) boxes with x1, y1, x2, y2, conf, class_id
+    """
+    with timed('yolo'):
+        return np.asarray(predict_boxes(model, [image])[0]).reshape(-1, 6)
+
+def crop_fields(predictions, detected_shape, source, rotation=None):
+    """
+    Cut one crop per detected box.
+
+    Parameters:
+        predictions : np.ndarray : (N, 6) boxes found on an image of shape `detected_shape`
+        detected_shape : tuple : Shape of the image the detector saw
+        source : np.ndarray : Image to crop from, the same picture as the detected one
+                              but possibly larger and not yet rotated by `rotation`
+        rotation : int | None : cv2.rotate code taking `source`'s orientation to the detected one
+
+    Returns:
+        docs : list : (crop, class_id) pairs. Without a rotation crops are views
+                      into `source`; with one, only the small crops are rotated.
+    """
+    # Size of the detected image before it was rotated
+    height, width = detected_shape[:2]
+    if rotation in (cv2.ROTATE_90_CLOCKWISE, cv2.ROTATE_90_COUNTERCLOCKWISE):
+        height, width = width, height
 
-    im = Image.open(image_path)
-    im = np.array(im)
+    sx = source.shape[1] / width
+    sy = source.shape[0] / height
 
     docs = []
 
-    for prediction in predictions:
+    for prediction in np.asarray(predictions).tolist():
         pred_class = int(prediction[-1])
-        x1, y1, x2, y2 = prediction[:4]
-        docs.append((im[int(y1):int(y2), int(x1):int(x2)], pred_class))
+        bx1, by1, bx2, by2 = unrotate_box(prediction, rotation, detected_shape)
+        x1, y1, x2, y2 = clip_box((bx1 * sx, by1 * sy, bx2 * sx, by2 * sy), source.shape)
+        docs.append((apply_rotation(source[y1:y2, x1:x2], rotation), pred_class))
 
-    return docs
\ No newline at end of file
+    return docs
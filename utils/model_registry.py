@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.metrics import MODEL_LOAD_SECONDS, record
+from utils.model_inference import get_model, get_model_path
+
+# Memory budget (MB) for all detection models held by the process
+DEFAULT_BUDGET_MB = float(os.environ.get('MODEL_REGISTRY_BUDGET_MB', '1024'))
+
+
+def estimate_model_bytes(model, model_path=None):
+    """
+    Estimate how much memory a loaded model holds.
+
+    Parameters:
+        model : model : Loaded model (YOLO or torch module)
+        model_path : str : Weights file, used when the parameters can not be inspected
+
+    Returns:
+        nbytes : int
+    """
+    module = getattr(model, 'model', model)
+    try:
+        return sum(p.numel() * p.element_size() for p in module.parameters())
+    except (AttributeError, TypeError):
+        pass
+    if model_path and os.path.exists(model_path):
+        return os.path.getsize(model_path)
+    return 0
+
+
+class ModelRegistry:
+    """
+    Process-level LRU cache of detection models shared by every session.
+
+    Each (model_name, device, backend) is loaded at most once; concurrent callers
+    asking for the same model wait on a per-key lock instead of loading a copy.
+    The least recently used models are evicted when the budget is exceeded.
+    """
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB, loader=get_model):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._loader = loader
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def _lookup(self, key):
+        entry = self._models.get(key)
+        if entry is not None:
+            self._models.move_to_end(key)
+            entry['last_used'] = time.time()
+            return entry['model']
+        return None
+
+    def get(self, model_name='yolov8', device='cpu', backend=None):
+        """
+        Return a shared model, loading it on first use.
+
+        Parameters:
+            model_name : str : Name of the model variant (e.g., yolov8, yolov11, etc.)
+            device : str : Device to load the model on ('cpu' or 'cuda')
+            backend : str : Detector backend (default DETECTOR_BACKEND env, then 'pytorch')
+
+        Returns:
+            model : model
+        """
+        backend = backend or os.environ.get('DETECTOR_BACKEND', 'pytorch')
+        key = (model_name, device, backend)
+        with self._lock:
+            model = self._lookup(key)
+            if model is not None:
+                return model
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # Another session may have finished loading while we waited
+            with self._lock:
+                model = self._lookup(key)
+                if model is not None:
+                    return model
+
+            start = time.perf_counter()
+            model = self._loader(model_name=model_name, device=device, backend=backend)
+            load_seconds = time.perf_counter() - start
+            record(MODEL_LOAD_SECONDS, load_seconds, model=model_name, backend=backend)
+
+            entry = {
+                'model': model,
+                'nbytes': estimate_model_bytes(model, getattr(model, 'model_path', get_model_path(model_name))),
+                'load_seconds': load_seconds,
+                'last_used': time.time(),
+            }
+            with self._lock:
+                self._models[key] = entry
+                self._evict(keep=key)
+        return model
+
+    def _evict(self, keep):
+        total = sum(entry['nbytes'] for entry in self._models.values())
+        for key in list(self._models):
+            if total <= self.budget_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._models.pop(key)['nbytes']
+
+    def unload(self, model_name, device='cpu', backend=None):
+        """
+        Drop a model from the registry. Returns True if it was loaded.
+
+        backend defaults to DETECTOR_BACKEND env, then 'pytorch', as in get().
+        """
+        backend = backend or os.environ.get('DETECTOR_BACKEND', 'pytorch')
+        with self._lock:
+            return self._models.pop((model_name, device, backend), None) is not None
+
+    def loaded_models(self):
+        """
+        Report the models currently held, least recently used first.
+
+        Returns:
+            list : One dict per model with name, device, backend, size_mb, load_seconds and last_used
+        """
+        with self._lock:
+            return [
+                {
+                    'name': name,
+                    'device': device,
+                    'backend': backend,
+                    'size_mb': round(entry['nbytes'] / (1024 * 1024), 1),
+                    'load_seconds': round(entry['load_seconds'], 2),
+                    'last_used': entry['last_used'],
+                }
+                for (name, device, backend), entry in self._models.items()
+            ]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry():
+    """
+    Get the process-wide model registry.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+    return _registry
+
+
+def get_shared_model(model_name='yolov8', device='cpu', backend=None):
+    """
+    Load (once per process) and return a detection model shared across sessions.
+
+    model_name 'cascade' returns the YOLOv11 -> YOLOv8 escalation cascade (utils/cascade.py),
+    which itself fetches its models from this registry.
+    """
+    from utils.cascade import CASCADE_MODEL_NAME
+
+    if model_name == CASCADE_MODEL_NAME:
+        from utils.cascade import get_cascade
+        return get_cascade(device=device, backend=backend)
+    return get_model_registry().get(model_name=model_name, device=device, backend=backend)
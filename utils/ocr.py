@@ -1,175 +1,401 @@
-import easyocr
 import cv2, os
-from PIL import Image
-from pyzbar.pyzbar import decode, ZBarSymbol
-from matplotlib import pyplot as plt
-
-def get_ocr_reader(lang_list=['vi'], gpu=False):
-    reader = easyocr.Reader(lang_list, gpu=gpu)
-    return reader
-
-def grayscale_conversion(img, scale = 1):
-  # Tăng kích thước lên theo scale
-  img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
-
-  # Chuyển grayscale
-  gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-  # Làm rõ cạnh
-  gray = cv2.GaussianBlur(gray, (3, 3), 0)
-  th = cv2.adaptiveThreshold(gray, 255,
-                            cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                            cv2.THRESH_BINARY, 31, 2)
-
-  return th
-
-def show_img(img):
-    plt.figure(figsize=(10, 8))
-    plt.imshow(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-    plt.axis('off')
-    plt.show()
-
-def qr_code_detection(img, show_image_flag=False, scale=2):
-    th = grayscale_conversion(img, scale)
-    if (show_image_flag):
-        show_img(th)
-
-    # Decode QR code
-    decoded = decode(th, symbols=[ZBarSymbol.QRCODE])
-    if (decoded):
-        data = decoded[0].data
+import numpy as np
+from utils.metrics import timed
+from utils.preprocess import OCR_MAX_SIDE, to_working_resolution
+from utils.quality import QUALITY_GATE_ENABLED, check_image_quality, retake_message
+from utils.reader_pool import borrow_ocr_reader
+
+# easyocr (torch), pyzbar và matplotlib chỉ được import khi dùng lần đầu,
+# để việc import module này (app, API, quét QR) không phải load các thư viện nặng
+
+# Chiều cao ảnh đầu vào của recognizer EasyOCR (easyocr.config.imgH)
+EASYOCR_IMG_HEIGHT = 64
+
+# Vùng cao hơn ngưỡng này (so với chiều cao trung vị) được coi là nhiều dòng text
+MULTILINE_HEIGHT_RATIO = 1.6
+
+def recognize_crops_batched(reader, crops):
+    """
+    Nhận dạng text cho nhiều vùng ảnh trong một lần chạy recognizer của EasyOCR.
+    
+    Bỏ qua bước CRAFT text detection (vùng đã được YOLO định vị), resize mọi vùng
+    về chiều cao của recognizer rồi đưa vào một batch được pad theo vùng rộng nhất.
+    
+    Parameters:
+        reader: easyocr.Reader
+        crops: List ảnh BGR hoặc grayscale, mỗi ảnh chứa một dòng text
+    
+    Returns:
+        List (text, confidence) theo đúng thứ tự của crops
+    """
+    from easyocr.recognition import get_text
+    
+    results = [('', 0.0)] * len(crops)
+    image_list = []
+    max_ratio = 1.0
+    
+    for index, crop in enumerate(crops):
+        if crop is None or crop.size == 0:
+            continue
+        
+        grey = crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        height, width = grey.shape[:2]
+        ratio = width / height
+        new_width = max(1, int(EASYOCR_IMG_HEIGHT * ratio))
+        interpolation = cv2.INTER_AREA if height > EASYOCR_IMG_HEIGHT else cv2.INTER_CUBIC
+        grey = cv2.resize(grey, (new_width, EASYOCR_IMG_HEIGHT), interpolation=interpolation)
+        
+        # Dùng index làm "box" để map kết quả về đúng crop
+        image_list.append((index, grey))
+        max_ratio = max(max_ratio, ratio)
+    
+    if not image_list:
+        return results
+    
+    ignore_char = ''.join(set(reader.character) - set(reader.lang_char))
+    max_width = int(np.ceil(max_ratio)) * EASYOCR_IMG_HEIGHT
+    
+    predictions = get_text(
+        reader.character, EASYOCR_IMG_HEIGHT, max_width, reader.recognizer, reader.converter, image_list,
+        ignore_char=ignore_char, batch_size=len(image_list), workers=0, device=reader.device
+    )
+    
+    for index, text, confidence in predictions:
+        results[index] = (text.strip(), float(confidence))
+    
+    return results
+
+def ocr_field_crops(reader, crops, batched=True):
+    """
+    OCR các vùng thông tin đã được detect.
+    
+    Parameters:
+        reader: easyocr.Reader
+        crops: List ảnh các vùng thông tin
+        batched: True - nhận dạng tất cả vùng một dòng trong một batch,
+                 False - chạy readtext (detection + recognition) cho từng vùng
+    
+    Returns:
+        List (text, confidence) theo đúng thứ tự của crops
+    """
+    results = [('', 0.0)] * len(crops)
+    
+    if batched:
+        heights = [crop.shape[0] for crop in crops if crop.size > 0]
+        line_height = float(np.median(heights)) if heights else 0
+        
+        # Vùng nhiều dòng (vd: địa chỉ xuống dòng) vẫn cần CRAFT để tách dòng
+        single_line = [i for i, crop in enumerate(crops)
+                       if crop.size > 0 and crop.shape[0] <= MULTILINE_HEIGHT_RATIO * line_height]
+        multi_line = [i for i in range(len(crops)) if i not in single_line]
         
-        if isinstance(data, bytes):
-            # Decode UTF-8 (QR code CCCD Việt Nam dùng UTF-8)
-            try:
-                result = data.decode('utf-8', errors='strict')
-                
-                # Kiểm tra xem có ký tự lỗi không (các ký tự CJK lạ, halfwidth katakana)
-                error_chars = ['盻', 'ｳ', 'ﾃ', 'ｺ', 'ｺ', 'ﾆ', '｡', 'ｪ', 'ｯ', 'ｺ']
-                if any(char in result for char in error_chars):
-                    raise ValueError(f"QR code có chứa ký tự lỗi encoding. Vui lòng quét lại hoặc sử dụng ảnh chất lượng tốt hơn.")
-                
-                return result
-            except UnicodeDecodeError as e:
-                raise ValueError(f"Lỗi decode QR code: {str(e)}. QR code không đúng định dạng UTF-8.")
-        else:
-            return data
+        with timed('ocr_batch'):
+            batch_results = recognize_crops_batched(reader, [crops[i] for i in single_line])
+        for i, result in zip(single_line, batch_results):
+            results[i] = result
     else:
-        return None
+        multi_line = list(range(len(crops)))
     
-def OCR_img(img, show_result=False):
-    reader = get_ocr_reader(lang_list=['vi'], gpu=False)
-    result = reader.readtext(img)
-    boxes = [line[0] for line in result]
-    texts = [line[1] for line in result]
+    for i in multi_line:
+        if crops[i].size == 0:
+            continue
+        with timed('ocr_readtext'):
+            ocr_result = reader.readtext(crops[i])
+        texts = [line[1] for line in ocr_result]
+        confidences = [line[2] for line in ocr_result]
+        results[i] = (' '.join(texts).strip(), float(np.mean(confidences)) if confidences else 0.0)
+    
+    return results
+
+def zbar_decode(img):
+    """
+    Giải mã các QR code trong ảnh bằng zbar (pyzbar)
+    
+    Returns:
+        List kết quả của pyzbar.decode (rỗng nếu không có QR)
+    """
+    from pyzbar.pyzbar import decode, ZBarSymbol
+    
+    return decode(img, symbols=[ZBarSymbol.QRCODE])
 
-    # Tạo bản copy để vẽ bounding boxes
-    img_with_boxes = img.copy()
+def decode_qr_payload(data):
+    """
+    Chuyển dữ liệu thô của QR code (pyzbar) thành chuỗi
+    
+    Raises:
+        ValueError: Nếu QR code không đúng định dạng UTF-8 hoặc có ký tự lỗi encoding
+    """
+    if isinstance(data, bytes):
+        # Decode UTF-8 (QR code CCCD Việt Nam dùng UTF-8)
+        try:
+            result = data.decode('utf-8', errors='strict')
+            
+            # Kiểm tra xem có ký tự lỗi không (các ký tự CJK lạ, halfwidth katakana)
+            error_chars = ['盻', 'ｳ', 'ﾃ', 'ｺ', 'ｺ', 'ﾆ', '｡', 'ｪ', 'ｯ', 'ｺ']
+            if any(char in result for char in error_chars):
+                raise ValueError(f"QR code có chứa ký tự lỗi encoding. Vui lòng quét lại hoặc sử dụng ảnh chất lượng tốt hơn.")
+            
+            return result
+        except UnicodeDecodeError as e:
+            raise ValueError(f"Lỗi decode QR code: {str(e)}. QR code không đúng định dạng UTF-8.")
+    else:
+        return data
+    
+def OCR_img(img, show_result=False, check_quality=QUALITY_GATE_ENABLED):
+    """
+    OCR toàn bộ ảnh (CRAFT text detection + recognizer của EasyOCR)
+    
+    Parameters:
+        img: OpenCV image (numpy array, BGR)
+        show_result: Có hiển thị kết quả hay không
+        check_quality: Kiểm tra nhanh độ nét / độ sáng / độ chói / kích thước thẻ trước khi OCR
+    
+    Returns:
+        List các dòng text
+    
+    Raises:
+        ValueError: Nếu ảnh không đạt chất lượng
+    """
+    # Cùng cổng chất lượng với OCR_with_detection: ảnh hỏng bị từ chối trước khi chạy EasyOCR
+    if check_quality:
+        check_image_quality(img)
     
-    for box in boxes:
-        top_left     = (int(box[0][0]), int(box[0][1]))
-        bottom_right = (int(box[2][0]), int(box[2][1]))
-        cv2.rectangle(img_with_boxes, top_left, bottom_right, (0, 255, 0), 2)
+    # Ảnh chụp điện thoại (12+ MP) được thu nhỏ về kích thước canvas của EasyOCR trước khi OCR
+    img, _ = to_working_resolution(img, OCR_MAX_SIDE)
+    
+    # Mượn reader đã load sẵn từ pool thay vì khởi tạo lại
+    with borrow_ocr_reader(lang_list=['vi'], gpu=False) as reader:
+        with timed('ocr_full_image'):
+            result = reader.readtext(img)
+    texts = [line[1] for line in result]
 
     if show_result:
-        show_img(img_with_boxes)
+        # Chỉ vẽ bounding boxes khi cần hiển thị (debug), luồng phục vụ không copy ảnh
+        from utils.visualize import draw_ocr_boxes, show_img
+        show_img(draw_ocr_boxes(img, [line[0] for line in result]))
         
     return texts
 
-def OCR_with_detection(img, model, class_names, show_result=False):
+# Cắt vùng theo template trước YOLO. Mặc định chỉ với loại thẻ đã có template hiệu chỉnh trên ảnh thật
+# trong CCCD_TEMPLATE_FILE (scripts/calibrate_template.py), loại thẻ khác dùng YOLO vì tọa độ mặc định
+# chỉ là gần đúng; CCCD_TEMPLATE_CROP=1 dùng cả tọa độ mặc định, 0 luôn dùng YOLO
+TEMPLATE_CROP = {'0': False, '1': True}.get(os.environ.get('CCCD_TEMPLATE_CROP', 'calibrated'), 'calibrated')
+
+def _detect_field_crops(img, model, class_names):
+    """
+    Detect các vùng thông tin bằng YOLO trên ảnh độ phân giải làm việc.
+    
+    Returns:
+        docs: List (ảnh vùng, class_id) cắt từ ảnh gốc
+        working: Ảnh làm việc đã xoay đúng chiều
+    """
+    from utils.model_inference import (
+        FRONT_FIELD_ORDER, apply_rotation, combine_rotations, crop_fields, detect_fields, estimate_rotation,
+        flip_boxes_180, layout_is_upside_down
+    )
+    
+    # Thu nhỏ ảnh một lần về độ phân giải làm việc; ảnh gốc chỉ dùng để cắt các vùng thông tin
+    with timed('resize'):
+        working, _ = to_working_resolution(img)
+    
+    # Ảnh dọc: xoay 90° (ước lượng trên thumbnail); ảnh ngang coi như đúng chiều
+    with timed('rotate'):
+        rotation = estimate_rotation(working)
+        working = apply_rotation(working, rotation)
+    
+    # Thực hiện object detection trên ảnh nhỏ (không ghi file tạm)
+    predictions = detect_fields(model, working)
+    
+    if not any(class_names[int(cls)] in FRONT_FIELD_ORDER for cls in predictions[:, 5]):
+        # Không thấy trường nào: có thể ảnh bị ngược, thử lại một lần với ảnh xoay 180°
+        flipped = cv2.rotate(working, cv2.ROTATE_180)
+        flipped_predictions = detect_fields(model, flipped)
+        if len(flipped_predictions) > len(predictions):
+            working, predictions = flipped, flipped_predictions
+            rotation = combine_rotations(rotation, cv2.ROTATE_180)
+    elif layout_is_upside_down(predictions, class_names):
+        # Thẻ bị ngược 180°: lật box theo bố cục các trường thay vì chạy lại detection
+        predictions = flip_boxes_180(predictions, working.shape)
+        working = cv2.rotate(working, cv2.ROTATE_180)
+        rotation = combine_rotations(rotation, cv2.ROTATE_180)
+    
+    # Cắt vùng từ ảnh gốc chưa xoay, chỉ xoay các vùng nhỏ đã cắt
+    return crop_fields(predictions, working.shape, img, rotation), working
+
+def _ocr_docs(docs, class_names, batched=True):
+    """
+    OCR các vùng đã cắt, trả về dict English class name -> (text, confidence) (bỏ vùng rỗng)
+    
+    Nếu một class có nhiều vùng, giữ kết quả có confidence cao nhất
+    """
+    if not docs:
+        return {}
+    
+    # Mượn OCR reader từ pool dùng chung, trả lại ngay sau khi OCR xong
+    with borrow_ocr_reader(lang_list=['vi'], gpu=False) as reader:
+        # OCR tất cả vùng (mặc định: một batch duy nhất cho recognizer)
+        ocr_results = ocr_field_crops(reader, [doc_img for doc_img, _ in docs], batched=batched)
+    
+    readings = {}
+    for (_, class_id), (combined_text, confidence) in zip(docs, ocr_results):
+        # Lưu vào dict (chỉ lưu nếu có text)
+        name = class_names[class_id]
+        if combined_text and (name not in readings or confidence > readings[name][1]):
+            readings[name] = (combined_text, confidence)
+    return readings
+
+def _select_docs(docs, class_names, fields, skip=()):
+    """
+    Chỉ giữ các vùng thuộc `fields`, bỏ các trường trong `skip` (đã đọc được, không cần OCR lại)
+    """
+    return [(doc_img, class_id) for doc_img, class_id in docs
+            if class_names[class_id] in fields and class_names[class_id] not in skip]
+
+def parse_optional_fields(value):
+    """
+    Đọc cấu hình trường tùy chọn: 'all' - tất cả, 'none' hoặc rỗng - không OCR, hoặc danh sách tên phân cách bằng dấu phẩy
+    
+    Returns:
+        True (tất cả) hoặc tuple tên trường
+    """
+    value = (value or '').strip()
+    if value == 'all':
+        return True
+    if value in ('', 'none'):
+        return ()
+    return tuple(name.strip() for name in value.split(',') if name.strip())
+
+# Trường tùy chọn được OCR sau khi đủ trường bắt buộc (mặc định tất cả); 'none' = chỉ OCR trường bắt buộc
+OPTIONAL_FIELDS = parse_optional_fields(os.environ.get('CCCD_OCR_OPTIONAL_FIELDS', 'all'))
+
+def _missing_fields_error(missing_fields):
+    from utils.model_inference import get_class_vietnamese
+    
+    vietnamese_labels = get_class_vietnamese()
+    missing_vn = [vietnamese_labels.get(field, field) for field in missing_fields]
+    return ValueError(retake_message(f"❌ Thiếu thông tin bắt buộc: {', '.join(missing_vn)}"))
+
+def OCR_with_detection(img, model, class_names, show_result=False, batched=True, cccd_type=None, use_template=TEMPLATE_CROP,
+                       check_quality=QUALITY_GATE_ENABLED, partial=None, optional_fields=None):
     """
-    Thực hiện object detection trước, sau đó OCR từng vùng đã detect
+    Cắt các vùng thông tin (theo template hoặc bằng object detection), sau đó OCR từng vùng
+    
+    Khi biết loại thẻ và có template, thẻ được nắn phẳng theo 4 góc và các vùng được cắt theo
+    template tọa độ cố định (utils/card_template.py). YOLO chỉ chạy khi template không đủ tin cậy,
+    OCR theo template thiếu trường bắt buộc hoặc có trường sai định dạng.
+    
+    Các trường bắt buộc được OCR trước; thiếu box hoặc text của trường bắt buộc thì dừng ngay với
+    hướng dẫn chụp lại. Trường tùy chọn chỉ được OCR khi đã đủ trường bắt buộc và được yêu cầu;
+    các vùng không chứa chữ (vân tay, mã QR) không bao giờ được OCR.
     
     Parameters:
-        img: OpenCV image (numpy array)
+        img: OpenCV image (numpy array, BGR)
         model: YOLO model đã load
         class_names: List các class names từ get_class()
         show_result: Có hiển thị kết quả hay không
+        batched: Nhận dạng tất cả vùng trong một batch, bỏ qua CRAFT detection trên từng vùng
+        cccd_type: Loại CCCD ("CCCD Mới" hoặc "CCCD Cũ"), chọn template; None - chỉ dùng YOLO
+        use_template: Thử cắt vùng theo template trước khi chạy YOLO: True - mọi loại thẻ có template,
+                      'calibrated' - chỉ loại thẻ có template hiệu chỉnh, False - luôn dùng YOLO
+        check_quality: Kiểm tra nhanh độ nét / độ sáng / độ chói / kích thước thẻ trước khi chạy mô hình
+        partial: PartialResult (utils/partial_results.py) của các lần chụp trước; các trường đã đọc
+                 đủ tin cậy không OCR lại, kết quả mới được gộp vào (kể cả khi vẫn thiếu trường)
+        optional_fields: Trường tùy chọn cần OCR: True - tất cả, () - không, list tên trường,
+                         None - theo CCCD_OCR_OPTIONAL_FIELDS
     
     Returns:
         detected_info: Dict mapping từ Vietnamese field name sang text OCR
         img_with_boxes: Ảnh với bounding boxes (nếu show_result=True)
         
     Raises:
-        ValueError: Nếu không đủ thông tin bắt buộc
+        ValueError: Nếu ảnh không đạt chất lượng hoặc không đủ thông tin bắt buộc
     """
-    from utils.model_inference import retrieve_documents_from_image, rotate_if_necessary, get_class_vietnamese, get_required_fields
-    import tempfile
+    from utils.model_inference import get_class_vietnamese, get_non_text_fields, get_optional_fields, get_required_fields
+    
+    # Ảnh mờ / tối / chói / thẻ quá nhỏ bị từ chối ngay (vài ms), trước khi chạy YOLO và OCR
+    if check_quality:
+        check_image_quality(img)
+    
+    required_fields = get_required_fields()
+    if optional_fields is None:
+        optional_fields = OPTIONAL_FIELDS
+    optional_fields = get_optional_fields() if optional_fields is True else (optional_fields or ())
+    optional_fields = [field for field in optional_fields if field not in get_non_text_fields()]
+    # Các trường đã đọc đủ tin cậy ở lần chụp trước: không cắt / OCR lại.
+    # Số CCCD luôn được đọc lại để kiểm tra vẫn là cùng một thẻ
+    kept = partial.accepted() - {'id'} if partial is not None else set()
     
-    # Rotate ảnh nếu cần
-    img = rotate_if_necessary(img)
+    def read_required(docs):
+        nonlocal kept
+        readings = _ocr_docs(_select_docs(docs, class_names, required_fields, kept), class_names, batched=batched)
+        if kept and not partial.same_card(readings.get('id')):
+            # Số CCCD khác, không đọc được, hoặc lần trước chưa có số CCCD: không dùng lại trường nào của lần trước
+            partial.reset(partial.cccd_type)
+            readings.update(_ocr_docs(_select_docs(docs, class_names, kept), class_names, batched=batched))
+            kept = set()
+        return readings
     
-    # Lưu ảnh tạm để model có thể đọc
-    with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp_file:
-        tmp_path = tmp_file.name
-        cv2.imwrite(tmp_path, img)
+    readings = None
+    img_with_boxes = None
     
-    try:
-        # Thực hiện object detection
-        docs = retrieve_documents_from_image(model, tmp_path)
+    if use_template and cccd_type is not None:
+        from utils.card_template import crop_fields_with_template, invalid_template_fields
+        
+        docs, card, _ = crop_fields_with_template(img, class_names, cccd_type,
+                                                  calibrated_only=use_template == 'calibrated')
+        if docs:
+            readings = read_required(docs)
+            # Vùng cắt lệch hoặc lẫn nhãn in sẵn vẫn có chữ: kiểm tra định dạng từng trường, không chỉ kiểm tra rỗng
+            if (all(field in kept or readings.get(field) for field in required_fields)
+                    and not invalid_template_fields(readings)):
+                img_with_boxes = card
+            else:
+                readings = None
+    
+    if readings is None:
+        # Template không tin cậy hoặc thiếu trường bắt buộc: detect lại bằng YOLO
+        docs, working = _detect_field_crops(img, model, class_names)
         
         if not docs or len(docs) == 0:
             raise ValueError("Không detect được thông tin nào trên ảnh. Vui lòng chụp lại theo hướng dẫn.")
         
-        # Khởi tạo OCR reader
-        reader = get_ocr_reader(lang_list=['vi'], gpu=False)
+        # Không có box của trường bắt buộc: dừng ngay, không OCR vùng nào
+        boxed = {class_names[class_id] for _, class_id in docs}
+        missing_boxes = [field for field in required_fields if field not in boxed and field not in kept]
+        if missing_boxes:
+            raise _missing_fields_error(missing_boxes)
         
-        # Dictionary để lưu kết quả (English key)
-        detected_info_en = {}
-        img_with_boxes = img.copy()
-        
-        # OCR từng vùng đã detect
-        for doc_img, class_id in docs:
-            class_name = class_names[class_id]
-            
-            # Thực hiện OCR
-            ocr_result = reader.readtext(doc_img)
-            
-            # Lấy text từ kết quả OCR
-            texts = [line[1] for line in ocr_result]
-            combined_text = ' '.join(texts).strip()
-            
-            # Lưu vào dict (chỉ lưu nếu có text)
-            if combined_text:
-                detected_info_en[class_name] = combined_text
-            
-            if show_result:
-                # Vẽ bounding box lên ảnh gốc
-                # (Cần tính lại tọa độ từ doc_img về img gốc - simplified version)
-                pass
-        
-        # Xóa file tạm
-        os.unlink(tmp_path)
-        
-        # Validate required fields
-        required_fields = get_required_fields()
-        missing_fields = [field for field in required_fields if field not in detected_info_en or not detected_info_en[field]]
-        
-        vietnamese_labels = get_class_vietnamese()
-        
-        if missing_fields:
-            missing_vn = [vietnamese_labels.get(field, field) for field in missing_fields]
-            raise ValueError(
-                f"❌ Thiếu thông tin bắt buộc: {', '.join(missing_vn)}\n\n"
-                f"📸 Vui lòng chụp lại theo hướng dẫn:\n"
-                f"  • Chụp trực diện CCCD, không bị nghiêng\n"
-                f"  • CCCD nằm đầy đủ trong khung ảnh\n"
-                f"  • Không chụp quá nhỏ hoặc quá xa\n"
-                f"  • Đảm bảo ánh sáng đủ, không quá chói hoặc quá tối\n"
-                f"  • Ảnh rõ nét, không bị mờ\n"
-                f"  • Tránh phản chiếu ánh sáng lên bề mặt thẻ"
-            )
-        
-        # Chuyển đổi sang Vietnamese labels
-        detected_info_vn = {}
-        for en_key, text_value in detected_info_en.items():
-            vn_key = vietnamese_labels.get(en_key, en_key)
-            detected_info_vn[vn_key] = text_value
-        
-        return detected_info_vn, img_with_boxes
-        
-    except Exception as e:
-        # Xóa file tạm nếu có lỗi
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
-        raise e
\ No newline at end of file
+        readings = read_required(docs)
+        img_with_boxes = working.copy()
+    
+    # Validate required fields: chỉ trường đọc được ở ảnh này hoặc đã đủ tin cậy ở lần trước mới được tính
+    with timed('validation'):
+        missing_fields = [field for field in required_fields if not readings.get(field) and field not in kept]
+    if partial is not None:
+        partial.reused = set(kept)
+    
+    if missing_fields:
+        if partial is not None:
+            # Giữ các trường bắt buộc đọc được cho lần chụp lại
+            partial.merge(readings)
+        raise _missing_fields_error(missing_fields)
+    
+    # Đủ trường bắt buộc: OCR các trường tùy chọn được yêu cầu
+    if optional_fields:
+        with timed('ocr_optional'):
+            readings.update(_ocr_docs(_select_docs(docs, class_names, optional_fields, kept), class_names, batched=batched))
+    
+    if partial is not None:
+        # Gộp với các lần chụp trước, mỗi trường giữ kết quả có confidence cao nhất
+        partial.merge(readings)
+        readings = partial.fields
+    detected_info_en = {name: text for name, (text, _) in readings.items() if text}
+    vietnamese_labels = get_class_vietnamese()
+    
+    # Chuyển đổi sang Vietnamese labels
+    detected_info_vn = {}
+    for en_key, text_value in detected_info_en.items():
+        vn_key = vietnamese_labels.get(en_key, en_key)
+        detected_info_vn[vn_key] = text_value
+    
+    return detected_info_vn, img_with_boxes
@@ -0,0 +1,185 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Fields read at least this confidently are kept across retakes and not OCR'd again
+PARTIAL_MIN_CONFIDENCE = float(os.environ.get('CCCD_PARTIAL_MIN_CONFIDENCE', '0.6'))
+
+# Sessions (API session_id) idle for longer than this are forgotten
+PARTIAL_TTL_SECONDS = float(os.environ.get('CCCD_PARTIAL_TTL', '900'))
+
+# Most sessions kept at once (least recently used are dropped first)
+PARTIAL_MAX_SESSIONS = int(os.environ.get('CCCD_PARTIAL_MAX_SESSIONS', '1024'))
+
+
+def _digits(text):
+    return ''.join(ch for ch in text if ch.isdigit())
+
+
+class PartialResult:
+    """
+    Fields read so far for one card, merged across retakes of the front photo.
+
+    Each field keeps its most confident reading. Fields at or above `min_confidence`
+    are "accepted": a retake only needs detection and OCR for the others, except the
+    card number, which is read on every retake to check it is still the same card
+    (see same_card). Fields are only carried over once the card number has been read.
+    Its state() can be sent to a worker process and loaded back.
+
+    Every method is thread-safe. Callers sharing the object between concurrent
+    scans (e.g. API requests with the same session id) hold `scan_lock` for the
+    whole scan, so one retake is merged before the next one reads accepted().
+    """
+
+    def __init__(self, cccd_type=None, min_confidence=PARTIAL_MIN_CONFIDENCE):
+        self.cccd_type = cccd_type
+        self.min_confidence = min_confidence
+        self.fields = {}
+        self.attempts = 0
+        # Fields the last scan took from earlier attempts instead of reading them again
+        self.reused = set()
+        self.scan_lock = threading.Lock()
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['scan_lock'], state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.scan_lock = threading.Lock()
+        self._lock = threading.RLock()
+
+    def reset(self, cccd_type=None):
+        with self._lock:
+            self.cccd_type = cccd_type
+            self.fields = {}
+            self.attempts = 0
+            self.reused = set()
+
+    def accepted(self):
+        """
+        Names of the fields that do not need to be read again.
+        """
+        with self._lock:
+            return {name for name, (text, confidence) in self.fields.items()
+                    if text and confidence >= self.min_confidence}
+
+    def same_card(self, id_reading):
+        """
+        Whether a new reading of the card number belongs to the card whose fields are kept.
+
+        Parameters:
+            id_reading : tuple | None : (text, confidence) of 'id' on the new photo
+
+        Returns:
+            bool : True when nothing is kept yet or the digits match; False when they
+                   differ, or when either number is missing (not verifiable)
+        """
+        with self._lock:
+            if not self.fields:
+                return True
+            stored = self.fields.get('id')
+        if stored is None or not _digits(stored[0]):
+            # Fields kept from an attempt without a card number can not be tied to any card
+            return False
+        if not id_reading or not _digits(id_reading[0]):
+            return False
+        return _digits(id_reading[0]) == _digits(stored[0])
+
+    def merge(self, readings):
+        """
+        Merge new OCR readings, keeping the more confident one per field.
+
+        A card number different from the stored one, or the first one read after
+        attempts without it, may belong to another card: the earlier fields are
+        dropped instead of being mixed in.
+
+        Parameters:
+            readings : dict : class name -> (text, confidence)
+
+        Returns:
+            set : Names of the fields whose reading changed
+        """
+        with self._lock:
+            if readings.get('id') and readings['id'][0] and not self.same_card(readings['id']):
+                self.reset(self.cccd_type)
+
+            self.attempts += 1
+            changed = set()
+            for name, (text, confidence) in readings.items():
+                if not text:
+                    continue
+                current = self.fields.get(name)
+                if current is None or confidence > current[1]:
+                    self.fields[name] = (text, float(confidence))
+                    changed.add(name)
+            return changed
+
+    def state(self):
+        with self._lock:
+            return {'cccd_type': self.cccd_type, 'fields': dict(self.fields), 'attempts': self.attempts}
+
+    def load(self, state):
+        """
+        Replace the content with a state() taken elsewhere (e.g. in a worker process).
+        """
+        with self._lock:
+            self.cccd_type = state['cccd_type']
+            self.fields = {name: tuple(reading) for name, reading in state['fields'].items()}
+            self.attempts = state['attempts']
+
+
+class PartialResultStore:
+    """
+    Thread-safe PartialResult per session id, with idle expiry and an LRU bound.
+    """
+
+    def __init__(self, max_sessions=PARTIAL_MAX_SESSIONS, ttl=PARTIAL_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """
+        The session's PartialResult, created on first use.
+        """
+        now = time.monotonic()
+        with self._lock:
+            while self._sessions:
+                oldest, (_, last_used) = next(iter(self._sessions.items()))
+                if now - last_used <= self.ttl:
+                    break
+                del self._sessions[oldest]
+
+            partial = self._sessions.pop(session_id, (None, None))[0] or PartialResult()
+            self._sessions[session_id] = (partial, now)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return partial
+
+    def drop(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_partial_store():
+    """
+    Get the process-wide session store.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PartialResultStore()
+    return _store
@@ -0,0 +1,208 @@
+from utils.ingest import decode_image
+from utils.metrics import timed
+from utils.ocr import OCR_img, OCR_with_detection
+from utils.qr_engine import decode_qr_fast
+from utils.result_cache import detector_cache_name, hash_image_array, make_cache_key
+
+CCCD_TYPES = ["CCCD Mới", "CCCD Cũ"]
+OCR_METHODS = ["OCR trực tiếp", "Object Detection + OCR"]
+
+def parse_qr_result(qr_string):
+    """
+    Phân tích chuỗi QR code và trả về thông tin có cấu trúc
+    Format: cccd|cmnd|họ và tên|ngày tháng năm sinh|giới tính|Nơi thường trú|ngày tháng năm cấp|...
+    """
+    try:
+        # Tách chuỗi theo dấu |
+        parts = qr_string.split('|')
+
+        if len(parts) >= 7:
+            parsed_info = {
+                'Số CCCD/CMND': parts[0] if parts[0] else 'Không có',
+                'Số CMND cũ': parts[1] if parts[1] else 'Không có',
+                'Họ và tên': parts[2] if parts[2] else 'Không có',
+                'Ngày sinh': parts[3] if parts[3] else 'Không có',
+                'Giới tính': parts[4] if parts[4] else 'Không có',
+                'Nơi thường trú': parts[5] if parts[5] else 'Không có',
+                'Ngày cấp': parts[6] if parts[6] else 'Không có',
+            }
+
+            # Xử lý định dạng ngày sinh
+            if parsed_info['Ngày sinh'] != 'Không có' and len(parsed_info['Ngày sinh']) == 8:
+                date_str = parsed_info['Ngày sinh']
+                formatted_date = f"{date_str[0:2]}/{date_str[2:4]}/{date_str[4:8]}"
+                parsed_info['Ngày sinh'] = formatted_date
+
+            # Xử lý định dạng ngày cấp
+            if parsed_info['Ngày cấp'] != 'Không có' and len(parsed_info['Ngày cấp']) == 8:
+                date_str = parsed_info['Ngày cấp']
+                formatted_date = f"{date_str[0:2]}/{date_str[2:4]}/{date_str[4:8]}"
+                parsed_info['Ngày cấp'] = formatted_date
+
+            return parsed_info
+        else:
+            return {'Lỗi': 'Định dạng QR code không đúng', 'Dữ liệu gốc': qr_string}
+
+    except Exception as e:
+        return {'Lỗi': f'Không thể phân tích: {str(e)}', 'Dữ liệu gốc': qr_string}
+
+def decode_image_bytes(data):
+    """
+    Giải mã bytes của file ảnh (JPG/PNG) thành OpenCV image (BGR), xem utils/ingest.py
+
+    Raises:
+        ValueError: Nếu không đọc được ảnh
+    """
+    with timed('decode'):
+        return decode_image(data)
+
+def _notify(on_status, level, message):
+    if on_status is not None:
+        on_status(level, message)
+
+def _image_hash(image_hashes, side, img):
+    if image_hashes and image_hashes.get(side):
+        return image_hashes[side]
+    return hash_image_array(img)
+
+def process_cccd(front_img, back_img, cccd_type, ocr_method="OCR trực tiếp", detection_model=None, class_names=None, on_status=None,
+                 cache=None, image_hashes=None, model_name=None, partial=None, backend=None):
+    """
+    Luồng xử lý CCCD không phụ thuộc giao diện (dùng chung cho Streamlit, API, CLI)
+
+    CCCD Mới: Quét QR ở mặt sau, OCR ở mặt trước nếu QR thất bại
+    CCCD Cũ: Quét QR ở mặt trước, OCR ở mặt trước nếu QR thất bại
+
+    Parameters:
+        front_img: Ảnh mặt trước (BGR) hoặc None
+        back_img: Ảnh mặt sau (BGR) hoặc None
+        cccd_type: Loại CCCD ("CCCD Mới" hoặc "CCCD Cũ")
+        ocr_method: Phương thức OCR ("OCR trực tiếp" hoặc "Object Detection + OCR")
+        detection_model: Model YOLO cho object detection (nếu dùng)
+        class_names: List các class names (nếu dùng object detection)
+        on_status: Callback (level, message) để báo tiến trình, level là 'info', 'success' hoặc 'warning'
+        cache: ResultCache (utils/result_cache.py) để dùng lại kết quả khi ảnh được gửi lại
+        image_hashes: Dict {'front': hash, 'back': hash} của bytes ảnh upload (nếu không có sẽ hash ảnh đã giải mã)
+        model_name: Tên mô hình detection, là một phần của cache key
+        backend: Backend của mô hình detection (mặc định DETECTOR_BACKEND), là một phần của cache key
+        partial: PartialResult (utils/partial_results.py) của phiên; với Object Detection + OCR, các trường
+                 đã đọc được ở lần chụp trước được giữ lại, chỉ OCR các trường còn thiếu (cache OCR chỉ dùng
+                 khi phiên chưa giữ trường nào)
+
+    Returns:
+        results: Dict gồm 'qr_code', 'qr_info' (nếu quét được QR),
+                 'detected_info' hoặc 'ocr_text' (nếu OCR), 'error' (nếu thiếu thông tin),
+                 'kept_fields' (tên các trường giữ lại từ lần chụp trước, nếu dùng partial)
+
+    Raises:
+        ValueError: Nếu thiếu ảnh bắt buộc hoặc loại CCCD không hợp lệ
+    """
+    if cccd_type == "CCCD Mới":
+        qr_img, qr_side, qr_hash_side = back_img, "mặt sau CCCD mới", 'back'
+        if qr_img is None:
+            raise ValueError("❌ Cần ảnh mặt sau để quét QR code!")
+    elif cccd_type == "CCCD Cũ":
+        qr_img, qr_side, qr_hash_side = front_img, "mặt trước CCCD cũ", 'front'
+        if qr_img is None:
+            raise ValueError("❌ Cần ảnh mặt trước để quét QR code!")
+    else:
+        raise ValueError(f"❌ Loại CCCD không hợp lệ: {cccd_type}")
+
+    results = {'cccd_type': cccd_type, 'qr_code': None}
+    if partial is not None and partial.cccd_type != cccd_type:
+        # Đổi loại thẻ: bắt đầu lại từ đầu
+        partial.reset(cccd_type)
+
+    _notify(on_status, 'info', f"🔍 Đang quét QR code ở {qr_side}...")
+    qr_key = None
+    cached_qr = None
+    # QR được tìm bằng box 'qr' của detector nếu có, nên detector là một phần của cache key
+    detector = detector_cache_name(model_name, backend) if detection_model is not None else ''
+    if detection_model is not None and not model_name:
+        # Không biết tên mô hình: không thể tạo cache key đúng
+        cache = None
+    if cache is not None:
+        qr_key = make_cache_key(_image_hash(image_hashes, qr_hash_side, qr_img), model=detector, method='qr',
+                                cccd_type=cccd_type)
+        cached_qr = cache.get(qr_key)
+
+    if cached_qr is not None:
+        qr_result = cached_qr['qr_code']
+    else:
+        try:
+            with timed('qr_total'):
+                qr_result = decode_qr_fast(qr_img, detection_model, class_names)
+        except ValueError as ve:
+            # QR lỗi encoding: coi như không quét được, vẫn OCR mặt trước
+            _notify(on_status, 'warning', f"⚠️ {ve}")
+            qr_result = None
+        if qr_key is not None:
+            # Lưu cả trường hợp không quét được để lần gửi lại không phải thử lại
+            cache.put(qr_key, {'qr_code': qr_result})
+
+    if qr_result:
+        results['qr_code'] = qr_result
+        results['qr_info'] = parse_qr_result(qr_result)
+        _notify(on_status, 'success', "✅ Đã quét được QR code!")
+        if partial is not None:
+            partial.reset(cccd_type)
+        return results
+
+    _notify(on_status, 'warning', "⚠️ Không quét được QR code, chuyển sang OCR mặt trước...")
+
+    if front_img is None:
+        results['error'] = "❌ Cần ảnh mặt trước để thực hiện OCR!"
+        return results
+
+    use_detection = ocr_method == "Object Detection + OCR" and detection_model is not None
+    ocr_key = None
+    # Khi phiên đã giữ trường từ lần chụp trước, kết quả phụ thuộc các lần đó nên không dùng cache OCR
+    session_fields = use_detection and partial is not None and bool(partial.accepted())
+    if cache is not None and not session_fields:
+        ocr_key = make_cache_key(_image_hash(image_hashes, 'front', front_img),
+                                 model=detector if use_detection else '', method=ocr_method, cccd_type=cccd_type)
+        cached_ocr = cache.get(ocr_key)
+        # Lỗi không được cache (ảnh có thể được xử lý lại thành công, phiên cần giữ các trường đọc được)
+        if cached_ocr is not None and 'error' not in cached_ocr:
+            results.update(cached_ocr)
+            _notify(on_status, 'success', "✅ Dùng lại kết quả OCR của ảnh đã gửi trước đó!")
+            if partial is not None and 'detected_info' in cached_ocr:
+                partial.reset(cccd_type)
+            return results
+
+    ocr_results = {}
+    if use_detection:
+        _notify(on_status, 'info', "🔍 Đang thực hiện Object Detection + OCR...")
+        if partial is not None:
+            partial.reused = set()
+        try:
+            with timed('detection_ocr_total'):
+                detected_info, _ = OCR_with_detection(front_img, detection_model, class_names, cccd_type=cccd_type,
+                                                      partial=partial)
+            ocr_results['detected_info'] = detected_info
+            _notify(on_status, 'success', "✅ Hoàn thành Object Detection + OCR!")
+        except ValueError as ve:
+            # Lỗi validation - trả về hướng dẫn chụp lại (partial giữ các trường đã đọc được)
+            ocr_results['error'] = str(ve)
+        if partial is not None and partial.reused:
+            from utils.model_inference import get_class_vietnamese
+
+            vietnamese_labels = get_class_vietnamese()
+            ocr_results['kept_fields'] = [vietnamese_labels.get(name, name) for name in sorted(partial.reused)]
+        if partial is not None and 'detected_info' in ocr_results:
+            # Đã có bản ghi đầy đủ: lần quét tiếp theo là thẻ khác
+            partial.reset(cccd_type)
+    else:
+        _notify(on_status, 'info', "🔍 Đang thực hiện OCR...")
+        try:
+            with timed('ocr_total'):
+                ocr_results['ocr_text'] = OCR_img(front_img)
+            _notify(on_status, 'success', "✅ Hoàn thành OCR!")
+        except ValueError as ve:
+            # Ảnh không đạt chất lượng - trả về hướng dẫn chụp lại
+            ocr_results['error'] = str(ve)
+
+    if ocr_key is not None and 'error' not in ocr_results:
+        cache.put(ocr_key, ocr_results)
+    results.update(ocr_results)
+    return results
@@ -0,0 +1,60 @@
+import os
+
+import cv2
+import numpy as np
+
+from utils.detector_backends import DEFAULT_IMGSZ
+
+# Longest side of the working copy used for orientation, detection and QR search.
+# Twice the detector input size, so YOLO still downsamples and small fields keep their detail.
+WORKING_MAX_SIDE = int(os.environ.get('CCCD_WORKING_MAX_SIDE', str(2 * DEFAULT_IMGSZ)))
+
+# Longest side handed to EasyOCR's full-page readtext (its default canvas_size)
+OCR_MAX_SIDE = int(os.environ.get('CCCD_OCR_MAX_SIDE', '2560'))
+
+
+def to_working_resolution(img, max_side=WORKING_MAX_SIDE):
+    """
+    Downscale an image once so its longest side is at most `max_side`.
+
+    Parameters:
+        img : np.ndarray : BGR or grayscale image
+        max_side : int : Longest side of the result (<= 0 disables the resize)
+
+    Returns:
+        working : np.ndarray : The downscaled image, or `img` itself if it is already small enough
+        scale : tuple : (sx, sy) factors mapping working coordinates back to `img`
+    """
+    height, width = img.shape[:2]
+    longest = max(height, width)
+    if max_side <= 0 or longest <= max_side:
+        return img, (1.0, 1.0)
+
+    ratio = max_side / longest
+    new_size = (max(1, int(round(width * ratio))), max(1, int(round(height * ratio))))
+    working = cv2.resize(img, new_size, interpolation=cv2.INTER_AREA)
+    return working, (width / new_size[0], height / new_size[1])
+
+
+def scale_boxes(boxes, scale):
+    """
+    Map boxes found on the working image back to the original image.
+
+    Parameters:
+        boxes : np.ndarray | sequence : (N, >=4) rows or a single box starting with x1, y1, x2, y2
+        scale : tuple : (sx, sy) from to_working_resolution()
+
+    Returns:
+        Same layout as `boxes` with the coordinates scaled (a new array / tuple)
+    """
+    sx, sy = scale
+    if isinstance(boxes, np.ndarray) and boxes.ndim == 2:
+        if (sx, sy) == (1.0, 1.0):
+            return boxes
+        boxes = boxes.astype(np.float32, copy=True)
+        boxes[:, [0, 2]] *= sx
+        boxes[:, [1, 3]] *= sy
+        return boxes
+
+    x1, y1, x2, y2 = boxes[:4]
+    return (x1 * sx, y1 * sy, x2 * sx, y2 * sy, *boxes[4:])
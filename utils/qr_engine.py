@@ -0,0 +1,299 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import cv2
+
+from utils.metrics import QR_ATTEMPT_SECONDS, record, timed
+from utils.ocr import decode_qr_payload, zbar_decode
+from utils.preprocess import scale_boxes, to_working_resolution
+
+# Scales tried by the app before the engine existed (1 -> 2 -> 3)
+QR_SCALES = (1, 2, 3)
+
+# Preprocessing variants decoded at every scale
+QR_VARIANTS = ('gray', 'otsu', 'adaptive', 'inverted')
+
+# Longest side any decode attempt may reach after upscaling (bounds memory on 12+ MP photos)
+QR_MAX_DECODE_SIDE = int(os.environ.get('QR_MAX_DECODE_SIDE', '3000'))
+
+# Threads shared by every QR decode in the process (cv2 and zbar release the GIL)
+QR_DECODE_WORKERS = int(os.environ.get('QR_DECODE_WORKERS', str(min(8, os.cpu_count() or 1))))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_qr_executor():
+    """
+    Get the process-wide thread pool used for QR decoding.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=QR_DECODE_WORKERS, thread_name_prefix='qr-decode')
+    return _executor
+
+
+class QRIntermediates:
+    """
+    Lazily computed, thread-safe intermediates shared by all decode attempts on one image.
+
+    The grayscale conversion is done once; each scale is resized (and blurred)
+    once, no matter how many variants are decoded from it.
+    """
+
+    def __init__(self, img):
+        self._img = img
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _get(self, key, compute):
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._cache:
+                    return self._cache[key]
+            value = compute()
+            with self._lock:
+                self._cache[key] = value
+        return value
+
+    def gray(self):
+        return self._get('gray', lambda: self._img if self._img.ndim == 2 else cv2.cvtColor(self._img, cv2.COLOR_BGR2GRAY))
+
+    def scaled(self, scale):
+        if scale == 1:
+            return self.gray()
+        return self._get(('scaled', scale), lambda: cv2.resize(
+            self.gray(), None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC
+        ))
+
+    def blurred(self, scale):
+        return self._get(('blurred', scale), lambda: cv2.GaussianBlur(self.scaled(scale), (3, 3), 0))
+
+    def variant(self, scale, name):
+        """
+        Build one preprocessing variant at one scale.
+
+        Parameters:
+            scale : int : Upscale factor
+            name : str : One of QR_VARIANTS
+        """
+        if name == 'gray':
+            return self.scaled(scale)
+        if name == 'otsu':
+            _, th = cv2.threshold(self.blurred(scale), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            return th
+        if name == 'adaptive':
+            # Same threshold the app used before the engine existed
+            return cv2.adaptiveThreshold(self.blurred(scale), 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                         cv2.THRESH_BINARY, 31, 2)
+        if name == 'inverted':
+            return cv2.bitwise_not(self.scaled(scale))
+        raise ValueError(f"Unknown QR preprocessing variant: {name}")
+
+
+def _decode_attempt(intermediates, scale, variant, cancelled):
+    if cancelled.is_set():
+        return None
+    start = time.perf_counter()
+    result = 'error'
+    try:
+        image = intermediates.variant(scale, variant)
+        if cancelled.is_set():
+            result = 'cancelled'
+            return None
+        decoded = zbar_decode(image)
+        if not decoded:
+            result = 'miss'
+            return None
+        payload = decode_qr_payload(decoded[0].data)
+        result = 'hit'
+        return payload
+    finally:
+        record(QR_ATTEMPT_SECONDS, time.perf_counter() - start, scale=scale, variant=variant, result=result)
+
+
+def decode_qr_parallel(img, scales=QR_SCALES, variants=QR_VARIANTS, timeout=None, max_side=QR_MAX_DECODE_SIDE):
+    """
+    Try every (scale, variant) QR decode concurrently and return the first success.
+
+    Remaining attempts are cancelled as soon as one decode succeeds.
+
+    Parameters:
+        img : np.ndarray : BGR or grayscale image
+        scales : tuple : Upscale factors to try
+        variants : tuple : Preprocessing variants to try at each scale
+        timeout : float : Give up after this many seconds (None waits for all attempts)
+        max_side : int : Larger images are downscaled first, and scales that would
+                         upscale past this size are skipped
+
+    Returns:
+        str | None : Decoded QR string, or None if no attempt succeeded
+
+    Raises:
+        ValueError: If the only decodes found had a broken encoding
+    """
+    img, _ = to_working_resolution(img, max_side)
+    longest = max(img.shape[:2])
+    scales = [scale for scale in scales if scale * longest <= max_side] or [1]
+
+    intermediates = QRIntermediates(img)
+    cancelled = threading.Event()
+    executor = get_qr_executor()
+
+    # Cheap attempts (small scales) are queued first; each runs in a copy of the
+    # caller's context so its timing lands in the caller's request trace
+    pending = {
+        executor.submit(contextvars.copy_context().run, _decode_attempt, intermediates, scale, variant, cancelled)
+        for scale in scales
+        for variant in variants
+    }
+
+    first_error = None
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        while pending:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    result = future.result()
+                except ValueError as e:
+                    first_error = first_error or e
+                    continue
+                if result:
+                    return result
+    finally:
+        cancelled.set()
+        for future in pending:
+            future.cancel()
+
+    if first_error is not None:
+        raise first_error
+    return None
+
+
+# Longest side of the copy used for the finder-pattern search
+QR_LOCATE_MAX_SIDE = int(os.environ.get('QR_LOCATE_MAX_SIDE', '1000'))
+
+# Margin (fraction of the box size) kept around a located QR code (quiet zone)
+QR_CROP_MARGIN = 0.15
+
+
+def locate_qr_with_detector(img, model, class_names):
+    """
+    Find the QR box with the field detector.
+
+    Parameters:
+        img : np.ndarray : BGR image
+        model : model : Detector of any backend
+        class_names : list : Class names from get_class()
+
+    Returns:
+        tuple | None : (x1, y1, x2, y2) of the most confident 'qr' box
+    """
+    from utils.model_inference import predict_boxes
+
+    if 'qr' not in class_names:
+        return None
+    qr_class = class_names.index('qr')
+
+    boxes = [row for row in predict_boxes(model, [img])[0] if int(row[5]) == qr_class]
+    if not boxes:
+        return None
+    best = max(boxes, key=lambda row: row[4])
+    return tuple(float(v) for v in best[:4])
+
+
+def locate_qr_with_finder_patterns(img, max_side=QR_LOCATE_MAX_SIDE):
+    """
+    Find the QR code with OpenCV's finder-pattern search on a downscaled copy.
+
+    Parameters:
+        img : np.ndarray : BGR or grayscale image
+        max_side : int : Longest side of the copy searched
+
+    Returns:
+        tuple | None : (x1, y1, x2, y2) in full-resolution coordinates
+    """
+    ratio = min(1.0, max_side / max(img.shape[:2]))
+    small = img if ratio == 1.0 else cv2.resize(img, None, fx=ratio, fy=ratio, interpolation=cv2.INTER_AREA)
+
+    found, points = cv2.QRCodeDetector().detect(small)
+    if not found or points is None:
+        return None
+
+    points = points.reshape(-1, 2) / ratio
+    x1, y1 = points.min(axis=0)
+    x2, y2 = points.max(axis=0)
+    return float(x1), float(y1), float(x2), float(y2)
+
+
+def locate_qr_region(img, model=None, class_names=None):
+    """
+    Locate the QR code: detector 'qr' box first, finder-pattern search otherwise.
+
+    Returns:
+        tuple | None : (x1, y1, x2, y2) in image coordinates
+    """
+    box = None
+    if model is not None and class_names is not None:
+        # The detector runs on the working-resolution copy; the box is mapped back to img
+        working, scale = to_working_resolution(img)
+        with timed('yolo'):
+            box = locate_qr_with_detector(working, model, class_names)
+        if box is not None:
+            box = scale_boxes(box, scale)
+    if box is None:
+        with timed('qr_locate'):
+            box = locate_qr_with_finder_patterns(img)
+    return box
+
+
+def crop_qr_region(img, box, margin=QR_CROP_MARGIN):
+    """
+    Cut the QR box (plus a quiet-zone margin) out of the image as a view.
+    """
+    from utils.model_inference import clip_box
+
+    x1, y1, x2, y2 = box
+    pad_x, pad_y = (x2 - x1) * margin, (y2 - y1) * margin
+    x1, y1, x2, y2 = clip_box((x1 - pad_x, y1 - pad_y, x2 + pad_x, y2 + pad_y), img.shape)
+    return img[y1:y2, x1:x2]
+
+
+def decode_qr_fast(img, model=None, class_names=None, fallback=True):
+    """
+    Decode only the QR region instead of thresholding and upscaling the whole photo.
+
+    Parameters:
+        img : np.ndarray : BGR image
+        model : model : Optional field detector used to find the 'qr' box
+        class_names : list : Class names from get_class()
+        fallback : bool : Decode the full image if the region can not be found or decoded
+
+    Returns:
+        str | None : Decoded QR string
+    """
+    box = locate_qr_region(img, model, class_names)
+    if box is not None:
+        crop = crop_qr_region(img, box)
+        if crop.size > 0:
+            result = decode_qr_parallel(crop)
+            if result:
+                return result
+
+    if fallback:
+        return decode_qr_parallel(img)
+    return None
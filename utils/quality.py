@@ -0,0 +1,154 @@
+import os
+
+import cv2
+import numpy as np
+
+from utils.metrics import timed
+from utils.preprocess import to_working_resolution
+
+# Longest side of the copy the quality gate measures (a few ms even for 12 MP photos)
+QUALITY_MAX_SIDE = 512
+
+# Reject blurry, badly exposed or too small photos before any model runs (CCCD_QUALITY_GATE=1 enables it).
+# Off by default: the thresholds below are starting points that have not been calibrated on real captures,
+# so tune them on your own photos (benchmarks/run_benchmarks.py reports the quality stage) before enabling it
+QUALITY_GATE_ENABLED = os.environ.get('CCCD_QUALITY_GATE', '0') != '0'
+
+# Laplacian variance of the card region below which the photo is too blurry to read
+QUALITY_MIN_SHARPNESS = float(os.environ.get('CCCD_QUALITY_MIN_SHARPNESS', '25'))
+
+# Mean gray level of the card region outside this range is too dark / too bright
+QUALITY_MIN_BRIGHTNESS = float(os.environ.get('CCCD_QUALITY_MIN_BRIGHTNESS', '40'))
+QUALITY_MAX_BRIGHTNESS = float(os.environ.get('CCCD_QUALITY_MAX_BRIGHTNESS', '225'))
+
+# Share of saturated pixels on the card above which a reflection hides the text
+QUALITY_MAX_GLARE = float(os.environ.get('CCCD_QUALITY_MAX_GLARE', '0.12'))
+
+# Smallest share of the photo a detected card outline must cover
+QUALITY_MIN_CARD_AREA = float(os.environ.get('CCCD_QUALITY_MIN_CARD_AREA', '0.15'))
+
+# Gray level counted as glare
+GLARE_LEVEL = 250
+
+# Outlines smaller than this share of the photo are not taken for the card
+_SMALLEST_OUTLINE = 0.02
+
+# Corner confidence needed before the outline is used to judge size and mask the card
+_OUTLINE_MIN_CONFIDENCE = 0.5
+
+RETAKE_GUIDANCE = (
+    "Chụp trực diện CCCD, không bị nghiêng",
+    "CCCD nằm đầy đủ trong khung ảnh",
+    "Không chụp quá nhỏ hoặc quá xa",
+    "Đảm bảo ánh sáng đủ, không quá chói hoặc quá tối",
+    "Ảnh rõ nét, không bị mờ",
+    "Tránh phản chiếu ánh sáng lên bề mặt thẻ",
+)
+
+
+def retake_message(reason):
+    """
+    Vietnamese "please retake" message shown to the user: the reason followed by the capture guidance.
+
+    Parameters:
+        reason : str : First line, e.g. "❌ Thiếu thông tin bắt buộc: Số CCCD"
+    """
+    guidance = '\n'.join(f"  • {line}" for line in RETAKE_GUIDANCE)
+    return f"{reason}\n\n📸 Vui lòng chụp lại theo hướng dẫn:\n{guidance}"
+
+
+def sharpness(gray):
+    """
+    Variance of the Laplacian: low values mean a blurry image.
+    """
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def glare_ratio(gray, mask=None):
+    """
+    Share of saturated pixels (inside `mask` when given).
+    """
+    if mask is None:
+        return float(np.count_nonzero(gray >= GLARE_LEVEL)) / gray.size
+    inside = np.count_nonzero(mask)
+    return float(np.count_nonzero((gray >= GLARE_LEVEL) & (mask > 0))) / inside if inside else 0.0
+
+
+def measure_quality(img, max_side=QUALITY_MAX_SIDE):
+    """
+    Measure blur, exposure, glare and card size on a downscaled copy of the photo.
+
+    When the card outline is found, blur, exposure and glare are measured on the card only,
+    so a bright table or a dark background does not count against the photo.
+
+    Parameters:
+        img : np.ndarray : BGR image
+        max_side : int : Longest side of the copy measured
+
+    Returns:
+        dict : {'sharpness', 'brightness', 'glare', 'card_area' (share of the photo, None if no outline)}
+    """
+    from utils.card_template import detect_card_corners
+
+    small, _ = to_working_resolution(img, max_side)
+    gray = small if small.ndim == 2 else cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    corners, confidence = detect_card_corners(small, max_side=max_side, min_area=_SMALLEST_OUTLINE)
+    card_area = None
+    region = gray
+    mask = None
+    if corners is not None and confidence >= _OUTLINE_MIN_CONFIDENCE:
+        card_area = float(cv2.contourArea(corners)) / gray.size
+        mask = np.zeros_like(gray)
+        cv2.fillConvexPoly(mask, corners.astype(np.int32), 255)
+        x, y, w, h = cv2.boundingRect(corners.astype(np.int32))
+        region = gray[y:y + h, x:x + w]
+        if region.size == 0:
+            region, mask = gray, None
+
+    return {
+        'sharpness': sharpness(region),
+        'brightness': float(cv2.mean(gray, mask=mask)[0]),
+        'glare': glare_ratio(gray, mask),
+        'card_area': card_area,
+    }
+
+
+def quality_problems(measurements):
+    """
+    Vietnamese descriptions of what is wrong with a photo (empty if it is usable).
+    """
+    problems = []
+    if measurements['card_area'] is not None and measurements['card_area'] < QUALITY_MIN_CARD_AREA:
+        problems.append("CCCD quá nhỏ hoặc quá xa trong khung ảnh")
+    if measurements['sharpness'] < QUALITY_MIN_SHARPNESS:
+        problems.append("ảnh bị mờ")
+    if measurements['brightness'] < QUALITY_MIN_BRIGHTNESS:
+        problems.append("ảnh quá tối")
+    elif measurements['brightness'] > QUALITY_MAX_BRIGHTNESS:
+        problems.append("ảnh quá sáng")
+    if measurements['glare'] > QUALITY_MAX_GLARE:
+        problems.append("ảnh bị chói / phản chiếu ánh sáng trên thẻ")
+    return problems
+
+
+def check_image_quality(img):
+    """
+    Reject photos that can not be read before detection and OCR run on them.
+
+    Parameters:
+        img : np.ndarray : BGR image
+
+    Returns:
+        dict : measure_quality() result of a usable photo
+
+    Raises:
+        ValueError: With the retake guidance if the photo is blurry, badly exposed, glared or too small
+    """
+    with timed('quality'):
+        measurements = measure_quality(img)
+        problems = quality_problems(measurements)
+    if problems:
+        reason = ', '.join(problems)
+        raise ValueError(retake_message(f"❌ Ảnh chưa đạt chất lượng: {reason[0].upper()}{reason[1:]}"))
+    return measurements
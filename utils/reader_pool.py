@@ -0,0 +1,159 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from utils.metrics import READER_LOAD_SECONDS, timed
+
+DEFAULT_LANG_LIST = ['vi']
+
+# Number of EasyOCR readers kept alive per (lang_list, gpu) key
+DEFAULT_POOL_SIZE = int(os.environ.get('OCR_READER_POOL_SIZE', '1'))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def create_ocr_reader(lang_list=DEFAULT_LANG_LIST, gpu=False):
+    """
+    Build a new EasyOCR reader (loads the CRAFT detector and the recognizer from disk).
+
+    Parameters:
+        lang_list : list : Languages for the recognizer
+        gpu : bool : Whether to run the reader on GPU
+
+    Returns:
+        reader : easyocr.Reader
+    """
+    # easyocr pulls in torch: imported on the first reader, not when the module loads
+    import easyocr
+
+    return easyocr.Reader(list(lang_list), gpu=gpu)
+
+
+class ReaderPool:
+    """
+    Thread-safe pool of EasyOCR readers sharing the same languages and gpu flag.
+
+    Readers are created lazily up to `size`; callers borrow one with `reader()`
+    and it is handed back to the pool when the block exits.
+    """
+
+    def __init__(self, lang_list=DEFAULT_LANG_LIST, gpu=False, size=DEFAULT_POOL_SIZE, factory=create_ocr_reader):
+        self.lang_list = list(lang_list)
+        self.gpu = gpu
+        self.size = max(1, int(size))
+        self._factory = factory
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @property
+    def created(self):
+        return self._created
+
+    @property
+    def is_warm(self):
+        return self._created >= self.size
+
+    def _create_reader(self):
+        try:
+            with timed('reader_load', READER_LOAD_SECONDS, lang=','.join(self.lang_list)):
+                return self._factory(lang_list=self.lang_list, gpu=self.gpu)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _reserve_slot(self):
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return True
+            return False
+
+    def warm_up(self):
+        """
+        Create readers until the pool is full.
+        """
+        while self._reserve_slot():
+            self._idle.put(self._create_reader())
+
+    def acquire(self, timeout=None):
+        """
+        Take a reader out of the pool, creating one if the pool is not full yet.
+
+        Parameters:
+            timeout : float : Seconds to wait for a free reader (None waits forever)
+
+        Returns:
+            reader : easyocr.Reader
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        if self._reserve_slot():
+            return self._create_reader()
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No OCR reader available after {timeout}s (pool size {self.size})")
+
+    def release(self, reader):
+        """
+        Hand a reader back to the pool.
+        """
+        self._idle.put(reader)
+
+    @contextmanager
+    def reader(self, timeout=None):
+        reader = self.acquire(timeout=timeout)
+        try:
+            yield reader
+        finally:
+            self.release(reader)
+
+
+def get_reader_pool(lang_list=DEFAULT_LANG_LIST, gpu=False, size=None):
+    """
+    Get the process-wide reader pool for a language list and gpu flag.
+
+    Parameters:
+        lang_list : list : Languages for the recognizer
+        gpu : bool : Whether the readers run on GPU
+        size : int : Pool size, only used when the pool is created (default OCR_READER_POOL_SIZE)
+
+    Returns:
+        pool : ReaderPool
+    """
+    key = (tuple(lang_list), bool(gpu))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ReaderPool(lang_list, gpu=gpu, size=DEFAULT_POOL_SIZE if size is None else size)
+            _pools[key] = pool
+    return pool
+
+
+def warm_up_reader_pool(lang_list=DEFAULT_LANG_LIST, gpu=False, size=None):
+    """
+    Fill the process-wide pool once so the first scan does not pay the model load.
+
+    Returns:
+        pool : ReaderPool
+    """
+    pool = get_reader_pool(lang_list, gpu=gpu, size=size)
+    pool.warm_up()
+    return pool
+
+
+@contextmanager
+def borrow_ocr_reader(lang_list=DEFAULT_LANG_LIST, gpu=False, timeout=None):
+    """
+    Borrow a reader from the process-wide pool for the duration of a `with` block.
+    """
+    with get_reader_pool(lang_list, gpu=gpu).reader(timeout=timeout) as reader:
+        yield reader
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Entries kept in memory per process (0 disables the cache)
+DEFAULT_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_SIZE', '256'))
+
+# Optional on-disk tier shared between processes (unset = memory only)
+DEFAULT_DISK_DIR = os.environ.get('RESULT_CACHE_DIR') or None
+DEFAULT_DISK_MB = float(os.environ.get('RESULT_CACHE_DISK_MB', '512'))
+
+
+def hash_image_bytes(data):
+    """
+    Content hash of an encoded image file (the raw upload bytes).
+    """
+    return hashlib.blake2b(memoryview(data), digest_size=20).hexdigest()
+
+
+def hash_image_array(img):
+    """
+    Content hash of a decoded image, for sources that have no encoded bytes (camera frames).
+    """
+    img = np.ascontiguousarray(img)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr((img.shape, img.dtype.str)).encode())
+    digest.update(memoryview(img).cast('B'))
+    return digest.hexdigest()
+
+
+def detector_cache_name(model_name, backend=None):
+    """
+    The `model` part of a cache key for a detector: boxes, and so results, differ between backends.
+
+    Parameters:
+        model_name : str : Detector name, e.g. 'yolov8' or 'cascade'
+        backend : str : Detector backend (default DETECTOR_BACKEND env, then 'pytorch', as in the model registry)
+    """
+    return f"{model_name}/{backend or os.environ.get('DETECTOR_BACKEND', 'pytorch')}"
+
+
+def make_cache_key(image_hash, model='', method='', cccd_type=''):
+    """
+    Build a cache key from the image hash plus everything that changes the result.
+
+    Parameters:
+        image_hash : str : hash_image_bytes / hash_image_array of the input image
+        model : str : Detection model (and backend) used, '' if none
+        method : str : Processing step ('qr', or the OCR method)
+        cccd_type : str : Card type
+
+    Returns:
+        key : str
+    """
+    parts = json.dumps([image_hash, model or '', method or '', cccd_type or ''], ensure_ascii=False)
+    return hashlib.blake2b(parts.encode('utf-8'), digest_size=20).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache of JSON-serialisable scan results.
+
+    The memory tier is an LRU of `max_entries`; the optional disk tier stores
+    one JSON file per key in `disk_dir` and evicts the oldest files once it
+    grows past `disk_max_mb`.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, disk_dir=DEFAULT_DISK_DIR, disk_max_mb=DEFAULT_DISK_MB):
+        self.max_entries = max(1, int(max_entries))
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = int(disk_max_mb * 1024 * 1024)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'puts': 0, 'disk_evictions': 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f'{key}.json')
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        Look a key up in memory, then on disk. Returns None on a miss.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return self._memory[key]
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, encoding='utf-8') as f:
+                    value = json.load(f)
+            except (OSError, ValueError):
+                value = None
+            if value is not None:
+                # Refresh mtime so eviction drops the least recently used files
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                self._remember(key, value)
+                self._count('disk_hits')
+                return value
+
+        self._count('misses')
+        return None
+
+    def put(self, key, value):
+        """
+        Store a JSON-serialisable value in both tiers.
+        """
+        self._remember(key, value)
+        self._count('puts')
+        if not self.disk_dir:
+            return
+
+        path = self._disk_path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._evict_disk()
+
+    def _evict_disk(self):
+        with self._disk_lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.disk_dir):
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            for _, size, path in sorted(entries):
+                if total <= self.disk_max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self._count('disk_evictions')
+
+    def stats(self):
+        """
+        Hit / miss counters and current memory size.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            counters['memory_entries'] = len(self._memory)
+        lookups = counters['memory_hits'] + counters['disk_hits'] + counters['misses']
+        counters['hit_rate'] = (counters['memory_hits'] + counters['disk_hits']) / lookups if lookups else 0.0
+        return counters
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """
+    Get the process-wide result cache, or None when RESULT_CACHE_SIZE is 0.
+    """
+    global _cache
+    if DEFAULT_MAX_ENTRIES <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+    return _cache
@@ -0,0 +1,202 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Directory shared by the QR fast lane (qr_service.py) and the OCR workers (spool_worker.py)
+SPOOL_DIR = os.environ.get('CCCD_SPOOL_DIR', os.path.join(os.getcwd(), 'spool'))
+
+# Finished results are kept this long for clients polling /jobs/<id>
+SPOOL_RESULT_TTL = float(os.environ.get('CCCD_SPOOL_RESULT_TTL', '3600'))
+
+# A job claimed longer ago than this is assumed to belong to a crashed worker and is queued again
+SPOOL_STALE_SECONDS = float(os.environ.get('CCCD_SPOOL_STALE_SECONDS', '600'))
+
+_JOB_ID = re.compile(r'^\d{20}-[0-9a-f]{12}$')
+
+
+class Spool:
+    """
+    File-system job queue between processes on the same host.
+
+    Each job is a directory holding the uploaded files and meta.json. It moves
+    incoming/ -> pending/ -> processing/ with atomic renames, so any number of
+    producers and workers can share the directory without a broker; the result
+    ends up in done/<job_id>.json. Job ids sort by submission time (FIFO).
+    A worker keeps the claim fresh with heartbeat() while it runs the job.
+    """
+
+    def __init__(self, root=SPOOL_DIR):
+        self.root = root
+        for state in ('incoming', 'pending', 'processing', 'done'):
+            os.makedirs(os.path.join(root, state), exist_ok=True)
+
+    def _path(self, state, name=''):
+        return os.path.join(self.root, state, name)
+
+    def enqueue(self, files, meta):
+        """
+        Queue a job.
+
+        Parameters:
+            files : dict : file name -> bytes-like content
+            meta : dict : JSON-serialisable job parameters
+
+        Returns:
+            str : Job id
+        """
+        job_id = f'{time.time_ns():020d}-{uuid.uuid4().hex[:12]}'
+        staging = self._path('incoming', job_id)
+        os.makedirs(staging)
+        try:
+            for name, data in files.items():
+                with open(os.path.join(staging, name), 'wb') as f:
+                    f.write(data)
+            with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            # Only complete jobs ever appear in pending/
+            os.rename(staging, self._path('pending', job_id))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return job_id
+
+    def claim(self):
+        """
+        Take the oldest pending job.
+
+        Returns:
+            tuple | None : (job_id, meta, files) with files as {name: bytes}, or None if the queue is empty
+        """
+        for job_id in sorted(os.listdir(self._path('pending'))):
+            target = self._path('processing', job_id)
+            try:
+                os.rename(self._path('pending', job_id), target)
+            except FileNotFoundError:
+                # Claimed by another worker first
+                continue
+            # Record when the job was claimed, for requeue_stale()
+            os.utime(target)
+
+            with open(os.path.join(target, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+            files = {}
+            for name in os.listdir(target):
+                if name != 'meta.json':
+                    with open(os.path.join(target, name), 'rb') as f:
+                        files[name] = f.read()
+            return job_id, meta, files
+        return None
+
+    def touch(self, job_id):
+        """
+        Mark a claimed job as still running, so requeue_stale() leaves it alone.
+        """
+        try:
+            os.utime(self._path('processing', job_id))
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def heartbeat(self, job_id, interval=None):
+        """
+        Touch a claimed job every `interval` seconds (default a third of SPOOL_STALE_SECONDS)
+        while the block runs, so a job slower than the stale timeout is not run twice.
+        """
+        interval = interval or max(1.0, SPOOL_STALE_SECONDS / 3)
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                self.touch(job_id)
+
+        thread = threading.Thread(target=beat, name=f'spool-heartbeat-{job_id}', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def complete(self, job_id, result):
+        """
+        Store the result of a claimed job and drop its files.
+        """
+        temp = self._path('done', f'.{job_id}.tmp')
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, default=str)
+        os.replace(temp, self._path('done', f'{job_id}.json'))
+        shutil.rmtree(self._path('processing', job_id), ignore_errors=True)
+
+    def status(self, job_id):
+        """
+        Returns:
+            dict : {'status': 'queued' | 'processing' | 'done' | 'unknown', 'result': ... (when done)}
+        """
+        if not _JOB_ID.match(job_id):
+            return {'status': 'unknown'}
+        try:
+            with open(self._path('done', f'{job_id}.json'), encoding='utf-8') as f:
+                return {'status': 'done', 'result': json.load(f)}
+        except FileNotFoundError:
+            pass
+        if os.path.isdir(self._path('processing', job_id)):
+            return {'status': 'processing'}
+        if os.path.isdir(self._path('pending', job_id)):
+            return {'status': 'queued'}
+        return {'status': 'unknown'}
+
+    def depth(self):
+        """
+        Number of jobs waiting for a worker.
+        """
+        return len(os.listdir(self._path('pending')))
+
+    def requeue_stale(self, max_age=SPOOL_STALE_SECONDS):
+        """
+        Put jobs claimed more than `max_age` seconds ago back in the queue.
+
+        Returns:
+            int : Number of jobs requeued
+        """
+        requeued = 0
+        cutoff = time.time() - max_age
+        for job_id in os.listdir(self._path('processing')):
+            path = self._path('processing', job_id)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.rename(path, self._path('pending', job_id))
+                    requeued += 1
+            except FileNotFoundError:
+                continue
+        return requeued
+
+    def purge_incoming(self, max_age=SPOOL_STALE_SECONDS):
+        """
+        Delete staging directories older than `max_age` seconds, left by producers that died mid-enqueue.
+        """
+        cutoff = time.time() - max_age
+        for job_id in os.listdir(self._path('incoming')):
+            path = self._path('incoming', job_id)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+            except FileNotFoundError:
+                continue
+
+    def purge_done(self, max_age=SPOOL_RESULT_TTL):
+        """
+        Delete results older than `max_age` seconds.
+        """
+        cutoff = time.time() - max_age
+        for name in os.listdir(self._path('done')):
+            path = self._path('done', name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                continue
@@ -0,0 +1,222 @@
+import os
+import tempfile
+import time
+
+import cv2
+
+from utils.metrics import timed
+from utils.pipeline import parse_qr_result
+from utils.preprocess import to_working_resolution
+from utils.quality import glare_ratio, sharpness
+from utils.qr_engine import crop_qr_region, decode_qr_parallel, locate_qr_with_finder_patterns
+
+# Longest side of the thumbnail frames are scored on (scores stay comparable across video sizes)
+FRAME_SCORE_MAX_SIDE = 320
+
+# Frames are grouped into windows and only the best frame of each window is decoded
+STREAM_WINDOW = int(os.environ.get('CCCD_STREAM_WINDOW', '5'))
+
+# Laplacian variance (on the scoring thumbnail) below which a frame is too blurry to decode
+STREAM_MIN_SHARPNESS = float(os.environ.get('CCCD_STREAM_MIN_SHARPNESS', '60'))
+
+# Share of blown-out pixels above which a frame is skipped (reflection on the card)
+STREAM_MAX_GLARE = float(os.environ.get('CCCD_STREAM_MAX_GLARE', '0.05'))
+
+# Margin kept around the last QR box when it is reused on the next frames (the card moves a little)
+QR_TRACK_MARGIN = 0.5
+
+
+def frame_quality(frame, max_side=FRAME_SCORE_MAX_SIDE):
+    """
+    Cheap sharpness and glare measurements of a frame, computed on a small grayscale copy.
+
+    Parameters:
+        frame : np.ndarray : BGR or grayscale frame
+        max_side : int : Longest side of the copy measured
+
+    Returns:
+        dict : {'sharpness': Laplacian variance, 'glare': share of saturated pixels, 'score': ranking score}
+    """
+    small, _ = to_working_resolution(frame, max_side)
+    gray = small if small.ndim == 2 else cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    focus = sharpness(gray)
+    glare = glare_ratio(gray)
+    return {'sharpness': focus, 'glare': glare, 'score': focus * (1.0 - min(1.0, glare * 10))}
+
+
+def iter_video_frames(source, stride=1, max_frames=None):
+    """
+    Read BGR frames from a video file.
+
+    Parameters:
+        source : str | bytes-like : Path of the video, or the encoded file itself (e.g. an upload)
+        stride : int : Keep every `stride`-th frame
+        max_frames : int | None : Stop after this many frames have been read
+
+    Yields:
+        np.ndarray : BGR frame
+    """
+    temp_path = None
+    if not isinstance(source, (str, os.PathLike)):
+        # VideoCapture only opens files: spool the upload to a temporary file
+        with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as f:
+            f.write(memoryview(source).cast('B'))
+            temp_path = source = f.name
+
+    capture = cv2.VideoCapture(str(source))
+    try:
+        if not capture.isOpened():
+            raise ValueError("❌ Không đọc được video. Vui lòng dùng file MP4, MOV, AVI hoặc WEBM.")
+        read = 0
+        while max_frames is None or read < max_frames:
+            ok = capture.grab()
+            if not ok:
+                break
+            read += 1
+            if (read - 1) % stride:
+                continue
+            ok, frame = capture.retrieve()
+            if ok:
+                yield frame
+    finally:
+        capture.release()
+        if temp_path is not None:
+            os.unlink(temp_path)
+
+
+def select_frames(frames, window=STREAM_WINDOW, min_sharpness=STREAM_MIN_SHARPNESS, max_glare=STREAM_MAX_GLARE, stats=None):
+    """
+    Pick the sharpest usable frame of every window of `window` consecutive frames.
+
+    Frames are consumed lazily, so a caller that stops iterating stops reading the stream.
+
+    Parameters:
+        frames : iterable : BGR frames (video file, camera, ...)
+        window : int : Frames scored per decoded frame
+        min_sharpness : float : Frames blurrier than this are never selected
+        max_glare : float : Frames with more glare than this are never selected
+        stats : dict | None : Updated in place with 'frames_read', 'best_frame', 'best_index', 'best_quality'
+
+    Yields:
+        (index, frame, quality) : Selected frame, its position in the stream and frame_quality()
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault('frames_read', 0)
+    stats.setdefault('best_quality', None)
+
+    candidate = None
+    for index, frame in enumerate(frames):
+        stats['frames_read'] = index + 1
+        with timed('frame_quality'):
+            quality = frame_quality(frame)
+
+        if stats['best_quality'] is None or quality['score'] > stats['best_quality']['score']:
+            stats.update(best_frame=frame, best_index=index, best_quality=quality)
+
+        usable = quality['sharpness'] >= min_sharpness and quality['glare'] <= max_glare
+        if usable and (candidate is None or quality['score'] > candidate[2]['score']):
+            candidate = (index, frame, quality)
+
+        if (index + 1) % window == 0:
+            if candidate is not None:
+                yield candidate
+            candidate = None
+
+    if candidate is not None:
+        yield candidate
+
+
+class QRTracker:
+    """
+    Decode QR codes across the frames of one stream, reusing the last QR location.
+
+    The region found on a previous frame is decoded first; the finder-pattern search
+    over the whole frame only runs when that region no longer holds a readable code.
+    """
+
+    def __init__(self, margin=QR_TRACK_MARGIN):
+        self.margin = margin
+        self.box = None
+
+    def decode(self, frame):
+        """
+        Returns:
+            str | None : Decoded QR string
+
+        Raises:
+            ValueError: If the QR code is found but its payload is not valid UTF-8
+        """
+        if self.box is not None:
+            crop = crop_qr_region(frame, self.box, self.margin)
+            if crop.size > 0:
+                result = decode_qr_parallel(crop)
+                if result:
+                    return result
+
+        with timed('qr_locate'):
+            box = locate_qr_with_finder_patterns(frame)
+        if box is None:
+            # Too small for the finder-pattern search: one full-frame pass without upscaling
+            return decode_qr_parallel(frame, scales=(1,))
+
+        self.box = box
+        crop = crop_qr_region(frame, box)
+        return decode_qr_parallel(crop) if crop.size > 0 else None
+
+
+def scan_qr_stream(frames, window=STREAM_WINDOW, min_sharpness=STREAM_MIN_SHARPNESS, max_glare=STREAM_MAX_GLARE,
+                   timeout=None):
+    """
+    Scan a video / frame stream for the CCCD QR code, decoding only the best frames.
+
+    Stops at the first decode that parse_qr_result() accepts.
+
+    Parameters:
+        frames : iterable : BGR frames, e.g. iter_video_frames(...)
+        window : int : See select_frames()
+        min_sharpness : float : See select_frames()
+        max_glare : float : See select_frames()
+        timeout : float | None : Give up after this many seconds
+
+    Returns:
+        dict : {
+            'qr_code': str | None, 'qr_info': dict | None, 'frame_index': int | None,
+            'frames_read': int, 'frames_decoded': int,
+            'best_frame': np.ndarray | None (sharpest frame, for OCR when no QR code was read),
+            'best_index': int | None
+        }
+    """
+    stats = {}
+    result = {'qr_code': None, 'qr_info': None, 'frame_index': None, 'frames_decoded': 0}
+    tracker = QRTracker()
+    deadline = time.monotonic() + timeout if timeout else None
+
+    selected = select_frames(frames, window, min_sharpness, max_glare, stats)
+    with timed('qr_stream'):
+        for index, frame, _ in selected:
+            result['frames_decoded'] += 1
+            try:
+                qr_string = tracker.decode(frame)
+            except ValueError:
+                # Payload read with encoding errors: a later frame may be cleaner
+                qr_string = None
+
+            if qr_string:
+                qr_info = parse_qr_result(qr_string)
+                if 'Lỗi' not in qr_info:
+                    result.update(qr_code=qr_string, qr_info=qr_info, frame_index=index)
+                    break
+            if deadline is not None and time.monotonic() > deadline:
+                break
+    # Stop reading the video as soon as the scan is over
+    selected.close()
+    if hasattr(frames, 'close'):
+        frames.close()
+
+    result.update(
+        frames_read=stats.get('frames_read', 0),
+        best_frame=stats.get('best_frame'),
+        best_index=stats.get('best_index'),
+    )
+    return result
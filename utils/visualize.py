@@ -0,0 +1,30 @@
+"""
+Debug helpers for looking at intermediate images in a notebook or a local window.
+
+Not imported by the app, API or workers: matplotlib is loaded only when these are called.
+"""
+import cv2
+
+
+def show_img(img):
+    from matplotlib import pyplot as plt
+
+    plt.figure(figsize=(10, 8))
+    if img.ndim == 2:
+        plt.imshow(img, cmap='gray')
+    else:
+        plt.imshow(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+    plt.axis('off')
+    plt.show()
+
+
+def draw_ocr_boxes(img, boxes, color=(0, 255, 0)):
+    """
+    Draw EasyOCR readtext boxes (four corner points each) on a copy of the image.
+    """
+    img_with_boxes = img.copy()
+    for box in boxes:
+        top_left = (int(box[0][0]), int(box[0][1]))
+        bottom_right = (int(box[2][0]), int(box[2][1]))
+        cv2.rectangle(img_with_boxes, top_left, bottom_right, color, 2)
+    return img_with_boxes
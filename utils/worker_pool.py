@@ -0,0 +1,346 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from utils.metrics import collect_spans, current_spans, replay_spans
+
+# Number of worker processes for the pool execution mode (0 = run in-process)
+DEFAULT_WORKER_PROCESSES = int(os.environ.get('CCCD_WORKER_PROCESSES', '0'))
+
+# Thread pool variables honoured by torch, OpenCV's BLAS, numpy and ONNX Runtime
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'DETECTOR_NUM_THREADS')
+
+
+def threads_per_worker(num_workers):
+    """
+    Split the machine's cores evenly between workers so they do not oversubscribe.
+
+    Parameters:
+        num_workers : int : Number of worker processes
+
+    Returns:
+        int : Intra-op threads each worker may use
+    """
+    return max(1, (os.cpu_count() or 1) // max(1, num_workers))
+
+
+def share_image(img):
+    """
+    Copy an image into a new shared memory block.
+
+    Returns:
+        shm : SharedMemory : Owner handle (close and unlink when the task is done)
+        spec : dict : name, shape and dtype needed to attach from another process
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(1, img.nbytes))
+    view = np.ndarray(img.shape, dtype=img.dtype, buffer=shm.buf)
+    view[...] = img
+    return shm, {'name': shm.name, 'shape': img.shape, 'dtype': img.dtype.str}
+
+
+_tracker_lock = threading.Lock()
+
+
+def attach_image(spec):
+    """
+    Attach to a shared image without copying it.
+
+    The segment is not registered with the resource tracker: its owner unlinks it,
+    and a registration made here would be reported as leaked (or unlinked twice) at exit.
+
+    Returns:
+        shm : SharedMemory : Handle to close once the array is no longer used
+        img : np.ndarray : View over the shared buffer
+    """
+    try:
+        shm = shared_memory.SharedMemory(name=spec['name'], track=False)
+    except TypeError:
+        # Before Python 3.13 attaching always registers the segment. Unregistering it afterwards would
+        # also drop the owner's registration (workers share the parent's tracker), so skip registering
+        with _tracker_lock:
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                shm = shared_memory.SharedMemory(name=spec['name'])
+            finally:
+                resource_tracker.register = register
+    img = np.ndarray(spec['shape'], dtype=np.dtype(spec['dtype']), buffer=shm.buf)
+    return shm, img
+
+
+_environ_lock = threading.Lock()
+
+
+@contextmanager
+def _thread_environ(num_threads):
+    """
+    Set THREAD_ENV_VARS in this process while workers are spawned.
+
+    A spawned worker imports numpy (and with it the BLAS thread pool) while it unpickles
+    _init_worker, so the limits must already be in the environment it starts with.
+    """
+    with _environ_lock:
+        saved = {var: os.environ.get(var) for var in THREAD_ENV_VARS}
+        os.environ.update({var: str(num_threads) for var in THREAD_ENV_VARS})
+        try:
+            yield
+        finally:
+            for var, value in saved.items():
+                if value is None:
+                    os.environ.pop(var, None)
+                else:
+                    os.environ[var] = value
+
+
+def _init_worker(num_threads, model_names, backend):
+    # THREAD_ENV_VARS come from the parent's environment (see _thread_environ); the runtime
+    # thread settings below cover the libraries that allow changing them after import
+    if backend:
+        os.environ['DETECTOR_BACKEND'] = backend
+
+    import cv2
+    cv2.setNumThreads(num_threads)
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+        torch.set_num_interop_threads(1)
+    except ImportError:
+        pass
+
+    # Each worker keeps its own warm reader and models for its whole life
+    from utils.model_registry import get_shared_model
+    from utils.reader_pool import warm_up_reader_pool
+
+    # Load timings are sent back with the worker's first result
+    with collect_spans() as spans:
+        warm_up_reader_pool(size=1)
+        for model_name in model_names:
+            get_shared_model(model_name=model_name, device='cpu')
+    _startup_spans.extend(spans)
+
+
+def _task_process_cccd(front_img, back_img, cccd_type, ocr_method="OCR trực tiếp", model_name=None, image_hashes=None,
+                       partial_state=None):
+    from utils.model_inference import get_class
+    from utils.model_registry import get_shared_model
+    from utils.partial_results import PartialResult
+    from utils.pipeline import process_cccd
+    from utils.result_cache import get_result_cache
+
+    detection_model = None
+    if ocr_method == "Object Detection + OCR" and model_name:
+        detection_model = get_shared_model(model_name=model_name, device='cpu')
+    partial = None
+    if partial_state is not None:
+        partial = PartialResult()
+        partial.load(partial_state)
+    result = process_cccd(front_img, back_img, cccd_type, ocr_method=ocr_method,
+                          detection_model=detection_model, class_names=get_class(),
+                          cache=get_result_cache(), image_hashes=image_hashes, model_name=model_name, partial=partial)
+    if partial is not None:
+        # The session's fields live in the parent: send the merged state back with the result
+        result['_partial'] = partial.state()
+    return result
+
+
+def _task_ocr_img(img):
+    from utils.ocr import OCR_img
+
+    return OCR_img(img)
+
+
+def _task_ocr_with_detection(img, model_name='yolov8', optional_fields=None):
+    from utils.model_inference import get_class
+    from utils.model_registry import get_shared_model
+    from utils.ocr import OCR_with_detection
+
+    # Only the text fields are sent back; the annotated image would be pickled otherwise
+    detected_info, _ = OCR_with_detection(img, get_shared_model(model_name=model_name, device='cpu'), get_class(),
+                                          optional_fields=optional_fields)
+    return detected_info
+
+
+TASKS = {
+    'process_cccd': _task_process_cccd,
+    'ocr_img': _task_ocr_img,
+    'ocr_with_detection': _task_ocr_with_detection,
+}
+
+
+# Spans recorded while the worker started, not yet reported to the parent
+_startup_spans = []
+
+
+def _attach(spec, handles):
+    if spec is None:
+        return None
+    shm, img = attach_image(spec)
+    handles.append(shm)
+    return img
+
+
+def _run_task(task, image_specs, kwargs):
+    handles = []
+    images = []
+    try:
+        # No loop variable may keep a view alive past `del images` below
+        images = [_attach(spec, handles) for spec in image_specs]
+        with collect_spans() as spans:
+            result = TASKS[task](*images, **kwargs)
+        spans[:0] = _startup_spans
+        _startup_spans.clear()
+        return result, spans
+    finally:
+        # Drop the array views before closing the mappings
+        del images
+        for shm in handles:
+            try:
+                shm.close()
+            except BufferError:
+                # A view escaped into the result; the mapping goes away with the worker
+                pass
+
+
+class WorkerPool:
+    """
+    Pool of worker processes, each holding its own warm OCR reader and detection models.
+
+    Images are handed to the workers through shared memory instead of being pickled.
+    """
+
+    def __init__(self, num_workers=None, model_names=('yolov8',), backend=None, threads=None):
+        self.num_workers = num_workers or DEFAULT_WORKER_PROCESSES or os.cpu_count() or 1
+        self.threads = threads or threads_per_worker(self.num_workers)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.threads, tuple(model_names), backend),
+        )
+        # Workers are spawned on demand: start all of them now, while the thread limits are in the environment
+        with _thread_environ(self.threads):
+            for _ in range(self.num_workers):
+                self._executor.submit(int)
+
+    def submit(self, task, images, **kwargs):
+        """
+        Run a task on a worker.
+
+        Parameters:
+            task : str : One of TASKS
+            images : list : Images (np.ndarray or None) passed as the task's leading arguments
+            **kwargs : Extra picklable task arguments
+
+        Returns:
+            Future
+        """
+        if task not in TASKS:
+            raise ValueError(f"Unknown worker task: {task}")
+
+        handles = []
+        specs = []
+        try:
+            for img in images:
+                if img is None:
+                    specs.append(None)
+                    continue
+                shm, spec = share_image(np.ascontiguousarray(img))
+                handles.append(shm)
+                specs.append(spec)
+            inner = self._executor.submit(_run_task, task, specs, kwargs)
+        except Exception:
+            self._release(handles)
+            raise
+
+        # Stage timings recorded in the worker are replayed into this process's metrics
+        trace = current_spans()
+        future = Future()
+
+        def done(inner):
+            self._release(handles)
+            try:
+                result, spans = inner.result()
+            except BaseException as e:
+                future.set_exception(e)
+                return
+            replay_spans(spans, trace)
+            future.set_result(result)
+
+        inner.add_done_callback(done)
+        return future
+
+    @staticmethod
+    def _release(handles):
+        for shm in handles:
+            shm.close()
+            shm.unlink()
+
+    def process_cccd(self, front_img, back_img, cccd_type, ocr_method="OCR trực tiếp", model_name=None, image_hashes=None,
+                     partial=None):
+        """
+        Run process_cccd in a worker. A PartialResult given as `partial` is updated in place
+        when the future completes, as it would be in-process.
+        """
+        future = self.submit('process_cccd', [front_img, back_img], cccd_type=cccd_type,
+                             ocr_method=ocr_method, model_name=model_name, image_hashes=image_hashes,
+                             partial_state=partial.state() if partial is not None else None)
+        if partial is None:
+            return future
+
+        merged = Future()
+
+        def done(future):
+            try:
+                result = future.result()
+            except BaseException as e:
+                merged.set_exception(e)
+                return
+            partial.load(result.pop('_partial'))
+            merged.set_result(result)
+
+        future.add_done_callback(done)
+        return merged
+
+    def ocr_img(self, img):
+        return self.submit('ocr_img', [img])
+
+    def ocr_with_detection(self, img, model_name='yolov8', optional_fields=None):
+        return self.submit('ocr_with_detection', [img], model_name=model_name, optional_fields=optional_fields)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def worker_pool_enabled():
+    """
+    Whether work runs in worker processes (CCCD_WORKER_PROCESSES > 0), without starting any.
+    """
+    return DEFAULT_WORKER_PROCESSES > 0
+
+
+def get_worker_pool(backend=None):
+    """
+    Get the process-wide worker pool for a detector backend, or None when CCCD_WORKER_PROCESSES is 0.
+
+    Parameters:
+        backend : str : Detector backend the workers load (default DETECTOR_BACKEND env, then 'pytorch')
+    """
+    if not worker_pool_enabled():
+        return None
+    backend = backend or os.environ.get('DETECTOR_BACKEND', 'pytorch')
+    with _pools_lock:
+        pool = _pools.get(backend)
+        if pool is None:
+            model_names = [name for name in os.environ.get('CCCD_WORKER_MODELS', 'yolov8').split(',') if name]
+            pool = WorkerPool(DEFAULT_WORKER_PROCESSES, model_names=model_names, backend=backend)
+            _pools[backend] = pool
+    return pool